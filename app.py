@@ -7,6 +7,10 @@ import altair as alt
 import pytz
 import io
 import hashlib
+import heapq
+from bisect import bisect_left
+from functools import lru_cache
+import numpy as np
 
 # Timezone GMT+7 (WIB)
 WIB = pytz.timezone('Asia/Jakarta')
@@ -14,6 +18,9 @@ WIB = pytz.timezone('Asia/Jakarta')
 # Database Name
 DB_NAME = "ipcc_system.db"
 
+# Maximum options shown by typeahead selectboxes
+TYPEAHEAD_LIMIT = 50
+
 # Kategori WBS Standard untuk setiap project
 WBS_CATEGORIES = [
     "MATERIAL BUILDING BUDGET",
@@ -29,6 +36,8 @@ def hash_password(password):
     """Hash password untuk keamanan"""
     return hashlib.sha256(password.encode()).hexdigest()
 
+DATE_FORMATS = ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%Y/%m/%d']
+
 def parse_date(date_str):
     """Parse tanggal dari berbagai format ke datetime object"""
     if pd.isna(date_str) or date_str == '' or date_str is None:
@@ -36,15 +45,15 @@ def parse_date(date_str):
     
     date_str = str(date_str).strip()
     
-    for fmt in ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%Y/%m/%d']:
+    for fmt in DATE_FORMATS:
         try:
             return datetime.strptime(date_str, fmt)
-        except:
+        except ValueError:
             continue
     
     try:
         return pd.to_datetime(date_str)
-    except:
+    except (ValueError, TypeError):
         return None
 
 def format_date(date_obj):
@@ -61,9 +70,85 @@ def format_currency(amount):
         return "Rp 0"
     try:
         return f"Rp {amount:,.0f}".replace(",", ".")
-    except:
+    except (ValueError, TypeError):
         return "Rp 0"
 
+# Lookup tables for vectorized thousands/date formatting
+_THOUSANDS_LEAD = np.array([str(i) for i in range(1000)])
+_THOUSANDS_GROUP = np.array([f".{i:03d}" for i in range(1000)])
+_TWO_DIGITS = np.array([f"{i:02d}" for i in range(100)])
+
+def format_currency_series(values):
+    """Vectorized format_currency for a whole column (Rp 1.234.567)"""
+    series = pd.to_numeric(pd.Series(values), errors='coerce')
+    amounts = series.to_numpy(dtype=float, na_value=np.nan)
+    amounts = np.where(np.isfinite(amounts), amounts, 0)
+    amounts = np.rint(amounts).astype(np.int64)
+    
+    result = np.where(amounts < 0, "Rp -", "Rp ")
+    amounts = np.abs(amounts)
+    
+    # Append 3-digit groups from the most significant one; the leading group is unpadded
+    top = 0
+    while top < 6 and (amounts >= 1000 ** (top + 1)).any():
+        top += 1
+    for k in range(top, -1, -1):
+        group = (amounts // (1000 ** k)) % 1000
+        piece = np.where(amounts >= 1000 ** (k + 1), _THOUSANDS_GROUP[group],
+                         np.where((amounts >= 1000 ** k) | (k == 0), _THOUSANDS_LEAD[group], ''))
+        result = np.char.add(result, piece)
+    
+    return pd.Series(result.astype(object), index=series.index)
+
+@lru_cache(maxsize=256)
+def detect_date_format(sample):
+    """Find the first DATE_FORMATS entry that parses every value in sample (tuple of strings)"""
+    for fmt in DATE_FORMATS:
+        try:
+            for value in sample:
+                datetime.strptime(value, fmt)
+            return fmt
+        except ValueError:
+            continue
+    return None
+
+def parse_date_series(values, sample_size=20):
+    """Vectorized parse_date: detect the column format once, then parse the whole column with it"""
+    series = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    
+    text = series.astype('string').str.strip().fillna('')
+    filled = text != ''
+    sample = tuple(text[filled].head(sample_size))
+    fmt = detect_date_format(sample) if sample else None
+    
+    if fmt:
+        parsed = pd.to_datetime(text, format=fmt, errors='coerce')
+    else:
+        parsed = pd.Series(pd.NaT, index=text.index, dtype='datetime64[ns]')
+    
+    # Rows in another format than the detected one fall back to the same order as parse_date
+    for other_fmt in DATE_FORMATS + ['mixed']:
+        leftover = parsed.isna() & filled
+        if not leftover.any():
+            break
+        if other_fmt != fmt:
+            parsed[leftover] = pd.to_datetime(text[leftover], format=other_fmt, errors='coerce')
+    return parsed
+
+def format_date_series(values):
+    """Vectorized format_date(parse_date(x)) for a whole column (dd-mm-yyyy)"""
+    parsed = parse_date_series(values)
+    valid = parsed.notna().to_numpy()
+    day = parsed.dt.day.fillna(0).to_numpy(dtype=np.int64)
+    month = parsed.dt.month.fillna(0).to_numpy(dtype=np.int64)
+    year = parsed.dt.year.fillna(0).to_numpy(dtype=np.int64).astype(str)
+    
+    result = np.char.add(np.char.add(_TWO_DIGITS[day], '-'), np.char.add(_TWO_DIGITS[month], '-'))
+    result = np.char.add(result, year)
+    return pd.Series(np.where(valid, result, '').astype(object), index=parsed.index)
+
 def calculate_ev(planned_value, percent_complete):
     """Calculate Earned Value"""
     return (percent_complete / 100) * planned_value
@@ -375,14 +460,6 @@ def add_audit(action, module, detail=None):
     conn.commit()
     conn.close()
 
-def load_audit_trail(limit=100):
-    """Load audit trail"""
-    conn = sqlite3.connect(DB_NAME)
-    query = f"SELECT * FROM audit_trail ORDER BY timestamp DESC LIMIT {limit}"
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
-
 # ==================== DATABASE OPERATIONS ====================
 
 def get_user_by_username(username):
@@ -595,6 +672,111 @@ def sync_all_category_budgets(project_id):
     return new_total_budget
 
 
+# ==================== TYPEAHEAD LOOKUP ====================
+
+def _trigrams(text):
+    """Split text into the set of 3-character grams used by the typeahead index"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class TypeaheadIndex:
+    """In-memory prefix/trigram index over labels, returns best matching IDs"""
+    
+    def __init__(self, entries):
+        self.ids = []
+        self.texts = []
+        self.labels = {}
+        self.postings = {}
+        self.words = []
+        
+        for pos, (item_id, search_text, label) in enumerate(entries):
+            text = str(search_text or '').lower()
+            self.ids.append(item_id)
+            self.texts.append(text)
+            self.labels[item_id] = label
+            for gram in _trigrams(text):
+                self.postings.setdefault(gram, []).append(pos)
+            for word in set(text.split()):
+                self.words.append((word, pos))
+        
+        self.words.sort()
+    
+    def _prefix_candidates(self, query):
+        """Positions whose words start with a short (1-2 char) query"""
+        candidates = set()
+        i = bisect_left(self.words, (query,))
+        while i < len(self.words) and self.words[i][0].startswith(query):
+            candidates.add(self.words[i][1])
+            i += 1
+        return candidates
+    
+    def _trigram_candidates(self, query):
+        """Positions containing query as substring, via trigram posting intersection"""
+        grams = _trigrams(query)
+        postings = []
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if not posting:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+        
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                break
+        return {pos for pos in candidates if query in self.texts[pos]}
+    
+    def search(self, query, limit=TYPEAHEAD_LIMIT):
+        """Return up to `limit` IDs matching query, best matches first"""
+        query = (query or '').strip().lower()
+        if not query:
+            return self.ids[:limit]
+        
+        if len(query) < 3:
+            candidates = self._prefix_candidates(query)
+        else:
+            candidates = self._trigram_candidates(query)
+        
+        # Rank: prefix match first, then earliest match position, then shorter text
+        def rank(pos):
+            text = self.texts[pos]
+            return (not text.startswith(query), text.find(query), len(text), pos)
+        
+        return [self.ids[pos] for pos in heapq.nsmallest(limit, candidates, key=rank)]
+
+# Streamlit re-runs this script with fresh globals on every interaction, so the
+# indexes live in st.cache_resource: one instance per key, shared by all sessions
+@st.cache_resource(show_spinner=False)
+def get_budget_item_index(category_id):
+    """Typeahead index over budget estimation items of a category"""
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.execute(
+        "SELECT item_id, description, budget_price FROM cost_items WHERE category_id = ? AND is_budget_estimation = 1 ORDER BY date DESC",
+        (category_id,)
+    )
+    rows = c.fetchall()
+    conn.close()
+    return TypeaheadIndex([
+        (item_id, description, f"🔗 {description} ({format_currency(budget_price)})")
+        for item_id, description, budget_price in rows
+    ])
+
+@st.cache_resource(show_spinner=False)
+def get_vendor_index():
+    """Typeahead index over active vendors (code and name)"""
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.execute("SELECT vendor_id, vendor_code, vendor_name FROM vendors WHERE is_active = 1 ORDER BY vendor_name")
+    rows = c.fetchall()
+    conn.close()
+    return TypeaheadIndex([
+        (vendor_id, f"{vendor_code} {vendor_name}", f"{vendor_code} - {vendor_name}")
+        for vendor_id, vendor_code, vendor_name in rows
+    ])
+
+
 # ==================== LOGIN PAGE ====================
 
 def login_page():
@@ -1316,8 +1498,8 @@ def project_details_page():
                     """, unsafe_allow_html=True)
                     
                     display_df = df_budget_items[['date', 'description', 'unit', 'budget_price', 'notes']].copy()
-                    display_df['date'] = pd.to_datetime(display_df['date']).dt.strftime('%d-%m-%Y')
-                    display_df['budget_price'] = display_df['budget_price'].apply(lambda x: format_currency(x))
+                    display_df['date'] = format_date_series(display_df['date'])
+                    display_df['budget_price'] = format_currency_series(display_df['budget_price'])
                     display_df.columns = ['📅 Date', '📝 Description', '📦 Unit', '💰 Budget Price', '📄 Notes']
                     
                     st.dataframe(display_df, use_container_width=True, hide_index=True)
@@ -1386,6 +1568,7 @@ def project_details_page():
                                     
                                     # Auto-update category budget from items
                                     update_category_budget_from_items(category_id)
+                                    get_budget_item_index.clear(int(category_id))
                                     
                                     # Update project total budget
                                     sync_all_category_budgets(project_id)
@@ -1405,6 +1588,10 @@ def project_details_page():
                 df_actual = get_actual_spending_by_category(category_id)
                 
                 if not df_actual.empty:
+                    # Format display columns once for all cards
+                    df_actual['actual_date_display'] = format_date_series(df_actual['actual_date'])
+                    df_actual['actual_price_display'] = format_currency_series(df_actual['actual_price'])
+                    
                     # Display actual spending dengan card design yang lebih baik
                     for idx, actual in df_actual.iterrows():
                         is_planned = actual['is_planned'] == 1
@@ -1442,11 +1629,11 @@ def project_details_page():
                             <div style="display: grid; grid-template-columns: repeat(4, 1fr); gap: 1rem; margin-top: 1rem;">
                                 <div>
                                     <div style="font-size: 0.75rem; color: #636e72; font-weight: 600;">📅 DATE</div>
-                                    <div style="font-size: 0.95rem; color: #2d3436; font-weight: 600;">{pd.to_datetime(actual['actual_date']).strftime('%d-%m-%Y')}</div>
+                                    <div style="font-size: 0.95rem; color: #2d3436; font-weight: 600;">{actual['actual_date_display']}</div>
                                 </div>
                                 <div>
                                     <div style="font-size: 0.75rem; color: #636e72; font-weight: 600;">💰 AMOUNT</div>
-                                    <div style="font-size: 1.1rem; color: #f5576c; font-weight: 700;">{format_currency(actual['actual_price'])}</div>
+                                    <div style="font-size: 1.1rem; color: #f5576c; font-weight: 700;">{actual['actual_price_display']}</div>
                                 </div>
                                 <div>
                                     <div style="font-size: 0.75rem; color: #636e72; font-weight: 600;">🏢 VENDOR</div>
@@ -1498,6 +1685,15 @@ def project_details_page():
                 
                 # Add actual spending dengan design yang lebih baik
                 with st.expander("➕ Add New Actual Spending", expanded=False):
+                    # Search boxes live outside the form so typing refreshes the options
+                    col_search1, col_search2 = st.columns(2)
+                    with col_search1:
+                        budget_query = st.text_input("🔎 Search Budget Estimation", key=f"budget_search_{category_id}",
+                                                     placeholder="Type item description...")
+                    with col_search2:
+                        vendor_query = st.text_input("🔎 Search Vendor", key="vendor_search",
+                                                     placeholder="Type vendor code or name...")
+                    
                     with st.form("add_actual_form"):
                         st.markdown("""
                         <div style="background: #fff3cd; padding: 1rem; border-radius: 8px; border-left: 4px solid #ffc107; margin-bottom: 1rem;">
@@ -1514,36 +1710,26 @@ def project_details_page():
                             actual_price = st.number_input("💰 Actual Price (IDR) *", min_value=0.0, step=100000.0, format="%.0f")
                         
                         with col2:
-                            # Link to budget estimation
-                            df_budget_items = get_budget_estimation_items(category_id)
-                            
-                            link_options = ["⚠️ Unplanned (Not in budget estimation)"]
-                            budget_item_map = {}
-                            
-                            if not df_budget_items.empty:
-                                for _, item in df_budget_items.iterrows():
-                                    option_text = f"🔗 {item['description']} ({format_currency(item['budget_price'])})"
-                                    link_options.append(option_text)
-                                    budget_item_map[option_text] = item['item_id']
+                            # Link to budget estimation (top matches from cached index)
+                            budget_index = get_budget_item_index(int(category_id))
+                            budget_item_ids = budget_index.search(budget_query)
                             
                             link_to_budget = st.selectbox(
                                 "🔗 Link to Budget Estimation *",
-                                options=link_options,
+                                options=[None] + budget_item_ids,
+                                format_func=lambda item_id: "⚠️ Unplanned (Not in budget estimation)" if item_id is None else budget_index.labels[item_id],
                                 help="Pilih budget estimation item jika pengeluaran ini sudah direncanakan"
                             )
                             
                             # Vendor selection
-                            df_vendors = get_vendors()
-                            vendor_options = ["- No Vendor -"]
-                            vendor_map = {}
+                            vendor_index = get_vendor_index()
+                            vendor_ids = vendor_index.search(vendor_query)
                             
-                            if not df_vendors.empty:
-                                for _, vendor in df_vendors.iterrows():
-                                    vendor_text = f"{vendor['vendor_code']} - {vendor['vendor_name']}"
-                                    vendor_options.append(vendor_text)
-                                    vendor_map[vendor_text] = vendor['vendor_id']
-                            
-                            vendor_select = st.selectbox("🏢 Vendor", options=vendor_options)
+                            vendor_select = st.selectbox(
+                                "🏢 Vendor",
+                                options=[None] + vendor_ids,
+                                format_func=lambda vendor_id: "- No Vendor -" if vendor_id is None else vendor_index.labels[vendor_id]
+                            )
                             
                             invoice_number = st.text_input("📄 Invoice Number", placeholder="INV-2025-001")
                             payment_status = st.selectbox("💳 Payment Status", ["Pending", "Paid", "Partial"])
@@ -1563,9 +1749,9 @@ def project_details_page():
                                     now = datetime.now(WIB).strftime('%Y-%m-%d %H:%M:%S')
                                     
                                     # Determine if planned or unplanned
-                                    is_planned = 0 if link_to_budget == "⚠️ Unplanned (Not in budget estimation)" else 1
-                                    budget_item_id = budget_item_map.get(link_to_budget, None) if is_planned else None
-                                    vendor_id = vendor_map.get(vendor_select, None) if vendor_select != "- No Vendor -" else None
+                                    is_planned = 0 if link_to_budget is None else 1
+                                    budget_item_id = link_to_budget
+                                    vendor_id = vendor_select
                                     
                                     c.execute('''
                                         INSERT INTO actual_spending (
@@ -1700,6 +1886,7 @@ def vendor_management_page():
                         
                         conn.commit()
                         conn.close()
+                        get_vendor_index.clear()
                         
                         add_audit("create", "vendor", f"Added vendor: {vendor_code} - {vendor_name}")
                         st.success("✅ Vendor added successfully!")
@@ -2,10 +2,27 @@ import streamlit as st
 import pandas as pd
 import sqlite3
 import os
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import altair as alt
 import pytz
 import json
+import time
+import re
+import copy
+import math
+import numpy as np
+import threading
+import heapq
+import csv
+import io
+import zlib
+import tempfile
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_left
+from collections import OrderedDict
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # Timezone GMT+7 (WIB)
 WIB = pytz.timezone('Asia/Jakarta')
@@ -39,8 +56,125 @@ def format_date(date_obj):
         return date_obj.strftime('%d-%m-%Y')
     return str(date_obj)
 
+# Karakter yang dibuang dari nopol (setelah huruf besar) untuk membentuk nopol_key
+NOPOL_KEY_STRIP = re.compile(r'[^0-9A-Z]')
+
+def normalize_nopol(nopol):
+    """Normalisasi nopol jadi key: huruf besar tanpa spasi/tanda baca ("B 1234-xyz" -> "B1234XYZ")"""
+    return NOPOL_KEY_STRIP.sub('', str(nopol or '').upper())
+
+def normalize_nopol_column(series):
+    """normalize_nopol untuk satu kolom pandas (vectorized, aturan yang sama)"""
+    return series.str.upper().str.replace(NOPOL_KEY_STRIP, '', regex=True)
+
+def service_minutes(waktu_masuk, waktu_selesai):
+    """Durasi layanan (menit) dari kolom waktu HH:MM:SS; lewat tengah malam ditambah 24 jam, waktu kosong -> NaN"""
+    masuk = pd.to_timedelta(waktu_masuk.replace('', None), errors='coerce')
+    selesai = pd.to_timedelta(waktu_selesai.replace('', None), errors='coerce')
+    durasi = (selesai - masuk).dt.total_seconds() / 60
+    return durasi.where(durasi >= 0, durasi + 24 * 60)
+
+def format_date_column(series):
+    """Format kolom tanggal ISO (yyyy-mm-dd) ke dd-mm-yyyy untuk tampilan"""
+    series = series.astype(str)
+    return series.str.slice(8, 10) + '-' + series.str.slice(5, 7) + '-' + series.str.slice(0, 4)
+
 DB_NAME = "car_wash.db"
 
+# Outlet -> file database (satu database per outlet). Bisa diganti lewat env CAR_WASH_OUTLETS,
+# contoh: {"Pusat": "car_wash.db", "Cabang Timur": "car_wash_timur.db"}
+OUTLETS = json.loads(os.environ.get("CAR_WASH_OUTLETS") or "null") or {"Pusat": DB_NAME}
+
+# Journal lokal kasir (mode offline): file SQLite, jeda sinkron (detik) dan entri per batch
+JOURNAL_DB_NAME = "kasir_journal.db"
+JOURNAL_SYNC_INTERVAL = 2
+JOURNAL_SYNC_BATCH_SIZE = 200
+
+# Nama hari, urut date.weekday() (Senin=0)
+HARI = ['Senin', 'Selasa', 'Rabu', 'Kamis', 'Jumat', 'Sabtu', 'Minggu']
+
+# Prediksi permintaan: horizon & panjang riwayat (hari), dan minimal riwayat untuk fit
+FORECAST_HORIZON_DAYS = 14
+FORECAST_HISTORY_DAYS = 365
+FORECAST_MIN_HISTORY_DAYS = 28
+
+# Pengingat kunjungan ulang: interval default jika paket belum punya riwayat jarak kunjungan
+REMINDER_DEFAULT_INTERVAL_DAYS = 30
+
+# Interval (detik) rekonsiliasi counter KPI dashboard dengan database, dan transaksi terbaru
+# per tanggal yang disimpan counter untuk tabel "Transaksi Terbaru"
+KPI_RECONCILE_INTERVAL = 300
+KPI_RECENT_LIMIT = 10
+KPI_RECENT_COLUMNS = ['id', 'tanggal', 'waktu_masuk', 'nopol', 'nama_customer', 'paket_cuci', 'harga', 'status']
+
+# Papan antrian: interval refresh (detik), jumlah mobil selesai yang ditampilkan,
+# dan overlap cursor (ms) agar commit yang terlambat dalam rentang ini tetap terambil
+QUEUE_BOARD_REFRESH_SECONDS = 5
+QUEUE_BOARD_RECENT_LIMIT = 10
+QUEUE_BOARD_POLL_OVERLAP_MS = 2000
+
+# Lama (detik) hasil laporan konsolidasi semua outlet disimpan di cache
+CONSOLIDATED_CACHE_TTL = 60
+
+# Jumlah baris per batch saat migrasi data lama
+MIGRATION_BATCH_SIZE = 5000
+
+# Jumlah customer yang disimpan di cache lookup nopol (LRU, bersama semua sesi)
+CUSTOMER_CACHE_SIZE = 5000
+
+# Error relatif maksimum kuantil waktu layanan (1%)
+SKETCH_RELATIVE_ACCURACY = 0.01
+
+# Jumlah customer per halaman
+CUSTOMER_PAGE_SIZE = 50
+
+# Maksimum transaksi hasil pencarian barang tertinggal
+LOST_FOUND_LIMIT = 100
+
+# Fase checklist -> kolom JSON di wash_transactions (sekaligus key setting daftar item)
+CHECKLIST_PHASES = {
+    'datang': 'checklist_datang',
+    'selesai': 'checklist_selesai',
+}
+
+# Dimensi analitik QC -> ekspresi SQL
+QC_DIMENSIONS = {
+    'paket': 't.paket_cuci',
+    'staff': "COALESCE(NULLIF(t.created_by, ''), '-')",
+    'minggu': "strftime('%Y-W%W', t.tanggal)",
+}
+
+# Import customer: baris per batch transaksi, dan nama kolom file yang dikenali
+CUSTOMER_IMPORT_BATCH_SIZE = 1000
+CUSTOMER_IMPORT_COLUMNS = {
+    'nopol': ['nopol', 'nomor polisi', 'no polisi', 'plat', 'plat nomor'],
+    'nama_customer': ['nama_customer', 'nama customer', 'nama', 'customer'],
+    'no_telp': ['no_telp', 'no telp', 'telp', 'telepon', 'no. telepon', 'hp'],
+    'alamat': ['alamat'],
+}
+
+# Export CSV: baris per fetchmany
+EXPORT_CHUNK_SIZE = 2000
+
+# Jumlah baris audit trail per halaman; hitungan dengan filter teks/tanggal dibatasi sampai AUDIT_COUNT_CAP
+AUDIT_PAGE_SIZE = 50
+AUDIT_COUNT_CAP = 10000
+
+# Default jumlah bay cuci & estimasi durasi paket tanpa riwayat (menit)
+DEFAULT_JUMLAH_BAY = 2
+DEFAULT_SERVICE_MINUTES = 30
+
+# Dimensi statistik waktu layanan -> kolom sumber
+SERVICE_TIME_DIMENSIONS = {
+    'paket': 'paket_cuci',
+    'staff': 'created_by',
+    'jam': 'jam_masuk',
+}
+
+# Retry saat database sedang dikunci kasir lain
+DB_BUSY_RETRIES = 5
+DB_BUSY_DELAY = 0.05
+
 # Paket Cucian (akan diload dari database)
 PAKET_CUCIAN = {
     "Cuci Reguler": 50000,
@@ -71,10 +205,44 @@ DEFAULT_CHECKLIST_SELESAI = [
 ]
 
 # --- Database Setup ---
+# --- Routing Database Outlet ---
+_db_context = threading.local()
+
+def get_db_name():
+    """File database outlet aktif: override di thread ini, outlet pilihan sesi, atau outlet pertama"""
+    db_name = getattr(_db_context, 'db_name', None)
+    if db_name:
+        return db_name
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        outlet = st.session_state.get("outlet")
+        if outlet in OUTLETS:
+            return OUTLETS[outlet]
+    return next(iter(OUTLETS.values()))
+
+@contextmanager
+def using_db(db_name):
+    """Arahkan semua query di thread ini ke db_name (untuk fan-out & worker tanpa sesi Streamlit)"""
+    previous = getattr(_db_context, 'db_name', None)
+    _db_context.db_name = db_name
+    try:
+        yield
+    finally:
+        _db_context.db_name = previous
+
+def init_outlets():
+    """Buat tabel & jalankan migrasi untuk database setiap outlet"""
+    for db_name in OUTLETS.values():
+        with using_db(db_name):
+            init_db()
+            migrate_db()
+
 def init_db():
-    conn = sqlite3.connect(DB_NAME)
+    conn = sqlite3.connect(get_db_name())
     c = conn.cursor()
     
+    # WAL: pembaca tidak memblokir penulis saat beberapa kasir aktif bersamaan
+    c.execute("PRAGMA journal_mode=WAL")
+    
     # Tabel customers - database pelanggan
     c.execute('''
         CREATE TABLE IF NOT EXISTS customers (
@@ -108,6 +276,116 @@ def init_db():
         )
     ''')
     
+    # tanggal disimpan ISO (yyyy-mm-dd) sehingga urutan teks = urutan tanggal
+    c.execute("CREATE INDEX IF NOT EXISTS idx_wash_tanggal_masuk ON wash_transactions (tanggal, waktu_masuk)")
+    # Partial index antrian: ukurannya sebanding dengan jumlah mobil yang sedang dicuci
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_wash_dalam_proses ON wash_transactions (tanggal, waktu_masuk)
+        WHERE status = 'Dalam Proses'
+    """)
+    # Partial index riwayat selesai: get_finished_transactions (tanpa pencarian) & papan antrian
+    # membaca "Selesai terbaru" langsung dari urutan index ini, tanpa sort seluruh tabel
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_wash_selesai ON wash_transactions (tanggal, waktu_masuk)
+        WHERE status = 'Selesai'
+    """)
+    
+    # Rollup pendapatan harian, diupdate bersamaan dengan transaksi
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS daily_revenue (
+            tanggal TEXT NOT NULL,
+            paket_cuci TEXT NOT NULL,
+            status TEXT NOT NULL,
+            jumlah INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tanggal, paket_cuci, status)
+        )
+    ''')
+    
+    # Matriks kedatangan per bulan: hari (Senin=0) x jam masuk, jumlah & pendapatan
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS arrival_matrix (
+            bulan TEXT NOT NULL,
+            weekday INTEGER NOT NULL,
+            jam INTEGER NOT NULL,
+            jumlah INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (bulan, weekday, jam)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Statistik seumur hidup per customer (per nopol_key), diupdate setiap transaksi
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS customer_stats (
+            nopol_key TEXT PRIMARY KEY,
+            kunjungan INTEGER NOT NULL DEFAULT 0,
+            total_belanja INTEGER NOT NULL DEFAULT 0,
+            kunjungan_pertama TEXT,
+            kunjungan_terakhir TEXT,
+            paket_favorit TEXT,
+            rata_interval_hari REAL
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS customer_paket_stats (
+            nopol_key TEXT NOT NULL,
+            paket_cuci TEXT NOT NULL,
+            jumlah INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (nopol_key, paket_cuci)
+        )
+    ''')
+    # Sketch kuantil waktu layanan per paket / staff / jam masuk
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS service_time_sketches (
+            dimensi TEXT NOT NULL,
+            nilai TEXT NOT NULL,
+            sketch TEXT NOT NULL,
+            PRIMARY KEY (dimensi, nilai)
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_customer_stats_belanja ON customer_stats (total_belanja)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_customer_stats_kunjungan ON customer_stats (kunjungan)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_customer_stats_terakhir ON customer_stats (kunjungan_terakhir)")
+    
+    # Pengingat kunjungan berikutnya per customer + rata-rata jarak kunjungan per paket (fallback)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS customer_reminders (
+            nopol_key TEXT PRIMARY KEY,
+            kunjungan_terakhir TEXT NOT NULL,
+            paket_terakhir TEXT NOT NULL,
+            jatuh_tempo TEXT NOT NULL,
+            dihubungi_pada TEXT
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_customer_reminders_jatuh_tempo ON customer_reminders (jatuh_tempo)")
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS paket_interval (
+            paket_cuci TEXT PRIMARY KEY,
+            total_hari INTEGER NOT NULL DEFAULT 0,
+            jumlah INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    # Hasil checklist ternormalisasi: satu baris per transaksi x item (dicentang atau tidak)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS checklist_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phase TEXT NOT NULL,
+            nama TEXT NOT NULL,
+            UNIQUE (phase, nama)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS checklist_results (
+            transaction_id INTEGER NOT NULL,
+            checklist_item_id INTEGER NOT NULL,
+            phase TEXT NOT NULL,
+            checked INTEGER NOT NULL,
+            PRIMARY KEY (transaction_id, checklist_item_id)
+        ) WITHOUT ROWID
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_checklist_results_item ON checklist_results (checklist_item_id, checked)")
+    
     # Tabel audit trail
     c.execute('''
         CREATE TABLE IF NOT EXISTS audit_trail (
@@ -119,6 +397,16 @@ def init_db():
         )
     ''')
     
+    # Jumlah record audit per (user, action), dijaga trigger: daftar user & ringkasan tanpa scan audit_trail
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS audit_action_counts (
+            user TEXT NOT NULL,
+            action TEXT NOT NULL,
+            jumlah INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user, action)
+        ) WITHOUT ROWID
+    ''')
+    
     # Tabel settings - untuk konfigurasi toko
     c.execute('''
         CREATE TABLE IF NOT EXISTS settings (
@@ -157,175 +445,2057 @@ def init_db():
     conn.commit()
     conn.close()
 
+# --- Migrasi Database ---
+def _migrate_iso_tanggal(conn, batch_size=MIGRATION_BATCH_SIZE):
+    """Ubah tanggal wash_transactions lama dari dd-mm-yyyy ke yyyy-mm-dd, per batch id"""
+    c = conn.cursor()
+    c.execute("SELECT MIN(id), MAX(id) FROM wash_transactions")
+    min_id, max_id = c.fetchone()
+    if min_id is None:
+        return
+    
+    for start_id in range(min_id, max_id + 1, batch_size):
+        c.execute("""
+            UPDATE wash_transactions
+            SET tanggal = substr(tanggal, 7, 4) || '-' || substr(tanggal, 4, 2) || '-' || substr(tanggal, 1, 2)
+            WHERE id >= ? AND id < ?
+              AND tanggal GLOB '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]'
+        """, (start_id, start_id + batch_size))
+        conn.commit()
+
+def _migrate_nopol_key(conn, batch_size=MIGRATION_BATCH_SIZE):
+    """Tambah kolom nopol_key (nopol ternormalisasi) di customers beserta unique index"""
+    c = conn.cursor()
+    c.execute("PRAGMA table_info(customers)")
+    if 'nopol_key' not in [column[1] for column in c.fetchall()]:
+        c.execute("ALTER TABLE customers ADD COLUMN nopol_key TEXT")
+        conn.commit()
+    
+    # Nopol yang sama setelah normalisasi = kendaraan yang sama: customer terlama memegang key,
+    # duplikatnya digabung ke sana (data kosong dilengkapi, transaksi dipindah ke nopol pemegang key)
+    c.execute("SELECT nopol_key, id, nopol FROM customers WHERE nopol_key IS NOT NULL")
+    holders = {key: (cust_id, nopol) for key, cust_id, nopol in c.fetchall()}
+    last_id = 0
+    while True:
+        c.execute("""
+            SELECT id, nopol, nama_customer, no_telp, alamat FROM customers
+            WHERE id > ? AND nopol_key IS NULL
+            ORDER BY id LIMIT ?
+        """, (last_id, batch_size))
+        rows = c.fetchall()
+        if not rows:
+            break
+        updates = []
+        merges = []
+        for cust_id, nopol, nama_customer, no_telp, alamat in rows:
+            key = normalize_nopol(nopol)
+            if not key:
+                continue
+            holder = holders.get(key)
+            if holder is None:
+                holders[key] = (cust_id, nopol)
+                updates.append((key, cust_id))
+            else:
+                merges.append((holder, cust_id, nopol, nama_customer, no_telp, alamat))
+        c.executemany("UPDATE customers SET nopol_key = ? WHERE id = ?", updates)
+        for (holder_id, holder_nopol), cust_id, nopol, nama_customer, no_telp, alamat in merges:
+            c.execute("""
+                UPDATE customers SET
+                    nama_customer = COALESCE(NULLIF(TRIM(nama_customer), ''), ?),
+                    no_telp = COALESCE(NULLIF(TRIM(no_telp), ''), ?),
+                    alamat = COALESCE(NULLIF(TRIM(alamat), ''), ?)
+                WHERE id = ?
+            """, (nama_customer, no_telp, alamat, holder_id))
+            c.execute("UPDATE wash_transactions SET nopol = ? WHERE nopol = ?", (holder_nopol, nopol))
+            c.execute("DELETE FROM customers WHERE id = ?", (cust_id,))
+        conn.commit()
+        last_id = rows[-1][0]
+    
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_customers_nopol_key ON customers (nopol_key)")
+
+def _migrate_iso_audit_timestamp(conn, batch_size=MIGRATION_BATCH_SIZE):
+    """Ubah timestamp audit_trail dari dd-mm-yyyy HH:MM:SS ke yyyy-mm-dd HH:MM:SS agar bisa diurutkan di SQL"""
+    c = conn.cursor()
+    c.execute("SELECT MIN(id), MAX(id) FROM audit_trail")
+    min_id, max_id = c.fetchone()
+    if min_id is not None:
+        for start_id in range(min_id, max_id + 1, batch_size):
+            c.execute("""
+                UPDATE audit_trail
+                SET timestamp = substr(timestamp, 7, 4) || '-' || substr(timestamp, 4, 2) || '-'
+                                || substr(timestamp, 1, 2) || substr(timestamp, 11)
+                WHERE id >= ? AND id < ?
+                  AND timestamp GLOB '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]*'
+            """, (start_id, start_id + batch_size))
+            conn.commit()
+    
+    c.execute("CREATE INDEX IF NOT EXISTS idx_audit_user_timestamp ON audit_trail (user, timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON audit_trail (timestamp)")
+
+def _rebuild_audit_action_counts(conn):
+    """Isi ulang audit_action_counts dari audit_trail dan pasang trigger penambahnya"""
+    c = conn.cursor()
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS audit_trail_count_ai AFTER INSERT ON audit_trail BEGIN
+            INSERT INTO audit_action_counts (user, action, jumlah) VALUES (new.user, new.action, 1)
+            ON CONFLICT (user, action) DO UPDATE SET jumlah = jumlah + 1;
+        END
+    """)
+    c.execute("DELETE FROM audit_action_counts")
+    c.execute("""
+        INSERT INTO audit_action_counts (user, action, jumlah)
+        SELECT user, action, COUNT(*) FROM audit_trail GROUP BY user, action
+    """)
+    conn.commit()
+
+def _create_customer_fts(conn):
+    """Index FTS5 trigram atas customers (nopol, nama, telp, alamat), disinkronkan lewat trigger"""
+    c = conn.cursor()
+    try:
+        c.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5(
+                nopol_key, nopol, nama_customer, no_telp, alamat,
+                content='customers', content_rowid='id', tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError:
+        # SQLite tanpa FTS5/trigram: pencarian customer memakai LIKE
+        return
+    c.executescript("""
+        CREATE TRIGGER IF NOT EXISTS customers_fts_ai AFTER INSERT ON customers BEGIN
+            INSERT INTO customers_fts (rowid, nopol_key, nopol, nama_customer, no_telp, alamat)
+            VALUES (new.id, new.nopol_key, new.nopol, new.nama_customer, new.no_telp, new.alamat);
+        END;
+        CREATE TRIGGER IF NOT EXISTS customers_fts_ad AFTER DELETE ON customers BEGIN
+            INSERT INTO customers_fts (customers_fts, rowid, nopol_key, nopol, nama_customer, no_telp, alamat)
+            VALUES ('delete', old.id, old.nopol_key, old.nopol, old.nama_customer, old.no_telp, old.alamat);
+        END;
+        CREATE TRIGGER IF NOT EXISTS customers_fts_au AFTER UPDATE ON customers BEGIN
+            INSERT INTO customers_fts (customers_fts, rowid, nopol_key, nopol, nama_customer, no_telp, alamat)
+            VALUES ('delete', old.id, old.nopol_key, old.nopol, old.nama_customer, old.no_telp, old.alamat);
+            INSERT INTO customers_fts (rowid, nopol_key, nopol, nama_customer, no_telp, alamat)
+            VALUES (new.id, new.nopol_key, new.nopol, new.nama_customer, new.no_telp, new.alamat);
+        END;
+    """)
+    c.execute("INSERT INTO customers_fts (customers_fts) VALUES ('rebuild')")
+    conn.commit()
+
+def _create_transactions_fts(conn):
+    """Index FTS5 trigram atas wash_transactions (nopol, qc_barang, catatan), disinkronkan lewat trigger"""
+    c = conn.cursor()
+    try:
+        c.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+                nopol, qc_barang, catatan,
+                content='wash_transactions', content_rowid='id', tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError:
+        # SQLite tanpa FTS5/trigram: pencarian barang tertinggal memakai LIKE
+        return
+    c.executescript("""
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON wash_transactions BEGIN
+            INSERT INTO transactions_fts (rowid, nopol, qc_barang, catatan)
+            VALUES (new.id, new.nopol, new.qc_barang, new.catatan);
+        END;
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON wash_transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, nopol, qc_barang, catatan)
+            VALUES ('delete', old.id, old.nopol, old.qc_barang, old.catatan);
+        END;
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_au AFTER UPDATE OF nopol, qc_barang, catatan ON wash_transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, nopol, qc_barang, catatan)
+            VALUES ('delete', old.id, old.nopol, old.qc_barang, old.catatan);
+            INSERT INTO transactions_fts (rowid, nopol, qc_barang, catatan)
+            VALUES (new.id, new.nopol, new.qc_barang, new.catatan);
+        END;
+    """)
+    c.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+    conn.commit()
+
+def _migrate_checklist_results(conn, batch_size=MIGRATION_BATCH_SIZE, include_unchecked=False):
+    """Isi checklist_results dari kolom JSON checklist lama, per batch id.
+    
+    Default hanya item yang tercatat di JSON tiap transaksi (dicentang): daftar item saat transaksi
+    lama dibuat tidak diketahui, jadi item setting hari ini tidak dianggap "tidak dicentang".
+    """
+    c = conn.cursor()
+    c.execute("SELECT MIN(id), MAX(id) FROM wash_transactions")
+    min_id, max_id = c.fetchone()
+    if min_id is None:
+        return
+    
+    for start_id in range(min_id, max_id + 1, batch_size):
+        for phase in CHECKLIST_PHASES:
+            _save_checklist_results(c, phase, start_id, start_id + batch_size - 1, include_unchecked)
+        conn.commit()
+
+def _migrate_client_key(conn):
+    """Tambah kolom client_key (key idempoten dari journal kasir) di wash_transactions"""
+    c = conn.cursor()
+    c.execute("PRAGMA table_info(wash_transactions)")
+    if 'client_key' not in [column[1] for column in c.fetchall()]:
+        c.execute("ALTER TABLE wash_transactions ADD COLUMN client_key TEXT")
+        conn.commit()
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_wash_client_key ON wash_transactions (client_key)")
+
+def _migrate_audit_client_key(conn):
+    """Tambah kolom client_key di audit_trail supaya replay entri journal 'audit' tidak menggandakan record"""
+    c = conn.cursor()
+    c.execute("PRAGMA table_info(audit_trail)")
+    if 'client_key' not in [column[1] for column in c.fetchall()]:
+        c.execute("ALTER TABLE audit_trail ADD COLUMN client_key TEXT")
+        conn.commit()
+    # Partial: hanya record dari journal yang punya client_key
+    c.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_audit_client_key ON audit_trail (client_key)
+        WHERE client_key IS NOT NULL
+    """)
+
+def _migrate_updated_at(conn):
+    """Tambah kolom updated_at (epoch ms) di wash_transactions, diisi trigger setiap insert/update"""
+    c = conn.cursor()
+    c.execute("PRAGMA table_info(wash_transactions)")
+    if 'updated_at' not in [column[1] for column in c.fetchall()]:
+        c.execute("ALTER TABLE wash_transactions ADD COLUMN updated_at INTEGER NOT NULL DEFAULT 0")
+        conn.commit()
+    c.execute("CREATE INDEX IF NOT EXISTS idx_wash_updated_at ON wash_transactions (updated_at)")
+    # Trigger berlaku untuk semua penulis (termasuk sinkron journal); recursive_triggers default off
+    now_ms = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS wash_transactions_touch_ai AFTER INSERT ON wash_transactions BEGIN
+            UPDATE wash_transactions SET updated_at = {now_ms} WHERE id = new.id;
+        END
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS wash_transactions_touch_au AFTER UPDATE ON wash_transactions BEGIN
+            UPDATE wash_transactions SET updated_at = {now_ms} WHERE id = new.id;
+        END
+    """)
+
+def _create_wash_nopol_index(conn):
+    """Index riwayat per kendaraan: transaksi satu/lebih nopol (History Customer) tanpa scan tabel"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_wash_nopol_tanggal ON wash_transactions (nopol, tanggal, waktu_masuk)")
+
+def _rebuild_daily_revenue(conn):
+    """Hitung ulang seluruh rollup daily_revenue dari wash_transactions"""
+    c = conn.cursor()
+    c.execute("DELETE FROM daily_revenue")
+    c.execute("""
+        INSERT INTO daily_revenue (tanggal, paket_cuci, status, jumlah, total)
+        SELECT tanggal, paket_cuci, status, COUNT(*), SUM(harga)
+        FROM wash_transactions
+        GROUP BY tanggal, paket_cuci, status
+    """)
+    conn.commit()
+
+def _rebuild_arrival_matrix(conn):
+    """Hitung ulang matriks kedatangan bulanan (hari x jam) dari wash_transactions"""
+    c = conn.cursor()
+    c.execute("DELETE FROM arrival_matrix")
+    c.execute("""
+        INSERT INTO arrival_matrix (bulan, weekday, jam, jumlah, total)
+        SELECT substr(tanggal, 1, 7), (CAST(strftime('%w', tanggal) AS INTEGER) + 6) % 7,
+               CAST(substr(waktu_masuk, 1, 2) AS INTEGER), COUNT(*), SUM(harga)
+        FROM wash_transactions
+        WHERE strftime('%w', tanggal) IS NOT NULL
+          AND waktu_masuk GLOB '[0-2][0-9]*' AND CAST(substr(waktu_masuk, 1, 2) AS INTEGER) < 24
+        GROUP BY 1, 2, 3
+    """)
+    conn.commit()
+
+def _rebuild_customer_stats(conn):
+    """Hitung ulang customer_stats & customer_paket_stats dari seluruh riwayat (groupby pandas)"""
+    df = pd.read_sql("SELECT nopol, tanggal, paket_cuci, harga FROM wash_transactions", conn)
+    df['nopol_key'] = normalize_nopol_column(df['nopol'])
+    df = df[df['nopol_key'] != '']
+    
+    paket = df.groupby(['nopol_key', 'paket_cuci']).size().reset_index(name='jumlah')
+    favorit = (paket.sort_values(['nopol_key', 'jumlah', 'paket_cuci'], ascending=[True, False, True])
+                    .drop_duplicates('nopol_key')
+                    .set_index('nopol_key')['paket_cuci'])
+    
+    stats = df.groupby('nopol_key').agg(
+        kunjungan=('tanggal', 'size'),
+        total_belanja=('harga', 'sum'),
+        kunjungan_pertama=('tanggal', 'min'),
+        kunjungan_terakhir=('tanggal', 'max')
+    )
+    stats['paket_favorit'] = favorit
+    # Rata-rata jarak antar kunjungan = rentang hari / (kunjungan - 1)
+    rentang = (pd.to_datetime(stats['kunjungan_terakhir'], format='%Y-%m-%d')
+               - pd.to_datetime(stats['kunjungan_pertama'], format='%Y-%m-%d')).dt.days
+    stats['rata_interval_hari'] = (rentang / (stats['kunjungan'] - 1)).where(stats['kunjungan'] > 1)
+    stats = stats.reset_index()
+    stats = stats.astype(object).where(stats.notna(), None)
+    
+    c = conn.cursor()
+    c.execute("DELETE FROM customer_stats")
+    c.execute("DELETE FROM customer_paket_stats")
+    c.executemany("""
+        INSERT INTO customer_stats (nopol_key, kunjungan, total_belanja, kunjungan_pertama,
+                                    kunjungan_terakhir, paket_favorit, rata_interval_hari)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, stats[['nopol_key', 'kunjungan', 'total_belanja', 'kunjungan_pertama',
+                'kunjungan_terakhir', 'paket_favorit', 'rata_interval_hari']].itertuples(index=False, name=None))
+    c.executemany("INSERT INTO customer_paket_stats (nopol_key, paket_cuci, jumlah) VALUES (?, ?, ?)",
+                  paket.astype(object).itertuples(index=False, name=None))
+    conn.commit()
+
+def _rebuild_customer_reminders(conn):
+    """Hitung ulang jatuh tempo kunjungan semua customer dalam satu pass vectorized.
+    
+    Kunjungan diurutkan per (nopol_key, tanggal) sehingga jarak antar kunjungan = np.diff pada
+    baris bersebelahan milik customer yang sama; jarak diatribusikan ke paket kunjungan sebelumnya.
+    """
+    df = pd.read_sql("SELECT nopol, tanggal, paket_cuci FROM wash_transactions ORDER BY id", conn)
+    df['nopol_key'] = normalize_nopol_column(df['nopol'])
+    df['hari'] = (pd.to_datetime(df['tanggal'], format='%Y-%m-%d', errors='coerce') - pd.Timestamp('1970-01-01')).dt.days
+    df = df[(df['nopol_key'] != '') & df['hari'].notna()].sort_values(['nopol_key', 'hari'], kind='stable')
+    c = conn.cursor()
+    if df.empty:
+        c.execute("DELETE FROM customer_reminders")
+        c.execute("DELETE FROM paket_interval")
+        conn.commit()
+        return
+    
+    keys = df['nopol_key'].to_numpy()
+    hari = df['hari'].to_numpy(dtype=np.int64)
+    paket = df['paket_cuci'].to_numpy()
+    sama = keys[1:] == keys[:-1]
+    awal = np.flatnonzero(np.r_[True, ~sama])
+    akhir = np.r_[awal[1:], len(keys)] - 1
+    
+    # Rata-rata jarak per paket (paket kunjungan sebelum jarak tersebut)
+    jarak = pd.DataFrame({'paket_cuci': paket[:-1][sama], 'hari': np.diff(hari)[sama]})
+    per_paket = jarak.groupby('paket_cuci')['hari'].agg(['sum', 'count']).reset_index()
+    
+    kunjungan = akhir - awal + 1
+    interval = pd.Series((hari[akhir] - hari[awal]) / np.maximum(kunjungan - 1, 1)).where(kunjungan > 1)
+    interval_paket = (per_paket.set_index('paket_cuci')['sum'] / per_paket.set_index('paket_cuci')['count'])
+    interval = interval.fillna(pd.Series(paket[akhir]).map(interval_paket)).fillna(REMINDER_DEFAULT_INTERVAL_DAYS)
+    jatuh_tempo = pd.Timestamp('1970-01-01') + pd.to_timedelta(hari[akhir] + interval.round().to_numpy(), unit='D')
+    
+    c.execute("DELETE FROM paket_interval")
+    c.executemany("INSERT INTO paket_interval (paket_cuci, total_hari, jumlah) VALUES (?, ?, ?)",
+                  per_paket.astype(object).itertuples(index=False, name=None))
+    # dihubungi_pada dipertahankan untuk customer yang sudah pernah di-follow-up
+    dihubungi = dict(c.execute("SELECT nopol_key, dihubungi_pada FROM customer_reminders WHERE dihubungi_pada IS NOT NULL"))
+    c.execute("DELETE FROM customer_reminders")
+    c.executemany("""
+        INSERT INTO customer_reminders (nopol_key, kunjungan_terakhir, paket_terakhir, jatuh_tempo, dihubungi_pada)
+        VALUES (?, ?, ?, ?, ?)
+    """, zip(keys[akhir], df['tanggal'].to_numpy()[akhir], paket[akhir],
+             jatuh_tempo.strftime('%Y-%m-%d'), (dihubungi.get(key) for key in keys[akhir])))
+    conn.commit()
+
+def _rebuild_service_time_sketches(conn):
+    """Bangun ulang sketch waktu layanan dari semua transaksi selesai (durasi & bucket dihitung vectorized)"""
+    df = pd.read_sql("""
+        SELECT paket_cuci, created_by, waktu_masuk, waktu_selesai
+        FROM wash_transactions WHERE status = 'Selesai'
+    """, conn)
+    df['durasi'] = service_minutes(df['waktu_masuk'], df['waktu_selesai'])
+    df = df.dropna(subset=['durasi'])
+    df['created_by'] = df['created_by'].fillna('').replace('', '-')
+    df['jam_masuk'] = df['waktu_masuk'].str.slice(0, 2)
+    df['bucket'] = QuantileSketch.bucket_indexes(df['durasi'])
+    
+    rows = []
+    for dimensi, kolom in SERVICE_TIME_DIMENSIONS.items():
+        sketches = {}
+        counts = df.groupby([kolom, 'bucket'], dropna=False).size()
+        for (nilai, bucket), jumlah in counts.items():
+            sketch = sketches.setdefault(nilai, QuantileSketch())
+            if pd.isna(bucket):
+                sketch.zero_count += int(jumlah)
+            else:
+                sketch.buckets[int(bucket)] = int(jumlah)
+        rows.extend((dimensi, nilai, sketch.to_json()) for nilai, sketch in sketches.items())
+    
+    c = conn.cursor()
+    c.execute("DELETE FROM service_time_sketches")
+    c.executemany("INSERT INTO service_time_sketches (dimensi, nilai, sketch) VALUES (?, ?, ?)", rows)
+    conn.commit()
+
+# Daftar migrasi berurutan, versi disimpan di PRAGMA user_version
+MIGRATIONS = [
+    _migrate_iso_tanggal,
+    _migrate_nopol_key,
+    _rebuild_daily_revenue,
+    _rebuild_customer_stats,
+    _rebuild_service_time_sketches,
+    _migrate_iso_audit_timestamp,
+    _create_customer_fts,
+    _migrate_checklist_results,
+    _migrate_client_key,
+    _migrate_updated_at,
+    _rebuild_arrival_matrix,
+    _rebuild_customer_reminders,
+    _create_transactions_fts,
+    # Diulang: gabungkan customer duplikat yang dulu dibiarkan tanpa nopol_key
+    _migrate_nopol_key,
+    _rebuild_audit_action_counts,
+    _create_wash_nopol_index,
+    _migrate_audit_client_key,
+]
+
+def migrate_db():
+    """Jalankan migrasi yang belum diterapkan ke database"""
+    conn = sqlite3.connect(get_db_name())
+    c = conn.cursor()
+    version = c.execute("PRAGMA user_version").fetchone()[0]
+    
+    for target_version, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        migration(conn)
+        c.execute(f"PRAGMA user_version = {target_version}")
+        conn.commit()
+    
+    conn.close()
+
+def rebuild_derived_tables():
+    """Hitung ulang semua tabel turunan (rollup, statistik, sketch, checklist) dari wash_transactions.
+    
+    Dipakai setelah data dimasukkan langsung ke tabel sumber tanpa write helper (bulk load, data uji).
+    """
+    conn = sqlite3.connect(get_db_name())
+    _rebuild_daily_revenue(conn)
+    _rebuild_arrival_matrix(conn)
+    _rebuild_customer_stats(conn)
+    _rebuild_customer_reminders(conn)
+    _rebuild_service_time_sketches(conn)
+    # Data bulk load dibuat dengan daftar item setting saat ini, jadi item yang tidak ada = tidak dicentang
+    _migrate_checklist_results(conn, include_unchecked=True)
+    conn.close()
+    get_customer_cache().invalidate()
+    get_kpi_counters().invalidate()
+
+
+# --- Simpan & Load Customer ---
+class CustomerCache:
+    """Cache customer per nopol_key (LRU) dan index prefix nopol untuk autocomplete, dipakai semua sesi"""
+    
+    def __init__(self, db_name, max_size=CUSTOMER_CACHE_SIZE):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.records = OrderedDict()
+        self.prefix_keys = None
+        self.prefix_nopols = None
+    
+    def get(self, key):
+        """Return (ditemukan_di_cache, record); record None berarti customer memang tidak ada"""
+        with self.lock:
+            if key not in self.records:
+                return False, None
+            self.records.move_to_end(key)
+            return True, self.records[key]
+    
+    def put(self, key, record):
+        with self.lock:
+            self.records[key] = record
+            self.records.move_to_end(key)
+            while len(self.records) > self.max_size:
+                self.records.popitem(last=False)
+    
+    def invalidate(self, key=None, nopol=None):
+        """Hapus satu key dari cache (atau semua jika key None) dan update index prefix"""
+        with self.lock:
+            if key is None:
+                self.records.clear()
+                self.prefix_keys = None
+                self.prefix_nopols = None
+                return
+            self.records.pop(key, None)
+            if self.prefix_keys is not None and nopol is not None:
+                pos = bisect_left(self.prefix_keys, key)
+                if pos == len(self.prefix_keys) or self.prefix_keys[pos] != key:
+                    self.prefix_keys.insert(pos, key)
+                    self.prefix_nopols.insert(pos, nopol)
+    
+    def suggest(self, prefix_key, limit):
+        """Nopol yang key-nya diawali prefix_key; index dimuat sekali dari database"""
+        with self.lock:
+            if self.prefix_keys is None:
+                conn = sqlite3.connect(self.db_name)
+                c = conn.cursor()
+                c.execute("SELECT nopol_key, nopol FROM customers WHERE nopol_key IS NOT NULL ORDER BY nopol_key")
+                rows = c.fetchall()
+                conn.close()
+                self.prefix_keys = [row[0] for row in rows]
+                self.prefix_nopols = [row[1] for row in rows]
+            
+            suggestions = []
+            pos = bisect_left(self.prefix_keys, prefix_key)
+            while pos < len(self.prefix_keys) and len(suggestions) < limit:
+                if not self.prefix_keys[pos].startswith(prefix_key):
+                    break
+                suggestions.append(self.prefix_nopols[pos])
+                pos += 1
+            return suggestions
+
+# Streamlit mengeksekusi ulang script ini (dengan globals baru) setiap rerun, jadi objek
+# yang dipakai bersama semua sesi disimpan lewat st.cache_resource, satu instance per proses
+@st.cache_resource(show_spinner=False)
+def _customer_cache_for(db_name):
+    return CustomerCache(db_name)
+
+def get_customer_cache():
+    """CustomerCache milik database outlet aktif"""
+    return _customer_cache_for(get_db_name())
+
+def _insert_customer(c, nopol, nama, telp, alamat, created_at):
+    """Insert satu customer di cursor c (tanpa commit); IntegrityError jika nopol sudah terdaftar"""
+    c.execute("""
+        INSERT INTO customers (nopol, nopol_key, nama_customer, no_telp, alamat, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (nopol.strip().upper(), normalize_nopol(nopol), nama, telp, alamat, created_at))
+
+def save_customer(nopol, nama, telp, alamat, offline=False):
+    """Simpan data customer baru; offline=True hanya mencatat ke journal lokal (sinkron di background)"""
+    nopol_key = normalize_nopol(nopol)
+    if not nopol_key:
+        return False, "Nopol tidak valid"
+    created_at = datetime.now(WIB).strftime("%d-%m-%Y %H:%M:%S")
+    if offline:
+        journal_append('customer', {'nopol': nopol, 'nama_customer': nama, 'no_telp': telp,
+                                    'alamat': alamat, 'created_at': created_at})
+        return True, "Customer dicatat di journal kasir, disinkronkan otomatis"
+    
+    conn = sqlite3.connect(get_db_name())
+    c = conn.cursor()
+    try:
+        _insert_customer(c, nopol, nama, telp, alamat, created_at)
+        counters = get_kpi_counters()
+        counters.commit(conn, counters.record_customer)
+        get_customer_cache().invalidate(nopol_key, nopol.strip().upper())
+        return True, "Customer berhasil ditambahkan"
+    except sqlite3.IntegrityError:
+        return False, "Nopol sudah terdaftar"
+    except Exception as e:
+        return False, f"Error: {str(e)}"
+    finally:
+        conn.close()
+
+def get_customer_by_nopol(nopol):
+    """Ambil data customer berdasarkan nopol (ternormalisasi, lewat cache)"""
+    nopol_key = normalize_nopol(nopol)
+    if not nopol_key:
+        return None
+    
+    cached, record = get_customer_cache().get(nopol_key)
+    if not cached:
+        conn = sqlite3.connect(get_db_name())
+        c = conn.cursor()
+        c.execute("""
+            SELECT id, nopol, nama_customer, no_telp, alamat, created_at
+            FROM customers WHERE nopol_key = ?
+        """, (nopol_key,))
+        result = c.fetchone()
+        conn.close()
+        record = None
+        if result:
+            record = {
+                'id': result[0],
+                'nopol': result[1],
+                'nama_customer': result[2],
+                'no_telp': result[3],
+                'alamat': result[4],
+                'created_at': result[5]
+            }
+        get_customer_cache().put(nopol_key, record)
+    
+    return dict(record) if record else None
+
+def suggest_nopol(prefix, limit=5):
+    """Saran nopol terdaftar yang diawali prefix (untuk autocomplete)"""
+    prefix_key = normalize_nopol(prefix)
+    if not prefix_key:
+        return []
+    return get_customer_cache().suggest(prefix_key, limit)
+
+# Urutan daftar customer -> ORDER BY (kolom customer_stats ber-index)
+CUSTOMER_SORT_OPTIONS = {
+    "Terbaru Terdaftar": "c.id DESC",
+    "Total Belanja": "s.total_belanja DESC",
+    "Jumlah Kunjungan": "s.kunjungan DESC",
+    "Kunjungan Terakhir": "s.kunjungan_terakhir DESC",
+}
+
+def _customer_search_clause(conn, query):
+    """Klausa pencarian customer: (JOIN, WHERE, ORDER BY ranking atau None, params).
+    
+    Query >= 3 karakter memakai FTS5 trigram (substring di nopol, nama, telp, alamat
+    dan nopol ternormalisasi, diurutkan bm25); query pendek atau tanpa FTS5 memakai prefix LIKE.
+    """
+    query = query.strip()
+    key = normalize_nopol(query)
+    has_fts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'customers_fts'"
+    ).fetchone() is not None
+    
+    if has_fts and (len(query) >= 3 or len(key) >= 3):
+        terms = []
+        if len(query) >= 3:
+            terms.append('"' + query.replace('"', '""') + '"')
+        if len(key) >= 3:
+            terms.append(f'nopol_key : "{key}"')
+        return ("JOIN customers_fts f ON f.rowid = c.id", "customers_fts MATCH ?", "f.rank",
+                [' OR '.join(terms)])
+    if has_fts:
+        return "", "(c.nopol_key LIKE ? OR c.nama_customer LIKE ?)", None, [f"{key}%", f"{query}%"]
+    # Tanpa FTS5: substring LIKE biasa
+    return "", "(c.nopol_key LIKE ? OR c.nama_customer LIKE ? OR c.no_telp LIKE ? OR c.alamat LIKE ?)", None, \
+        [f"%{key}%"] + [f"%{query}%"] * 3
+
+def _customer_list_sql(conn, sort_by, min_kunjungan, search):
+    """FROM/WHERE, ORDER BY dan parameter daftar customer (relevansi dulu jika ada `search`).
+    
+    Dengan filter kunjungan, query digerakkan dari customer_stats (inner join) supaya filter &
+    urutan memakai index statistik; tanpa filter semua customer ikut (termasuk yang belum pernah cuci).
+    """
+    join, where, params = "", [], []
+    order = CUSTOMER_SORT_OPTIONS[sort_by]
+    if search and search.strip():
+        join, search_where, rank, search_params = _customer_search_clause(conn, search)
+        where.append(search_where)
+        params += search_params
+        if rank:
+            order = f"{rank}, {order}"
+    if min_kunjungan > 0:
+        source = "customer_stats s JOIN customers c ON c.nopol_key = s.nopol_key"
+        where.insert(0, "s.kunjungan >= ?")
+        params.insert(0, min_kunjungan)
+    else:
+        source = "customers c LEFT JOIN customer_stats s ON s.nopol_key = c.nopol_key"
+    base = f"""
+        FROM {source}
+        {join}
+        WHERE {' AND '.join(where) or '1'}
+    """
+    return base, order, params
+
+def count_customers_with_stats(min_kunjungan=0, search=None):
+    """Jumlah customer yang lolos filter kunjungan & pencarian"""
+    conn = sqlite3.connect(get_db_name())
+    base, _, params = _customer_list_sql(conn, "Terbaru Terdaftar", min_kunjungan, search)
+    total = conn.execute(f"SELECT COUNT(*) {base}", params).fetchone()[0]
+    conn.close()
+    return total
+
+def get_customers_with_stats(sort_by="Terbaru Terdaftar", min_kunjungan=0, search=None,
+                             page=1, page_size=CUSTOMER_PAGE_SIZE):
+    """Ambil satu halaman customer beserta statistik seumur hidupnya; cari, urut & filter di SQL"""
+    conn = sqlite3.connect(get_db_name())
+    base, order, params = _customer_list_sql(conn, sort_by, min_kunjungan, search)
+    df = pd.read_sql(f"""
+        SELECT c.*, COALESCE(s.kunjungan, 0) AS kunjungan, COALESCE(s.total_belanja, 0) AS total_belanja,
+               s.kunjungan_pertama, s.kunjungan_terakhir, s.paket_favorit, s.rata_interval_hari
+        {base}
+        ORDER BY {order}
+        LIMIT ? OFFSET ?
+    """, conn, params=params + [page_size, (page - 1) * page_size])
+    conn.close()
+    return df
+
+def search_lost_items(query, limit=LOST_FOUND_LIMIT):
+    """Transaksi yang qc_barang, catatan atau nopol-nya cocok dengan query, terbaru dulu.
+    
+    Setiap kata >= 3 karakter harus ada (substring, FTS5 trigram); hasil diurutkan dari rowid
+    (id transaksi) terbesar sehingga LIMIT berhenti di transaksi terbaru tanpa mengurutkan semua hasil.
+    Query tanpa kata >= 3 karakter atau SQLite tanpa FTS5 memakai LIKE.
+    """
+    columns = """t.id, t.tanggal, t.waktu_masuk, t.waktu_selesai, t.nopol, t.nama_customer,
+                 t.paket_cuci, t.qc_barang, t.catatan, t.status"""
+    words = query.split()
+    conn = sqlite3.connect(get_db_name())
+    has_fts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+    ).fetchone() is not None
+    
+    if has_fts and any(len(word) >= 3 for word in words):
+        match = ' '.join('"' + word.replace('"', '""') + '"' for word in words if len(word) >= 3)
+        df = pd.read_sql(f"""
+            SELECT {columns}
+            FROM (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ? ORDER BY rowid DESC LIMIT ?) f
+            JOIN wash_transactions t ON t.id = f.rowid
+            ORDER BY t.id DESC
+        """, conn, params=(match, limit))
+    else:
+        where = " AND ".join(["(t.qc_barang LIKE ? OR t.catatan LIKE ? OR t.nopol LIKE ?)"] * len(words)) or "1"
+        params = [f"%{word}%" for word in words for _ in range(3)]
+        df = pd.read_sql(f"""
+            SELECT {columns} FROM wash_transactions t
+            WHERE {where}
+            ORDER BY t.id DESC
+            LIMIT ?
+        """, conn, params=params + [limit])
+    conn.close()
+    return df
+
+# Customer lewat jatuh tempo yang belum di-follow-up sejak jatuh tempo terakhirnya
+OVERDUE_WHERE = "r.jatuh_tempo < ? AND (r.dihubungi_pada IS NULL OR r.dihubungi_pada < r.jatuh_tempo)"
+
+def count_overdue_customers():
+    """Jumlah customer di antrian follow-up (lewat jatuh tempo kunjungan)"""
+    conn = sqlite3.connect(get_db_name())
+    today = datetime.now(WIB).date().isoformat()
+    total = conn.execute(f"SELECT COUNT(*) FROM customer_reminders r WHERE {OVERDUE_WHERE}", (today,)).fetchone()[0]
+    conn.close()
+    return total
+
+def get_overdue_customers(page=1, page_size=CUSTOMER_PAGE_SIZE):
+    """Satu halaman antrian follow-up; yang baru lewat jatuh tempo dulu (paling mungkin kembali)"""
+    conn = sqlite3.connect(get_db_name())
+    today = datetime.now(WIB).date().isoformat()
+    df = pd.read_sql(f"""
+        SELECT r.nopol_key, COALESCE(c.nopol, r.nopol_key) AS nopol, c.nama_customer, c.no_telp,
+               r.kunjungan_terakhir, r.paket_terakhir, r.jatuh_tempo,
+               CAST(julianday(?) - julianday(r.jatuh_tempo) AS INTEGER) AS terlambat_hari,
+               COALESCE(s.kunjungan, 0) AS kunjungan
+        FROM customer_reminders r
+        LEFT JOIN customers c ON c.nopol_key = r.nopol_key
+        LEFT JOIN customer_stats s ON s.nopol_key = r.nopol_key
+        WHERE {OVERDUE_WHERE}
+        ORDER BY r.jatuh_tempo DESC
+        LIMIT ? OFFSET ?
+    """, conn, params=(today, today, page_size, (page - 1) * page_size))
+    conn.close()
+    return df
+
+def mark_customer_followed_up(nopol_keys):
+    """Tandai customer sudah dihubungi hari ini; keluar dari antrian sampai jatuh tempo berikutnya"""
+    conn = sqlite3.connect(get_db_name())
+    c = conn.cursor()
+    try:
+        today = datetime.now(WIB).date().isoformat()
+        c.executemany("UPDATE customer_reminders SET dihubungi_pada = ? WHERE nopol_key = ?",
+                      [(today, key) for key in nopol_keys])
+        conn.commit()
+        return True, f"{len(nopol_keys)} customer ditandai sudah dihubungi"
+    except Exception as e:
+        return False, f"Error: {str(e)}"
+    finally:
+        conn.close()
+
+def _iter_import_rows(file, file_name, chunk_size):
+    """Baca file CSV/Excel customer per chunk DataFrame (semua kolom teks)"""
+    if file_name.lower().endswith(('.xlsx', '.xlsm')):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("Import Excel membutuhkan paket openpyxl")
+        sheet = load_workbook(file, read_only=True, data_only=True).active
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(value or '').strip() for value in next(rows, [])]
+        chunk = []
+        for row in rows:
+            chunk.append(['' if value is None else str(value) for value in row[:len(header)]])
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    else:
+        yield from pd.read_csv(file, dtype=str, keep_default_na=False, chunksize=chunk_size,
+                               sep=None, engine='python')
+
+def _map_import_columns(df):
+    """Ganti nama kolom file ke kolom customers memakai CUSTOMER_IMPORT_COLUMNS"""
+    lookup = {alias: column for column, aliases in CUSTOMER_IMPORT_COLUMNS.items() for alias in aliases}
+    df = df.rename(columns=lambda name: lookup.get(str(name).strip().lower(), name))
+    if 'nopol' not in df.columns or 'nama_customer' not in df.columns:
+        raise ValueError("File harus punya kolom Nopol dan Nama")
+    for column in ['no_telp', 'alamat']:
+        if column not in df.columns:
+            df[column] = ''
+    return df[list(CUSTOMER_IMPORT_COLUMNS)].fillna('').astype(str).apply(lambda col: col.str.strip())
+
+def import_customers(file, file_name, update_existing=True, batch_size=CUSTOMER_IMPORT_BATCH_SIZE, progress=None):
+    """Import customer dari CSV/Excel secara streaming, upsert per batch lewat unique index nopol_key.
+    
+    Nopol dinormalisasi, duplikat di dalam file dilewati (baris pertama menang). Customer yang sudah
+    ada diperbarui jika update_existing, selain itu dibiarkan. `progress(jumlah_baris)` dipanggil
+    setiap batch. Return dict ringkasan: total, baru, diperbarui, dilewati, rejects (list dict).
+    """
+    result = {'total': 0, 'baru': 0, 'diperbarui': 0, 'dilewati': 0, 'rejects': []}
+    seen_keys = set()
+    now = datetime.now(WIB).strftime("%d-%m-%Y %H:%M:%S")
+    if update_existing:
+        on_conflict = """
+            ON CONFLICT (nopol_key) DO UPDATE SET
+                nama_customer = excluded.nama_customer,
+                no_telp = COALESCE(NULLIF(excluded.no_telp, ''), no_telp),
+                alamat = COALESCE(NULLIF(excluded.alamat, ''), alamat)
+            ON CONFLICT DO NOTHING
+        """
+    else:
+        on_conflict = "ON CONFLICT DO NOTHING"
+    
+    conn = sqlite3.connect(get_db_name())
+    c = conn.cursor()
+    try:
+        for chunk in _iter_import_rows(file, file_name, batch_size):
+            df = _map_import_columns(chunk).reset_index(drop=True)
+            baris_awal = result['total'] + 2  # nomor baris di file: 1-based, setelah header
+            result['total'] += len(df)
+            df['nopol_key'] = normalize_nopol_column(df['nopol'])
+            df['nopol'] = df['nopol'].str.upper()
+            
+            alasan = pd.Series('', index=df.index)
+            alasan[df['nama_customer'] == ''] = "Nama kosong"
+            alasan[df['nopol_key'] == ''] = "Nopol tidak valid"
+            duplikat = df['nopol_key'].duplicated() | df['nopol_key'].isin(seen_keys)
+            alasan[(alasan == '') & duplikat] = "Duplikat dalam file"
+            for idx in alasan[alasan != ''].index:
+                result['rejects'].append({'baris': baris_awal + idx, 'nopol': df.at[idx, 'nopol'],
+                                          'nama': df.at[idx, 'nama_customer'], 'alasan': alasan[idx]})
+            
+            valid = df[alasan == '']
+            seen_keys.update(valid['nopol_key'])
+            if valid.empty:
+                continue
+            
+            keys = valid['nopol_key'].tolist()
+            count_keys = f"SELECT COUNT(*) FROM customers WHERE nopol_key IN ({', '.join('?' * len(keys))})"
+            sudah_ada = c.execute(count_keys, keys).fetchone()[0]
+            c.executemany(f"""
+                INSERT INTO customers (nopol, nopol_key, nama_customer, no_telp, alamat, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                {on_conflict}
+            """, [(row.nopol, row.nopol_key, row.nama_customer, row.no_telp, row.alamat, now)
+                  for row in valid.itertuples(index=False)])
+            baru = c.execute(count_keys, keys).fetchone()[0] - sudah_ada
+            conn.commit()
+            
+            # Key yang sudah ada selalu diperbarui oleh upsert; sisanya bentrok nopol lama (dilewati)
+            diperbarui = sudah_ada if update_existing else 0
+            result['baru'] += baru
+            result['diperbarui'] += diperbarui
+            result['dilewati'] += len(valid) - baru - diperbarui
+            if progress:
+                progress(result['total'])
+    finally:
+        conn.close()
+        get_customer_cache().invalidate()
+        get_kpi_counters().invalidate()
+    return result
+
+# --- Simpan & Load Transaksi ---
+def _add_daily_revenue(c, tanggal, paket_cuci, status, jumlah, total):
+    """Tambah (atau kurangi) jumlah & total di rollup daily_revenue, di transaksi yang sama"""
+    c.execute("""
+        INSERT INTO daily_revenue (tanggal, paket_cuci, status, jumlah, total)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (tanggal, paket_cuci, status) DO UPDATE SET
+            jumlah = jumlah + excluded.jumlah,
+            total = total + excluded.total
+    """, (tanggal, paket_cuci, status, jumlah, total))
+
+def _add_arrival(c, tanggal, waktu_masuk, harga):
+    """Tambah satu kedatangan ke sel hari x jam di arrival_matrix bulan tanggal tersebut"""
+    try:
+        weekday = date.fromisoformat(tanggal).weekday()
+        jam = int(waktu_masuk[:2])
+    except (TypeError, ValueError):
+        return
+    if not 0 <= jam < 24:
+        return
+    c.execute("""
+        INSERT INTO arrival_matrix (bulan, weekday, jam, jumlah, total)
+        VALUES (?, ?, ?, 1, ?)
+        ON CONFLICT (bulan, weekday, jam) DO UPDATE SET
+            jumlah = jumlah + 1,
+            total = total + excluded.total
+    """, (tanggal[:7], weekday, jam, harga))
+
+def _add_customer_visit(c, nopol, tanggal, paket_cuci, harga):
+    """Update customer_stats secara incremental untuk satu kunjungan baru"""
+    nopol_key = normalize_nopol(nopol)
+    if not nopol_key:
+        return
+    c.execute("""
+        INSERT INTO customer_paket_stats (nopol_key, paket_cuci, jumlah) VALUES (?, ?, 1)
+        ON CONFLICT (nopol_key, paket_cuci) DO UPDATE SET jumlah = jumlah + 1
+    """, (nopol_key, paket_cuci))
+    c.execute("""
+        INSERT INTO customer_stats (nopol_key, kunjungan, total_belanja, kunjungan_pertama, kunjungan_terakhir)
+        VALUES (?, 1, ?, ?, ?)
+        ON CONFLICT (nopol_key) DO UPDATE SET
+            kunjungan = kunjungan + 1,
+            total_belanja = total_belanja + excluded.total_belanja,
+            kunjungan_pertama = MIN(kunjungan_pertama, excluded.kunjungan_pertama),
+            kunjungan_terakhir = MAX(kunjungan_terakhir, excluded.kunjungan_terakhir)
+    """, (nopol_key, harga, tanggal, tanggal))
+    c.execute("""
+        UPDATE customer_stats SET
+            paket_favorit = (
+                SELECT paket_cuci FROM customer_paket_stats
+                WHERE nopol_key = customer_stats.nopol_key
+                ORDER BY jumlah DESC, paket_cuci LIMIT 1
+            ),
+            rata_interval_hari = CASE WHEN kunjungan > 1
+                THEN (julianday(kunjungan_terakhir) - julianday(kunjungan_pertama)) / (kunjungan - 1)
+            END
+        WHERE nopol_key = ?
+    """, (nopol_key,))
+
+def _update_customer_reminder(c, nopol, tanggal, paket_cuci):
+    """Update jatuh tempo kunjungan berikutnya satu customer (setelah _add_customer_visit).
+    
+    Interval = rata-rata jarak kunjungan customer, atau rata-rata jarak paket terakhirnya jika baru
+    sekali datang. Kunjungan bertanggal mundur tidak dihitung ke rata-rata paket (dirapikan saat rebuild).
+    """
+    nopol_key = normalize_nopol(nopol)
+    if not nopol_key:
+        return
+    c.execute("SELECT kunjungan_terakhir, paket_terakhir FROM customer_reminders WHERE nopol_key = ?", (nopol_key,))
+    previous = c.fetchone()
+    if previous and tanggal < previous[0]:
+        return
+    if previous:
+        jarak = (date.fromisoformat(tanggal) - date.fromisoformat(previous[0])).days
+        c.execute("""
+            INSERT INTO paket_interval (paket_cuci, total_hari, jumlah) VALUES (?, ?, 1)
+            ON CONFLICT (paket_cuci) DO UPDATE SET total_hari = total_hari + excluded.total_hari, jumlah = jumlah + 1
+        """, (previous[1], jarak))
+    
+    c.execute("""
+        SELECT COALESCE(
+            (SELECT rata_interval_hari FROM customer_stats WHERE nopol_key = ?),
+            (SELECT 1.0 * total_hari / jumlah FROM paket_interval WHERE paket_cuci = ? AND jumlah > 0),
+            ?
+        )
+    """, (nopol_key, paket_cuci, REMINDER_DEFAULT_INTERVAL_DAYS))
+    interval = c.fetchone()[0]
+    jatuh_tempo = (date.fromisoformat(tanggal) + timedelta(days=round(interval))).isoformat()
+    c.execute("""
+        INSERT INTO customer_reminders (nopol_key, kunjungan_terakhir, paket_terakhir, jatuh_tempo)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (nopol_key) DO UPDATE SET
+            kunjungan_terakhir = excluded.kunjungan_terakhir,
+            paket_terakhir = excluded.paket_terakhir,
+            jatuh_tempo = excluded.jatuh_tempo
+    """, (nopol_key, tanggal, paket_cuci, jatuh_tempo))
+
+def _save_checklist_results(c, phase, first_id, last_id, include_unchecked=True):
+    """Tulis checklist_results satu fase untuk transaksi id first_id..last_id, seluruhnya di SQL.
+    
+    Item yang ada di JSON transaksi = dicentang; dengan include_unchecked, item di daftar setting
+    yang tidak ada di JSON = tidak dicentang. Transaksi tanpa JSON checklist valid dilewati.
+    """
+    column = CHECKLIST_PHASES[phase]
+    c.execute(f"""
+        INSERT OR IGNORE INTO checklist_items (phase, nama)
+        SELECT ?, value FROM json_each((SELECT setting_value FROM settings WHERE setting_key = ?))
+        UNION
+        SELECT ?, j.value FROM wash_transactions t, json_each(t.{column}) j
+        WHERE t.id BETWEEN ? AND ? AND json_valid(t.{column})
+    """, (phase, column, phase, first_id, last_id))
+    c.execute(f"""
+        INSERT OR REPLACE INTO checklist_results (transaction_id, checklist_item_id, phase, checked)
+        SELECT t.id, i.id, ?, 1
+        FROM wash_transactions t, json_each(t.{column}) j
+        JOIN checklist_items i ON i.phase = ? AND i.nama = j.value
+        WHERE t.id BETWEEN ? AND ? AND json_valid(t.{column})
+    """, (phase, phase, first_id, last_id))
+    if not include_unchecked:
+        return
+    c.execute(f"""
+        INSERT OR IGNORE INTO checklist_results (transaction_id, checklist_item_id, phase, checked)
+        SELECT t.id, i.id, ?, 0
+        FROM wash_transactions t,
+             json_each((SELECT setting_value FROM settings WHERE setting_key = ?)) cfg
+        JOIN checklist_items i ON i.phase = ? AND i.nama = cfg.value
+        WHERE t.id BETWEEN ? AND ? AND json_valid(t.{column})
+    """, (phase, column, phase, first_id, last_id))
+
+def _insert_transaction(c, data, client_key=None):
+    """INSERT transaksi + update rollup di cursor c (tanpa commit).
+    
+    Return id transaksi baru, atau None jika client_key sudah pernah tersimpan (replay journal).
+    """
+    c.execute("""
+        INSERT INTO wash_transactions 
+        (nopol, nama_customer, tanggal, waktu_masuk, waktu_selesai, paket_cuci, harga, 
+         checklist_datang, checklist_selesai, qc_barang, catatan, status, created_by, client_key)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (client_key) DO NOTHING
+    """, (
+        data['nopol'].upper(),
+        data['nama_customer'],
+        data['tanggal'],
+        data['waktu_masuk'],
+        data.get('waktu_selesai', ''),
+        data['paket_cuci'],
+        data['harga'],
+        data.get('checklist_datang', ''),
+        data.get('checklist_selesai', ''),
+        data.get('qc_barang', ''),
+        data.get('catatan', ''),
+        data.get('status', 'Dalam Proses'),
+        data.get('created_by', ''),
+        client_key
+    ))
+    if c.rowcount == 0:
+        return None
+    trans_id = c.lastrowid
+    _add_daily_revenue(c, data['tanggal'], data['paket_cuci'], data.get('status', 'Dalam Proses'), 1, data['harga'])
+    _add_arrival(c, data['tanggal'], data['waktu_masuk'], data['harga'])
+    _add_customer_visit(c, data['nopol'], data['tanggal'], data['paket_cuci'], data['harga'])
+    _update_customer_reminder(c, data['nopol'], data['tanggal'], data['paket_cuci'])
+    _save_checklist_results(c, 'datang', trans_id, trans_id)
+    return trans_id
+
+def _finish_transaction(c, trans_id, waktu_selesai, checklist_selesai, qc_barang, catatan):
+    """UPDATE compare-and-set transaksi ke 'Selesai' + update rollup di cursor c (tanpa commit).
+    
+    Return (tanggal, paket_cuci, harga) jika baris ini yang mengubah status, None jika transaksi
+    tidak 'Dalam Proses'.
+    """
+    # Satu UPDATE bersyarat: jika dua kasir bersamaan, hanya satu yang mengubah baris
+    c.execute("""
+        UPDATE wash_transactions 
+        SET waktu_selesai = ?, checklist_selesai = ?, qc_barang = ?, 
+            catatan = ?, status = 'Selesai'
+        WHERE id = ? AND status = 'Dalam Proses'
+    """, (waktu_selesai, checklist_selesai, qc_barang, catatan, trans_id))
+    if c.rowcount != 1:
+        return None
+    
+    # Pindahkan transaksi di rollup dari 'Dalam Proses' ke 'Selesai'
+    c.execute("""
+        SELECT tanggal, paket_cuci, harga, waktu_masuk, created_by
+        FROM wash_transactions WHERE id = ?
+    """, (trans_id,))
+    tanggal, paket_cuci, harga, waktu_masuk, created_by = c.fetchone()
+    _add_daily_revenue(c, tanggal, paket_cuci, 'Dalam Proses', -1, -harga)
+    _add_daily_revenue(c, tanggal, paket_cuci, 'Selesai', 1, harga)
+    _add_service_time(c, paket_cuci, created_by, waktu_masuk, waktu_selesai)
+    _save_checklist_results(c, 'selesai', trans_id, trans_id)
+    return tanggal, paket_cuci, harga
+
+def save_transaction(data, offline=False):
+    """Simpan transaksi cuci mobil; offline=True hanya mencatat ke journal lokal (sinkron di background)"""
+    if offline:
+        journal_append('save', data)
+        return True, "Transaksi dicatat di journal kasir, disinkronkan otomatis"
+    
+    conn = sqlite3.connect(get_db_name())
+    c = conn.cursor()
+    try:
+        trans_id = _insert_transaction(c, data)
+        counters = get_kpi_counters()
+        counters.commit(conn, counters.record_transaction, trans_id, data)
+        return True, "Transaksi berhasil disimpan"
+    except Exception as e:
+        return False, f"Error: {str(e)}"
+    finally:
+        conn.close()
+
+def _is_db_busy(error):
+    """Cek apakah error SQLite karena database sedang dikunci"""
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+def update_transaction_finish(trans_id, waktu_selesai, checklist_selesai, qc_barang, catatan, offline=False):
+    """Update transaksi saat selesai cuci (compare-and-set: hanya jika masih 'Dalam Proses').
+    
+    offline=True hanya mencatat ke journal lokal; status diterapkan saat sinkron.
+    """
+    trans_id = int(trans_id)
+    if offline:
+        journal_append('finish', {
+            'trans_id': trans_id,
+            'waktu_selesai': waktu_selesai,
+            'checklist_selesai': checklist_selesai,
+            'qc_barang': qc_barang,
+            'catatan': catatan,
+        })
+        return True, "Penyelesaian dicatat di journal kasir, disinkronkan otomatis"
+    
+    for attempt in range(DB_BUSY_RETRIES):
+        conn = sqlite3.connect(get_db_name())
+        c = conn.cursor()
+        try:
+            finished = _finish_transaction(c, trans_id, waktu_selesai, checklist_selesai, qc_barang, catatan)
+            if finished:
+                counters = get_kpi_counters()
+                counters.commit(conn, counters.record_finish, trans_id, *finished)
+                return True, "Transaksi berhasil diselesaikan"
+            
+            conn.rollback()
+            c.execute("SELECT status FROM wash_transactions WHERE id = ?", (trans_id,))
+            result = c.fetchone()
+            if not result:
+                return False, f"Transaksi ID {trans_id} tidak ditemukan di database"
+            return False, f"Transaksi berstatus '{result[0].strip()}', tidak bisa diselesaikan"
+        
+        except sqlite3.OperationalError as e:
+            if _is_db_busy(e) and attempt < DB_BUSY_RETRIES - 1:
+                time.sleep(DB_BUSY_DELAY * (2 ** attempt))
+                continue
+            return False, f"Error: {str(e)}"
+        except Exception as e:
+            return False, f"Error: {str(e)}"
+        finally:
+            conn.close()
+
+# --- Counter KPI Dashboard ---
+class KpiCounters:
+    """Counter KPI per tanggal (transaksi, pendapatan, status, per paket, transaksi terbaru)
+    + jumlah customer, dipakai semua sesi.
+    
+    Tanggal di-seed dari SQL saat pertama dibaca. Write helper meng-commit lewat commit(), yang
+    memegang lock yang sama dengan seed: seed selalu terjadi sebelum commit (delta ditambahkan)
+    atau sesudah delta diterapkan (seed menggantikannya), jadi tidak pernah terhitung dua kali.
+    Semua counter di-seed ulang dari SQL setiap KPI_RECONCILE_INTERVAL detik atau setelah
+    invalidate(), supaya tulisan dari proses lain tetap ikut terhitung.
+    """
+    
+    def __init__(self, db_name, reconcile_interval=KPI_RECONCILE_INTERVAL):
+        self.db_name = db_name
+        self.reconcile_interval = reconcile_interval
+        # RLock: record_* dipanggil di dalam commit() yang sudah memegang lock
+        self.lock = threading.RLock()
+        self.days = {}
+        self.total_customer = None
+        self.seeded_at = None
+    
+    def _seed_day(self, conn, tanggal):
+        day = {'jumlah': 0, 'pendapatan': 0, 'Selesai': 0, 'Dalam Proses': 0, 'paket': {}}
+        for paket_cuci, status, jumlah, total in conn.execute("""
+            SELECT paket_cuci, status, jumlah, total FROM daily_revenue WHERE tanggal = ?
+        """, (tanggal,)):
+            day['jumlah'] += jumlah
+            day['pendapatan'] += total
+            day[status] = day.get(status, 0) + jumlah
+            day['paket'][(paket_cuci, status)] = [jumlah, total]
+        day['recent'] = [dict(zip(KPI_RECENT_COLUMNS, row)) for row in conn.execute(f"""
+            SELECT {', '.join(KPI_RECENT_COLUMNS)} FROM wash_transactions
+            WHERE tanggal = ? ORDER BY waktu_masuk DESC, id DESC LIMIT ?
+        """, (tanggal, KPI_RECENT_LIMIT))]
+        self.days[tanggal] = day
+    
+    def snapshot(self, tanggal):
+        """Salinan KPI untuk tanggal (yyyy-mm-dd); seed/rekonsiliasi dari SQL hanya bila perlu.
+        
+        'revenue' = baris (paket_cuci, status, jumlah, total) seperti daily_revenue,
+        'recent' = KPI_RECENT_LIMIT transaksi terbaru (dict per baris, kolom KPI_RECENT_COLUMNS).
+        """
+        with self.lock:
+            stale = self.seeded_at is None or time.monotonic() - self.seeded_at > self.reconcile_interval
+            if stale or tanggal not in self.days:
+                conn = sqlite3.connect(self.db_name)
+                if stale:
+                    tanggal_seeded = set(self.days) | {tanggal}
+                    self.days = {}
+                    for seeded in tanggal_seeded:
+                        self._seed_day(conn, seeded)
+                    self.total_customer = conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+                    self.seeded_at = time.monotonic()
+                else:
+                    self._seed_day(conn, tanggal)
+                conn.close()
+            day = self.days[tanggal]
+            return {
+                'jumlah': day['jumlah'],
+                'pendapatan': day['pendapatan'],
+                'Selesai': day['Selesai'],
+                'Dalam Proses': day['Dalam Proses'],
+                'total_customer': self.total_customer,
+                'revenue': [(paket_cuci, status, jumlah, total)
+                            for (paket_cuci, status), (jumlah, total) in day['paket'].items() if jumlah],
+                'recent': [dict(row) for row in day['recent']],
+            }
+    
+    def commit(self, conn, record, *args):
+        """Commit conn lalu record(*args), keduanya di bawah lock seed.
+        
+        Data sudah tersimpan begitu commit berhasil: error di record() tidak diteruskan ke pemanggil,
+        counter cukup ditandai basi supaya di-seed ulang dari SQL.
+        """
+        with self.lock:
+            conn.commit()
+            try:
+                record(*args)
+            except Exception:
+                self.invalidate()
+    
+    def record_transaction(self, trans_id, data):
+        with self.lock:
+            day = self.days.get(data['tanggal'])
+            # Tanggal yang belum di-seed akan dihitung dari SQL saat pertama dibaca
+            if day is None:
+                return
+            status = data.get('status', 'Dalam Proses')
+            day['jumlah'] += 1
+            day['pendapatan'] += data['harga']
+            day[status] = day.get(status, 0) + 1
+            paket = day['paket'].setdefault((data['paket_cuci'], status), [0, 0])
+            paket[0] += 1
+            paket[1] += data['harga']
+            
+            row = {column: data.get(column) for column in KPI_RECENT_COLUMNS}
+            row.update(id=trans_id, nopol=data['nopol'].upper(), status=status)
+            day['recent'].append(row)
+            day['recent'].sort(key=lambda r: (r['waktu_masuk'], r['id']), reverse=True)
+            del day['recent'][KPI_RECENT_LIMIT:]
+    
+    def record_finish(self, trans_id, tanggal, paket_cuci, harga):
+        with self.lock:
+            day = self.days.get(tanggal)
+            if day is None:
+                return
+            day['Dalam Proses'] -= 1
+            day['Selesai'] += 1
+            proses = day['paket'].setdefault((paket_cuci, 'Dalam Proses'), [0, 0])
+            proses[0] -= 1
+            proses[1] -= harga
+            selesai = day['paket'].setdefault((paket_cuci, 'Selesai'), [0, 0])
+            selesai[0] += 1
+            selesai[1] += harga
+            for row in day['recent']:
+                if row['id'] == trans_id:
+                    row['status'] = 'Selesai'
+    
+    def record_customer(self, jumlah=1):
+        with self.lock:
+            if self.total_customer is not None:
+                self.total_customer += jumlah
+    
+    def invalidate(self):
+        """Paksa rekonsiliasi dari SQL pada pembacaan berikutnya"""
+        with self.lock:
+            self.seeded_at = None
+
+@st.cache_resource(show_spinner=False)
+def _kpi_counters_for(db_name):
+    return KpiCounters(db_name)
+
+def get_kpi_counters(db_name=None):
+    """KpiCounters milik database outlet aktif (atau db_name)"""
+    return _kpi_counters_for(db_name or get_db_name())
+
+# --- Journal Offline Kasir ---
+def _journal_connect(journal_db=None):
+    """Koneksi ke journal lokal (dibuat jika belum ada)"""
+    conn = sqlite3.connect(journal_db or JOURNAL_DB_NAME)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS journal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_key TEXT UNIQUE NOT NULL,
+            db_name TEXT NOT NULL,
+            operation TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            error TEXT,
+            created_at TEXT NOT NULL,
+            synced_at TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_pending ON journal (id) WHERE status = 'pending'")
+    return conn
+
+def journal_append(operation, payload, journal_db=None):
+    """Catat operasi ('save' / 'finish' / 'customer' / 'audit') untuk database outlet aktif ke journal lokal; return client_key"""
+    client_key = uuid.uuid4().hex
+    conn = _journal_connect(journal_db)
+    conn.execute("""
+        INSERT INTO journal (client_key, db_name, operation, payload, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (client_key, get_db_name(), operation, json.dumps(payload),
+          datetime.now(WIB).strftime("%Y-%m-%d %H:%M:%S")))
+    conn.commit()
+    conn.close()
+    notify_journal_sync()
+    return client_key
+
+def journal_pending_count(journal_db=None):
+    """Jumlah entri journal yang belum tersinkron"""
+    conn = _journal_connect(journal_db)
+    total = conn.execute("SELECT COUNT(*) FROM journal WHERE status = 'pending'").fetchone()[0]
+    conn.close()
+    return total
+
+def _apply_journal_entry(c, client_key, operation, payload):
+    """Terapkan satu entri journal di cursor database tujuan; return pesan error atau None.
+    
+    Idempoten: 'save' dan 'audit' dilindungi client_key, 'finish' yang sudah Selesai dan 'customer'
+    yang sudah terdaftar dianggap sudah diterapkan.
+    """
+    if operation == 'save':
+        _insert_transaction(c, payload, client_key)
+        return None
+    if operation == 'customer':
+        try:
+            _insert_customer(c, payload['nopol'], payload['nama_customer'], payload['no_telp'],
+                             payload['alamat'], payload['created_at'])
+        except sqlite3.IntegrityError:
+            pass
+        return None
+    if operation == 'audit':
+        _insert_audit(c, payload['timestamp'], payload['user'], payload['action'], payload['detail'],
+                      client_key)
+        return None
+    if operation == 'finish':
+        if _finish_transaction(c, payload['trans_id'], payload['waktu_selesai'], payload['checklist_selesai'],
+                               payload['qc_barang'], payload['catatan']):
+            return None
+        c.execute("SELECT status FROM wash_transactions WHERE id = ?", (payload['trans_id'],))
+        result = c.fetchone()
+        if not result:
+            return f"Transaksi ID {payload['trans_id']} tidak ditemukan di database"
+        return None if result[0].strip() == 'Selesai' else f"Transaksi berstatus '{result[0].strip()}'"
+    return f"Operasi tidak dikenal: {operation}"
+
+def sync_journal(batch_size=JOURNAL_SYNC_BATCH_SIZE, journal_db=None):
+    """Replay satu batch entri journal 'pending' ke database tujuannya, satu transaksi per database.
+    
+    Setiap entri diterapkan dalam SAVEPOINT: entri yang gagal di-rollback sendiri dan ditandai
+    'failed' beserta pesan errornya, entri lain tetap tersimpan. Return dict jumlah entri 'synced'
+    dan 'failed'. Database yang sedang sibuk dilewati dan entrinya tetap 'pending' untuk putaran berikutnya.
+    """
+    journal = _journal_connect(journal_db)
+    rows = journal.execute("""
+        SELECT id, client_key, db_name, operation, payload FROM journal
+        WHERE status = 'pending' ORDER BY id LIMIT ?
+    """, (batch_size,)).fetchall()
+    
+    # Kelompokkan per database tujuan, urutan dalam tiap database tetap sesuai journal
+    per_db = OrderedDict()
+    for row in rows:
+        per_db.setdefault(row[2], []).append(row)
+    
+    result = {'synced': 0, 'failed': 0}
+    now = datetime.now(WIB).strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        for db_name, entries in per_db.items():
+            conn = sqlite3.connect(db_name)
+            c = conn.cursor()
+            try:
+                # BEGIN eksplisit: RELEASE savepoint tidak meng-commit, commit sekali per database
+                c.execute("BEGIN IMMEDIATE")
+                updates = []
+                customers = []
+                for entry_id, client_key, _, operation, payload in entries:
+                    c.execute("SAVEPOINT journal_entry")
+                    try:
+                        payload = json.loads(payload)
+                        error = _apply_journal_entry(c, client_key, operation, payload)
+                    except sqlite3.OperationalError as e:
+                        if _is_db_busy(e):
+                            raise
+                        error = f"Error: {str(e)}"
+                    except Exception as e:
+                        error = f"Error: {str(e)}"
+                    if error:
+                        c.execute("ROLLBACK TO journal_entry")
+                    elif operation == 'customer':
+                        customers.append(payload['nopol'].strip().upper())
+                    c.execute("RELEASE journal_entry")
+                    updates.append(('failed' if error else 'synced', error, now, entry_id))
+                conn.commit()
+                # Counter KPI database ini direkonsiliasi ulang dari SQL saat dibaca berikutnya
+                get_kpi_counters(db_name).invalidate()
+                customer_cache = _customer_cache_for(db_name)
+                for nopol in customers:
+                    customer_cache.invalidate(normalize_nopol(nopol), nopol)
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                if _is_db_busy(e):
+                    continue
+                raise
+            finally:
+                conn.close()
+            
+            journal.executemany("UPDATE journal SET status = ?, error = ?, synced_at = ? WHERE id = ?", updates)
+            journal.commit()
+            for status, *_ in updates:
+                result[status] += 1
+    finally:
+        journal.close()
+    return result
+
+class JournalSyncWorker(threading.Thread):
+    """Thread background yang mengosongkan journal kasir ke database outlet secara berkala"""
+    
+    def __init__(self, interval=JOURNAL_SYNC_INTERVAL, journal_db=None):
+        super().__init__(name="journal-sync", daemon=True)
+        self.interval = interval
+        self.journal_db = journal_db
+        self.wake_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.last_error = None
+    
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                # Terus sinkron selama batch penuh (masih ada antrian)
+                while not self.stop_event.is_set():
+                    result = sync_journal(journal_db=self.journal_db)
+                    if result['synced'] + result['failed'] < JOURNAL_SYNC_BATCH_SIZE:
+                        break
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            self.wake_event.wait(self.interval)
+            self.wake_event.clear()
+    
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+
+@st.cache_resource(show_spinner=False)
+def _journal_worker_slot():
+    return {'worker': None, 'lock': threading.Lock()}
+
+def start_journal_sync():
+    """Jalankan JournalSyncWorker sekali per proses"""
+    slot = _journal_worker_slot()
+    with slot['lock']:
+        if slot['worker'] is None or not slot['worker'].is_alive():
+            slot['worker'] = JournalSyncWorker()
+            slot['worker'].start()
+
+def notify_journal_sync():
+    """Bangunkan worker sinkron supaya entri baru segera diproses"""
+    worker = _journal_worker_slot()['worker']
+    if worker is not None:
+        worker.wake_event.set()
+
+def count_transactions_by_status():
+    """Hitung transaksi 'Dalam Proses' (partial index antrian) dan 'Selesai' (rollup daily_revenue)"""
+    conn = sqlite3.connect(get_db_name())
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM wash_transactions WHERE status = 'Dalam Proses'")
+    jumlah_proses = c.fetchone()[0]
+    c.execute("SELECT COALESCE(SUM(jumlah), 0) FROM daily_revenue WHERE status = 'Selesai'")
+    jumlah_selesai = c.fetchone()[0]
+    conn.close()
+    return {'Dalam Proses': jumlah_proses, 'Selesai': jumlah_selesai}
+
+def get_open_transactions():
+    """Ambil antrian transaksi 'Dalam Proses' saja (pakai partial index)"""
+    conn = sqlite3.connect(get_db_name())
+    df = pd.read_sql("""
+        SELECT * FROM wash_transactions
+        WHERE status = 'Dalam Proses'
+        ORDER BY tanggal DESC, waktu_masuk DESC
+    """, conn)
+    conn.close()
+    return df
+
+def get_finished_transactions(search=None, limit=500):
+    """Ambil transaksi 'Selesai' terbaru, opsional difilter `search` (di SQL).
+    
+    Cocok jika nopol transaksi milik customer yang cocok lewat index pencarian customer
+    (subquery tanpa batas), atau nopol/nama yang tercatat di transaksi itu sendiri cocok.
+    Batas `limit` hanya berlaku untuk transaksi.
+    """
+    conn = sqlite3.connect(get_db_name())
+    query = "SELECT * FROM wash_transactions WHERE status = 'Selesai'"
+    params = []
+    if search and search.strip():
+        join, where, _, search_params = _customer_search_clause(conn, search)
+        query += f"""
+            AND (nopol IN (SELECT c.nopol FROM customers c {join} WHERE {where})
+                 OR nopol LIKE ? OR nama_customer LIKE ?)"""
+        params += search_params + [f"%{search.strip()}%"] * 2
+    query += " ORDER BY tanggal DESC, waktu_masuk DESC LIMIT ?"
+    params.append(limit)
+    
+    df = pd.read_sql(query, conn, params=params)
+    conn.close()
+    return df
+
+def get_transactions_by_date_range(start_date, end_date, limit=None):
+    """Ambil transaksi dalam rentang tanggal (yyyy-mm-dd, inklusif)"""
+    conn = sqlite3.connect(get_db_name())
+    query = """
+        SELECT * FROM wash_transactions 
+        WHERE tanggal BETWEEN ? AND ?
+        ORDER BY tanggal DESC, waktu_masuk DESC
+    """
+    params = [start_date, end_date]
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    df = pd.read_sql(query, conn, params=params)
+    conn.close()
+    return df
+
+def get_daily_revenue(start_date, end_date):
+    """Ambil rollup pendapatan harian (per tanggal, paket, status) dalam rentang tanggal"""
+    conn = sqlite3.connect(get_db_name())
+    df = pd.read_sql("""
+        SELECT tanggal, paket_cuci, status, jumlah, total FROM daily_revenue
+        WHERE tanggal BETWEEN ? AND ? AND jumlah != 0
+        ORDER BY tanggal
+    """, conn, params=(start_date, end_date))
+    conn.close()
+    return df
+
+def get_arrival_matrix(start_bulan, end_bulan):
+    """Matriks kedatangan hari (Senin=0) x jam untuk bulan start_bulan..end_bulan (yyyy-mm).
+    
+    Matriks bulanan yang sudah dihitung dijumlahkan di NumPy; return (jumlah 7x24, pendapatan 7x24).
+    """
+    conn = sqlite3.connect(get_db_name())
+    rows = conn.execute("""
+        SELECT weekday, jam, jumlah, total FROM arrival_matrix
+        WHERE bulan BETWEEN ? AND ?
+    """, (start_bulan, end_bulan)).fetchall()
+    conn.close()
+    
+    cells = np.array(rows, dtype=np.int64).reshape(-1, 4)
+    jumlah = np.zeros((7, 24), dtype=np.int64)
+    total = np.zeros((7, 24), dtype=np.int64)
+    np.add.at(jumlah, (cells[:, 0], cells[:, 1]), cells[:, 2])
+    np.add.at(total, (cells[:, 0], cells[:, 1]), cells[:, 3])
+    return jumlah, total
+
+def get_revenue_years():
+    """Daftar tahun yang punya transaksi (dari rollup), terbaru dulu"""
+    conn = sqlite3.connect(get_db_name())
+    c = conn.cursor()
+    c.execute("""
+        SELECT DISTINCT CAST(substr(tanggal, 1, 4) AS INTEGER) AS tahun
+        FROM daily_revenue WHERE jumlah != 0
+        ORDER BY tahun DESC
+    """)
+    years = [row[0] for row in c.fetchall()]
+    conn.close()
+    return years
+
+def count_customers():
+    """Hitung jumlah customer terdaftar"""
+    conn = sqlite3.connect(get_db_name())
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM customers")
+    total = c.fetchone()[0]
+    conn.close()
+    return total
+
+# --- Waktu Layanan ---
+class QuantileSketch:
+    """Sketch kuantil streaming: bucket logaritmik (mirip DDSketch) dengan error relatif tetap"""
+    
+    gamma = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+    log_gamma = math.log(gamma)
+    
+    def __init__(self, buckets=None, zero_count=0):
+        self.buckets = buckets or {}  # index bucket -> jumlah
+        self.zero_count = zero_count  # durasi 0 menit
+    
+    @property
+    def count(self):
+        return self.zero_count + sum(self.buckets.values())
+    
+    @classmethod
+    def bucket_indexes(cls, values):
+        """Index bucket untuk Series durasi; durasi <= 0 -> <NA>"""
+        positive = values.where(values > 0)
+        return np.ceil(np.log(positive) / cls.log_gamma).astype('Int64')
+    
+    def add(self, value):
+        if value <= 0:
+            self.zero_count += 1
+        else:
+            index = math.ceil(math.log(value) / self.log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+    
+    def quantile(self, q):
+        """Nilai kuantil q (0..1), None jika sketch kosong"""
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+    
+    def to_json(self):
+        return json.dumps({'zero': self.zero_count, 'buckets': {str(k): v for k, v in self.buckets.items()}})
+    
+    @classmethod
+    def from_json(cls, value):
+        data = json.loads(value)
+        return cls({int(k): v for k, v in data['buckets'].items()}, data['zero'])
+
+def _add_service_time(c, paket_cuci, created_by, waktu_masuk, waktu_selesai):
+    """Tambahkan durasi satu transaksi selesai ke sketch paket, staff dan jam masuk"""
+    durasi = service_minutes(pd.Series([waktu_masuk]), pd.Series([waktu_selesai])).iloc[0]
+    if pd.isna(durasi):
+        return
+    nilai_dimensi = {
+        'paket': paket_cuci,
+        'staff': created_by or '-',
+        'jam': waktu_masuk[:2],
+    }
+    for dimensi, nilai in nilai_dimensi.items():
+        c.execute("SELECT sketch FROM service_time_sketches WHERE dimensi = ? AND nilai = ?", (dimensi, nilai))
+        row = c.fetchone()
+        sketch = QuantileSketch.from_json(row[0]) if row else QuantileSketch()
+        sketch.add(durasi)
+        c.execute("""
+            INSERT OR REPLACE INTO service_time_sketches (dimensi, nilai, sketch) VALUES (?, ?, ?)
+        """, (dimensi, nilai, sketch.to_json()))
+
+def get_service_time_percentiles(dimensi):
+    """Tabel p50/p90/p99 waktu layanan (menit) untuk satu dimensi: 'paket', 'staff' atau 'jam'"""
+    conn = sqlite3.connect(get_db_name())
+    c = conn.cursor()
+    c.execute("SELECT nilai, sketch FROM service_time_sketches WHERE dimensi = ? ORDER BY nilai", (dimensi,))
+    rows = []
+    for nilai, value in c.fetchall():
+        sketch = QuantileSketch.from_json(value)
+        rows.append({
+            'nilai': nilai,
+            'jumlah': sketch.count,
+            'p50': sketch.quantile(0.50),
+            'p90': sketch.quantile(0.90),
+            'p99': sketch.quantile(0.99),
+        })
+    conn.close()
+    return pd.DataFrame(rows, columns=['nilai', 'jumlah', 'p50', 'p90', 'p99'])
+
+def get_paket_service_minutes():
+    """Median (p50) waktu layanan per paket dalam menit"""
+    df = get_service_time_percentiles('paket')
+    return dict(zip(df['nilai'], df['p50']))
+
+def schedule_bays(masuk, durasi, jumlah_bay, now, durasi_baru=None):
+    """List-scheduling antrian FIFO ke N bay memakai heap waktu bay kosong (semua dalam menit).
+    
+    Return (list (bay, eta) per job sesuai urutan input, eta mobil baru atau None).
+    Job yang sudah melewati estimasinya dianggap selesai paling cepat `now`.
+    """
+    bays = [(float('-inf'), bay) for bay in range(1, jumlah_bay + 1)]
+    hasil = []
+    for waktu_masuk, menit in zip(masuk, durasi):
+        kosong, bay = heapq.heappop(bays)
+        eta = max(max(kosong, waktu_masuk) + menit, now)
+        heapq.heappush(bays, (eta, bay))
+        hasil.append((bay, eta))
+    
+    eta_baru = None
+    if durasi_baru is not None:
+        kosong, bay = bays[0]
+        eta_baru = (bay, max(kosong, now) + durasi_baru)
+    return hasil, eta_baru
+
+def estimate_queue_eta(df_open, paket_baru=None):
+    """Estimasi bay & jam selesai tiap transaksi 'Dalam Proses', plus mobil baru (paket_baru) jika diberikan.
+    
+    Return (df_open urut FIFO dengan kolom 'bay' dan 'eta', (bay, eta) mobil baru atau None).
+    """
+    durasi_paket = get_paket_service_minutes()
+    jumlah_bay = get_jumlah_bay()
+    epoch = pd.Timestamp('1970-01-01')
+    now = (pd.Timestamp(datetime.now(WIB).replace(tzinfo=None)) - epoch) / pd.Timedelta(minutes=1)
+    
+    df = df_open.sort_values(['tanggal', 'waktu_masuk']).copy()
+    masuk = pd.to_datetime(df['tanggal'] + ' ' + df['waktu_masuk'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    masuk = ((masuk - epoch) / pd.Timedelta(minutes=1)).fillna(now)
+    durasi = df['paket_cuci'].map(durasi_paket).fillna(DEFAULT_SERVICE_MINUTES)
+    durasi_baru = None
+    if paket_baru is not None:
+        durasi_baru = durasi_paket.get(paket_baru, DEFAULT_SERVICE_MINUTES)
+    
+    hasil, eta_baru = schedule_bays(masuk.tolist(), durasi.tolist(), jumlah_bay, now, durasi_baru)
+    df['bay'] = [bay for bay, _ in hasil]
+    df['eta'] = epoch + pd.to_timedelta([eta for _, eta in hasil], unit='m')
+    if eta_baru is not None:
+        eta_baru = (eta_baru[0], epoch + pd.Timedelta(minutes=eta_baru[1]))
+    return df, eta_baru
+
+# --- Prediksi Permintaan ---
+def forecast_demand(df_daily, jumlah_matrix, total_matrix, end=None, horizon=FORECAST_HORIZON_DAYS):
+    """Prediksi jumlah mobil & pendapatan per paket untuk `horizon` hari setelah `end`.
+    
+    end: hari terakhir riwayat (date); hari tanpa transaksi sampai `end` dihitung nol.
+    Default hari terakhir yang ada di df_daily.
+    df_daily: baris (tanggal, paket_cuci, jumlah, total) seperti daily_revenue. Model per paket =
+    tren linear + dummy hari dalam minggu; semua paket dan kedua target diselesaikan dalam satu
+    np.linalg.lstsq. Prediksi harian dibagi ke jam memakai profil hari x jam dari matriks kedatangan.
+    Return (df_harian, df_jam); keduanya kosong jika riwayat kurang dari FORECAST_MIN_HISTORY_DAYS.
+    """
+    kolom_harian = ['tanggal', 'paket_cuci', 'jumlah', 'pendapatan']
+    kolom_jam = ['tanggal', 'jam', 'paket_cuci', 'jumlah', 'pendapatan']
+    if df_daily.empty:
+        return pd.DataFrame(columns=kolom_harian), pd.DataFrame(columns=kolom_jam)
+    
+    pivot = df_daily.pivot_table(index='tanggal', columns='paket_cuci', values=['jumlah', 'total'],
+                                 aggfunc='sum', fill_value=0)
+    pivot.index = pd.to_datetime(pivot.index, format='%Y-%m-%d')
+    days = pd.date_range(pivot.index.min(), pd.Timestamp(end) if end else pivot.index.max(), freq='D')
+    if len(days) < FORECAST_MIN_HISTORY_DAYS:
+        return pd.DataFrame(columns=kolom_harian), pd.DataFrame(columns=kolom_jam)
+    pivot = pivot.reindex(days, fill_value=0)
+    paket = pivot['jumlah'].columns.to_numpy()
+    targets = np.hstack([pivot['jumlah'].to_numpy(float), pivot['total'].to_numpy(float)])
+    
+    def design(dates):
+        tren = (dates - days[0]).days.to_numpy() / 365.0
+        weekday = dates.weekday.to_numpy()[:, None] == np.arange(1, 7)
+        return np.column_stack([np.ones(len(dates)), tren, weekday])
+    
+    coef, *_ = np.linalg.lstsq(design(days), targets, rcond=None)
+    future = pd.date_range(days[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+    prediksi = np.clip(design(future) @ coef, 0, None)
+    jumlah, pendapatan = prediksi[:, :len(paket)], prediksi[:, len(paket):]
+    
+    def profil(matrix):
+        per_hari = matrix.sum(axis=1, keepdims=True)
+        return np.divide(matrix, per_hari, out=np.full(matrix.shape, 1 / 24), where=per_hari > 0)
+    
+    weekday = future.weekday.to_numpy()
+    jam_jumlah = jumlah[:, :, None] * profil(jumlah_matrix)[weekday][:, None, :]
+    jam_pendapatan = pendapatan[:, :, None] * profil(total_matrix)[weekday][:, None, :]
+    
+    tanggal = future.strftime('%Y-%m-%d').to_numpy()
+    df_harian = pd.DataFrame({
+        'tanggal': np.repeat(tanggal, len(paket)),
+        'paket_cuci': np.tile(paket, len(future)),
+        'jumlah': jumlah.ravel(),
+        'pendapatan': pendapatan.ravel()
+    })
+    df_jam = pd.DataFrame({
+        'tanggal': np.repeat(tanggal, len(paket) * 24),
+        'jam': np.tile(np.arange(24), len(future) * len(paket)),
+        'paket_cuci': np.tile(np.repeat(paket, 24), len(future)),
+        'jumlah': jam_jumlah.ravel(),
+        'pendapatan': jam_pendapatan.ravel()
+    })
+    return df_harian, df_jam[df_jam['jumlah'] > 0].reset_index(drop=True)
+
+class DemandForecast:
+    """Hasil forecast_demand satu database, dipakai semua sesi.
+    
+    Fit memakai riwayat FORECAST_HISTORY_DAYS hari sampai kemarin (dari rollup harian & matriks
+    kedatangan), jadi transaksi hari ini tidak mengubah hasil; fit diulang saat hari berganti.
+    """
+    
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.lock = threading.Lock()
+        self.result = None
+        self.fitted_for = None
+    
+    def _fit(self, today):
+        end = today - timedelta(days=1)
+        start = end - timedelta(days=FORECAST_HISTORY_DAYS - 1)
+        with using_db(self.db_name):
+            df_daily = get_daily_revenue(start.isoformat(), end.isoformat())
+            jumlah_matrix, total_matrix = get_arrival_matrix(start.isoformat()[:7], end.isoformat()[:7])
+        return forecast_demand(df_daily, jumlah_matrix, total_matrix, end=end)
+    
+    def get(self):
+        """Return (df_harian, df_jam), fit ulang hanya jika hari berganti"""
+        today = datetime.now(WIB).date()
+        with self.lock:
+            if self.result is None or self.fitted_for != today:
+                self.result = self._fit(today)
+                self.fitted_for = today
+            return self.result
+
+@st.cache_resource(show_spinner=False)
+def _demand_forecast_for(db_name):
+    return DemandForecast(db_name)
+
+def get_demand_forecast(db_name=None):
+    """DemandForecast milik database outlet aktif (atau db_name)"""
+    return _demand_forecast_for(db_name or get_db_name())
+
+# --- Papan Antrian ---
+QUEUE_BOARD_COLUMNS = ['id', 'nopol', 'nama_customer', 'paket_cuci', 'tanggal',
+                       'waktu_masuk', 'waktu_selesai', 'status', 'updated_at']
+
+class QueueBoard:
+    """Isi papan antrian (mobil 'Dalam Proses' + yang baru selesai hari ini), dipakai semua layar.
+    
+    Dimuat penuh sekali, lalu setiap poll_interval hanya mengambil baris dengan updated_at
+    lebih baru dari cursor dan menggabungkannya per id. Berapapun layar yang terbuka,
+    database hanya di-query paling banyak sekali per interval.
+    """
+    
+    def __init__(self, db_name, poll_interval=QUEUE_BOARD_REFRESH_SECONDS, recent_limit=QUEUE_BOARD_RECENT_LIMIT):
+        self.db_name = db_name
+        self.poll_interval = poll_interval
+        self.recent_limit = recent_limit
+        self.lock = threading.Lock()
+        self.rows = {}
+        self.cursor = 0
+        self.polled_at = None
+    
+    def _fetch(self, conn, where, params):
+        columns = ', '.join(QUEUE_BOARD_COLUMNS)
+        c = conn.execute(f"SELECT {columns} FROM wash_transactions WHERE {where}", params)
+        return [dict(zip(QUEUE_BOARD_COLUMNS, row)) for row in c.fetchall()]
+    
+    def _load(self, conn, today):
+        # Cursor dibaca lebih dulu: perubahan selama load ikut terambil di poll berikutnya
+        self.cursor = conn.execute("SELECT MAX(updated_at) FROM wash_transactions").fetchone()[0] or 0
+        self.rows = {}
+        self._merge(self._fetch(conn, "status = 'Dalam Proses'", ()), today)
+        self._merge(self._fetch(conn, "status = 'Selesai' AND tanggal = ? ORDER BY updated_at DESC LIMIT ?",
+                                (today, self.recent_limit)), today)
+    
+    def _poll(self, conn, today):
+        rows = self._fetch(conn, "updated_at > ?", (self.cursor - QUEUE_BOARD_POLL_OVERLAP_MS,))
+        if rows:
+            self.cursor = max(self.cursor, max(row['updated_at'] for row in rows))
+        self._merge(rows, today)
+    
+    def _merge(self, rows, today):
+        for row in rows:
+            self.rows[row['id']] = row
+        selesai = sorted((row for row in self.rows.values() if row['status'] == 'Selesai' and row['tanggal'] == today),
+                         key=lambda row: row['updated_at'], reverse=True)
+        keep = {row['id'] for row in selesai[:self.recent_limit]}
+        self.rows = {trans_id: row for trans_id, row in self.rows.items()
+                     if row['status'] == 'Dalam Proses' or trans_id in keep}
+    
+    def snapshot(self):
+        """Return (df_proses urut FIFO, df_selesai terbaru dulu); poll database hanya jika interval lewat"""
+        with self.lock:
+            now = time.monotonic()
+            if self.polled_at is None or now - self.polled_at >= self.poll_interval:
+                today = datetime.now(WIB).date().isoformat()
+                conn = sqlite3.connect(self.db_name)
+                if self.polled_at is None:
+                    self._load(conn, today)
+                else:
+                    self._poll(conn, today)
+                conn.close()
+                self.polled_at = now
+            df = pd.DataFrame(list(self.rows.values()), columns=QUEUE_BOARD_COLUMNS)
+        df_proses = df[df['status'] == 'Dalam Proses'].sort_values(['tanggal', 'waktu_masuk'])
+        df_selesai = df[df['status'] == 'Selesai'].sort_values('updated_at', ascending=False)
+        return df_proses, df_selesai
+
+@st.cache_resource(show_spinner=False)
+def _queue_board_for(db_name):
+    return QueueBoard(db_name)
+
+def get_queue_board(db_name=None):
+    """QueueBoard milik database outlet aktif (atau db_name)"""
+    return _queue_board_for(db_name or get_db_name())
+
+# --- Laporan Konsolidasi Outlet ---
+def fan_out(query_fn, *args):
+    """Jalankan query_fn(*args) di database setiap outlet secara paralel; return {outlet: hasil}"""
+    def run(db_name):
+        with using_db(db_name):
+            return query_fn(*args)
+    
+    with ThreadPoolExecutor(max_workers=len(OUTLETS)) as pool:
+        futures = {outlet: pool.submit(run, db_name) for outlet, db_name in OUTLETS.items()}
+        return {outlet: future.result() for outlet, future in futures.items()}
+
+class ConsolidatedCache:
+    """Cache hasil laporan konsolidasi per (nama laporan, argumen) dengan TTL, dipakai semua sesi"""
+    
+    def __init__(self, ttl=CONSOLIDATED_CACHE_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+    
+    def get_or_compute(self, key, compute):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                return entry[1]
+        value = compute()
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+        return value
 
-# --- Simpan & Load Customer ---
-def save_customer(nopol, nama, telp, alamat):
-    """Simpan data customer baru"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    now_wib = datetime.now(WIB)
-    try:
-        c.execute("""
-            INSERT INTO customers (nopol, nama_customer, no_telp, alamat, created_at)
-            VALUES (?, ?, ?, ?, ?)
-        """, (nopol.upper(), nama, telp, alamat, now_wib.strftime("%d-%m-%Y %H:%M:%S")))
-        conn.commit()
-        return True, "Customer berhasil ditambahkan"
-    except sqlite3.IntegrityError:
-        return False, "Nopol sudah terdaftar"
-    except Exception as e:
-        return False, f"Error: {str(e)}"
-    finally:
-        conn.close()
+@st.cache_resource(show_spinner=False)
+def get_consolidated_cache():
+    return ConsolidatedCache()
 
-def get_customer_by_nopol(nopol):
-    """Ambil data customer berdasarkan nopol"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT * FROM customers WHERE nopol = ?", (nopol.upper(),))
-    result = c.fetchone()
-    conn.close()
-    if result:
-        return {
-            'id': result[0],
-            'nopol': result[1],
-            'nama_customer': result[2],
-            'no_telp': result[3],
-            'alamat': result[4],
-            'created_at': result[5]
-        }
-    return None
+def get_consolidated_revenue(start_date, end_date):
+    """Rollup pendapatan semua outlet untuk rentang tanggal, lewat satu fan-out paralel.
+    
+    Return (per_outlet, gabungan): per_outlet = baris daily_revenue + kolom outlet,
+    gabungan = jumlah & total dijumlahkan per (tanggal, paket_cuci, status).
+    """
+    def compute():
+        partials = fan_out(get_daily_revenue, start_date, end_date)
+        per_outlet = pd.concat(
+            [df.assign(outlet=outlet) for outlet, df in partials.items()], ignore_index=True
+        )
+        gabungan = per_outlet.groupby(['tanggal', 'paket_cuci', 'status'], as_index=False)[['jumlah', 'total']].sum()
+        return per_outlet, gabungan
+    
+    return get_consolidated_cache().get_or_compute(('revenue', start_date, end_date), compute)
 
-def get_all_customers():
-    """Ambil semua data customer"""
-    conn = sqlite3.connect(DB_NAME)
-    df = pd.read_sql("SELECT * FROM customers ORDER BY created_at DESC", conn)
+# --- Analitik QC Checklist ---
+def get_qc_failure_rates(phase, start_date, end_date, dimensi=None):
+    """Tingkat gagal (item tidak dicentang) per item checklist, opsional dipecah per QC_DIMENSIONS"""
+    kolom_dimensi = f", {QC_DIMENSIONS[dimensi]} AS nilai" if dimensi else ""
+    group_dimensi = ", nilai" if dimensi else ""
+    conn = sqlite3.connect(get_db_name())
+    df = pd.read_sql(f"""
+        SELECT i.nama AS item{kolom_dimensi},
+               COUNT(*) AS total,
+               SUM(1 - r.checked) AS gagal,
+               ROUND(100.0 * SUM(1 - r.checked) / COUNT(*), 1) AS persen_gagal
+        FROM checklist_results r
+        JOIN checklist_items i ON i.id = r.checklist_item_id
+        JOIN wash_transactions t ON t.id = r.transaction_id
+        WHERE r.phase = ? AND t.tanggal BETWEEN ? AND ?
+        GROUP BY i.nama{group_dimensi}
+        ORDER BY persen_gagal DESC, item{group_dimensi}
+    """, conn, params=(phase, start_date, end_date))
     conn.close()
     return df
 
-# --- Simpan & Load Transaksi ---
-def save_transaction(data):
-    """Simpan transaksi cuci mobil"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+# --- Export CSV ---
+def iter_csv_export(query, params=(), chunk_size=EXPORT_CHUNK_SIZE, compress=False, conn=None):
+    """Jalankan query dan hasilkan CSV (bytes) bertahap per fetchmany; gzip opsional"""
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(get_db_name())
+    # wbits=31: stream zlib dengan header/trailer gzip
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    def drain():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+    
     try:
-        c.execute("""
-            INSERT INTO wash_transactions 
-            (nopol, nama_customer, tanggal, waktu_masuk, waktu_selesai, paket_cuci, harga, 
-             checklist_datang, checklist_selesai, qc_barang, catatan, status, created_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            data['nopol'].upper(),
-            data['nama_customer'],
-            data['tanggal'],
-            data['waktu_masuk'],
-            data.get('waktu_selesai', ''),
-            data['paket_cuci'],
-            data['harga'],
-            data.get('checklist_datang', ''),
-            data.get('checklist_selesai', ''),
-            data.get('qc_barang', ''),
-            data.get('catatan', ''),
-            data.get('status', 'Dalam Proses'),
-            data.get('created_by', '')
-        ))
-        conn.commit()
-        return True, "Transaksi berhasil disimpan"
-    except Exception as e:
-        return False, f"Error: {str(e)}"
+        c = conn.execute(query, params)
+        writer.writerow([column[0] for column in c.description])
+        while True:
+            rows = c.fetchmany(chunk_size)
+            if not rows:
+                break
+            writer.writerows(rows)
+            yield drain()
+        tail = drain()
+        if compressor:
+            tail += compressor.flush()
+        if tail:
+            yield tail
     finally:
-        conn.close()
+        if own_conn:
+            conn.close()
 
-def update_transaction_finish(trans_id, waktu_selesai, checklist_selesai, qc_barang, catatan):
-    """Update transaksi saat selesai cuci"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+def iter_customers_csv(sort_by="Terbaru Terdaftar", min_kunjungan=0, search=None, compress=False):
+    """Export CSV customer (dengan statistik) sesuai filter daftar customer"""
+    conn = sqlite3.connect(get_db_name())
     try:
-        # Pastikan trans_id adalah integer
-        trans_id = int(trans_id)
-        
-        # Cek status dulu dengan logging
-        c.execute("SELECT id, status, nopol FROM wash_transactions WHERE id = ?", (trans_id,))
-        result = c.fetchone()
-        
-        if not result:
-            # Debug: cek semua ID yang ada
-            c.execute("SELECT id, nopol, status FROM wash_transactions")
-            all_trans = c.fetchall()
-            print(f"DEBUG: Mencari ID {trans_id} (tipe: {type(trans_id)})")
-            print(f"DEBUG: IDs yang ada di database: {[row[0] for row in all_trans]}")
-            return False, f"Transaksi ID {trans_id} tidak ditemukan di database"
-        
-        current_status = result[1].strip()
-        print(f"DEBUG: Transaksi ditemukan - ID: {result[0]}, Status: '{current_status}', Nopol: {result[2]}")
-        
-        if current_status != 'Dalam Proses':
-            return False, f"Transaksi berstatus '{current_status}', tidak bisa diselesaikan"
-        
-        # Update status menjadi 'Selesai'
-        c.execute("""
-            UPDATE wash_transactions 
-            SET waktu_selesai = ?, checklist_selesai = ?, qc_barang = ?, 
-                catatan = ?, status = 'Selesai'
-            WHERE id = ?
-        """, (waktu_selesai, checklist_selesai, qc_barang, catatan, trans_id))
-        
-        conn.commit()
-        print(f"DEBUG: Update berhasil untuk ID {trans_id}")
-        return True, "Transaksi berhasil diselesaikan"
-        
-    except Exception as e:
-        print(f"DEBUG ERROR: {str(e)}")
-        return False, f"Error: {str(e)}"
+        base, order, params = _customer_list_sql(conn, sort_by, min_kunjungan, search)
+        yield from iter_csv_export(f"""
+            SELECT c.nopol, c.nama_customer, c.no_telp, c.alamat,
+                   COALESCE(s.kunjungan, 0) AS kunjungan, COALESCE(s.total_belanja, 0) AS total_belanja,
+                   s.kunjungan_terakhir, s.paket_favorit, c.created_at
+            {base}
+            ORDER BY {order}
+        """, params, compress=compress, conn=conn)
     finally:
         conn.close()
 
-def get_all_transactions():
-    """Ambil semua transaksi"""
-    conn = sqlite3.connect(DB_NAME)
-    df = pd.read_sql("SELECT * FROM wash_transactions ORDER BY tanggal DESC, waktu_masuk DESC", conn)
-    conn.close()
-    return df
-
-def get_transactions_by_date_range(start_date, end_date):
-    """Ambil transaksi dalam rentang tanggal"""
-    conn = sqlite3.connect(DB_NAME)
-    query = """
-        SELECT * FROM wash_transactions 
+def iter_transactions_csv(start_date, end_date, compress=False):
+    """Export CSV transaksi dalam rentang tanggal (yyyy-mm-dd, inklusif)"""
+    yield from iter_csv_export("""
+        SELECT id, tanggal, waktu_masuk, waktu_selesai, nopol, nama_customer, paket_cuci, harga,
+               status, qc_barang, catatan, created_by
+        FROM wash_transactions
         WHERE tanggal BETWEEN ? AND ?
-        ORDER BY tanggal DESC, waktu_masuk DESC
+        ORDER BY tanggal, waktu_masuk
+    """, (start_date, end_date), compress=compress)
+
+def export_file(chunks):
+    """Tulis chunk export ke file sementara (di disk, bukan di memori) untuk st.download_button.
+    
+    Return file mentah (FileIO) di posisi awal; file dihapus otomatis saat ditutup.
     """
-    df = pd.read_sql(query, conn, params=(start_date, end_date))
-    conn.close()
-    return df
+    file = tempfile.TemporaryFile(buffering=0)
+    for chunk in chunks:
+        file.write(chunk)
+    file.seek(0)
+    return file
 
 # --- Settings Functions ---
+class SettingsCache:
+    """Cache semua settings (sudah di-decode JSON) dengan nomor versi, dipakai semua sesi"""
+    
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.lock = threading.Lock()
+        self.version = 0
+        self.loaded_version = None
+        self.values = {}
+    
+    def get(self, key):
+        """Ambil setting; reload dari database hanya jika versi berubah sejak load terakhir"""
+        with self.lock:
+            if self.loaded_version != self.version:
+                conn = sqlite3.connect(self.db_name)
+                c = conn.cursor()
+                c.execute("SELECT setting_key, setting_value FROM settings")
+                rows = c.fetchall()
+                conn.close()
+                
+                values = {}
+                for setting_key, setting_value in rows:
+                    try:
+                        values[setting_key] = json.loads(setting_value)
+                    except ValueError:
+                        values[setting_key] = setting_value
+                self.values = values
+                self.loaded_version = self.version
+            value = self.values.get(key)
+        # Copy supaya halaman yang mengubah dict/list tidak mengubah isi cache
+        return copy.deepcopy(value)
+    
+    def bump_version(self):
+        """Tandai cache basi; dipanggil setelah update_setting"""
+        with self.lock:
+            self.version += 1
+
+@st.cache_resource(show_spinner=False)
+def _settings_cache_for(db_name):
+    return SettingsCache(db_name)
+
+def get_settings_cache():
+    """SettingsCache milik database outlet aktif"""
+    return _settings_cache_for(get_db_name())
+
 def get_setting(key):
-    """Ambil setting berdasarkan key"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT setting_value FROM settings WHERE setting_key = ?", (key,))
-    result = c.fetchone()
-    conn.close()
-    if result:
-        try:
-            return json.loads(result[0])
-        except:
-            return result[0]
-    return None
+    """Ambil setting berdasarkan key (lewat cache settings)"""
+    return get_settings_cache().get(key)
 
 def update_setting(key, value):
     """Update setting"""
-    conn = sqlite3.connect(DB_NAME)
+    return update_settings({key: value})
+
+def update_settings(values):
+    """Update beberapa setting sekaligus dalam satu transaksi (semua tersimpan atau tidak sama sekali)"""
+    conn = sqlite3.connect(get_db_name())
     c = conn.cursor()
     now = datetime.now(WIB).strftime("%d-%m-%Y %H:%M:%S")
     try:
-        value_str = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
-        c.execute("""
+        c.executemany("""
             INSERT OR REPLACE INTO settings (setting_key, setting_value, updated_at)
             VALUES (?, ?, ?)
-        """, (key, value_str, now))
+        """, [(key, json.dumps(value) if isinstance(value, (dict, list)) else str(value), now)
+              for key, value in values.items()])
         conn.commit()
+        get_settings_cache().bump_version()
         return True, "Setting berhasil diupdate"
     except Exception as e:
         return False, f"Error: {str(e)}"
@@ -347,6 +2517,11 @@ def get_checklist_selesai():
     checklist = get_setting("checklist_selesai")
     return checklist if checklist else DEFAULT_CHECKLIST_SELESAI
 
+def get_jumlah_bay():
+    """Ambil jumlah bay cuci dari database"""
+    jumlah_bay = get_setting("jumlah_bay")
+    return int(jumlah_bay) if jumlah_bay else DEFAULT_JUMLAH_BAY
+
 
 
 USERS = {
@@ -356,35 +2531,135 @@ USERS = {
 }
 
 # --- Audit Trail Helper ---
-def add_audit(action, detail=None):
-    """Simpan audit trail ke database SQLite agar persisten dan bisa dilihat semua user"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    # Gunakan timezone WIB (GMT+7)
-    now_wib = datetime.now(WIB)
+def _insert_audit(c, timestamp, user, action, detail, client_key=None):
+    """Insert satu record audit trail di cursor c (tanpa commit); client_key yang sudah tersimpan dilewati"""
     c.execute("""
-        INSERT INTO audit_trail (timestamp, user, action, detail)
-        VALUES (?, ?, ?, ?)
-    """, (
-        now_wib.strftime("%d-%m-%Y %H:%M:%S"),
-        st.session_state.get("login_user", "-"),
-        action,
-        detail or ""
-    ))
+        INSERT INTO audit_trail (timestamp, user, action, detail, client_key)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (client_key) WHERE client_key IS NOT NULL DO NOTHING
+    """, (timestamp, user, action, detail or "", client_key))
+
+def add_audit(action, detail=None, offline=False):
+    """Simpan audit trail ke database SQLite agar persisten dan bisa dilihat semua user.
+    
+    offline=True mencatat ke journal lokal kasir; waktu & user diambil sekarang, disimpan saat sinkron.
+    """
+    # Gunakan timezone WIB (GMT+7)
+    timestamp = datetime.now(WIB).strftime("%Y-%m-%d %H:%M:%S")
+    user = st.session_state.get("login_user", "-")
+    if offline:
+        journal_append('audit', {'timestamp': timestamp, 'user': user, 'action': action, 'detail': detail})
+        return
+    
+    conn = sqlite3.connect(get_db_name())
+    c = conn.cursor()
+    _insert_audit(c, timestamp, user, action, detail)
     conn.commit()
     conn.close()
 
-def load_audit_trail(user=None):
-    """Load audit trail dari database. Jika user specified, filter by user."""
-    conn = sqlite3.connect(DB_NAME)
-    if user:
-        query = "SELECT * FROM audit_trail WHERE user = ? ORDER BY timestamp DESC"
-        df = pd.read_sql(query, conn, params=(user,))
+def _audit_filter_sql(users=None, keyword=None, start_date=None, end_date=None):
+    """Susun klausa WHERE + parameter untuk filter audit trail"""
+    clauses, params = [], []
+    if users is not None:
+        clauses.append(f"user IN ({', '.join('?' * len(users))})" if users else "0")
+        params.extend(users)
+    if start_date:
+        clauses.append("timestamp >= ?")
+        params.append(start_date.isoformat())
+    if end_date:
+        # Inklusif sampai akhir hari end_date
+        clauses.append("timestamp < ?")
+        params.append((end_date + timedelta(days=1)).isoformat())
+    if keyword:
+        clauses.append("(action LIKE ? OR detail LIKE ?)")
+        params.extend([f"%{keyword}%"] * 2)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+def summarize_audit_trail(users=None, keyword=None, start_date=None, end_date=None):
+    """Jumlah record, user unik dan action unik audit trail sesuai filter (users=None = semua user).
+    
+    Tanpa filter teks/tanggal dihitung dari audit_action_counts; dengan filter tersebut hanya
+    AUDIT_COUNT_CAP record terbaru yang dihitung dan 'capped' bernilai True bila lebih.
+    """
+    conn = sqlite3.connect(get_db_name())
+    c = conn.cursor()
+    if not keyword and not start_date and not end_date:
+        where, params = _audit_filter_sql(users)
+        c.execute(f"""
+            SELECT COALESCE(SUM(jumlah), 0), COUNT(DISTINCT user), COUNT(DISTINCT action)
+            FROM audit_action_counts {where}
+        """, params)
+        total, unique_users, unique_actions = c.fetchone()
+        capped = False
     else:
-        query = "SELECT * FROM audit_trail ORDER BY timestamp DESC"
-        df = pd.read_sql(query, conn)
+        where, params = _audit_filter_sql(users, keyword, start_date, end_date)
+        c.execute(f"""
+            SELECT COUNT(*), COUNT(DISTINCT user), COUNT(DISTINCT action)
+            FROM (SELECT user, action FROM audit_trail {where} ORDER BY timestamp DESC, id DESC LIMIT ?)
+        """, params + [AUDIT_COUNT_CAP + 1])
+        total, unique_users, unique_actions = c.fetchone()
+        capped = total > AUDIT_COUNT_CAP
+        total = min(total, AUDIT_COUNT_CAP)
     conn.close()
-    return df
+    return {'total': total, 'users': unique_users, 'actions': unique_actions, 'capped': capped}
+
+def query_audit_trail(users=None, keyword=None, start_date=None, end_date=None, before=None,
+                      page_size=AUDIT_PAGE_SIZE):
+    """Ambil satu halaman audit trail (terbaru dulu); semua filter dijalankan di SQL.
+    
+    Paging keyset: `before` = (timestamp, id) baris terakhir halaman sebelumnya (None = halaman pertama).
+    Return (df, next_before): next_before None jika tidak ada halaman berikutnya.
+    """
+    where, params = _audit_filter_sql(users, keyword, start_date, end_date)
+    if before is not None:
+        where = f"{where} AND (timestamp, id) < (?, ?)" if where else "WHERE (timestamp, id) < (?, ?)"
+        params = params + list(before)
+    conn = sqlite3.connect(get_db_name())
+    df = pd.read_sql(f"""
+        SELECT id, timestamp, user, action, detail FROM audit_trail {where}
+        ORDER BY timestamp DESC, id DESC
+        LIMIT ?
+    """, conn, params=params + [page_size + 1])
+    conn.close()
+    
+    next_before = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        next_before = (df['timestamp'].iloc[-1], int(df['id'].iloc[-1]))
+    return df, next_before
+
+def get_audit_users():
+    """Daftar user yang pernah tercatat di audit trail"""
+    conn = sqlite3.connect(get_db_name())
+    c = conn.cursor()
+    c.execute("SELECT DISTINCT user FROM audit_action_counts ORDER BY user")
+    users = [row[0] for row in c.fetchall()]
+    conn.close()
+    return users
+
+def get_audit_date_bounds():
+    """Tanggal audit trail paling awal & paling akhir (None jika kosong).
+    
+    Hanya timestamp berformat ISO yang dihitung; sisa format lama yang tidak terbaca migrasi diabaikan.
+    """
+    iso = "timestamp GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'"
+    conn = sqlite3.connect(get_db_name())
+    c = conn.cursor()
+    # Dua subquery terpisah supaya MIN & MAX masing-masing memakai idx_audit_timestamp
+    c.execute(f"""
+        SELECT (SELECT MIN(timestamp) FROM audit_trail WHERE {iso}),
+               (SELECT MAX(timestamp) FROM audit_trail WHERE {iso})
+    """)
+    first, last = c.fetchone()
+    conn.close()
+    if first is None:
+        return None, None
+    try:
+        return date.fromisoformat(first[:10]), date.fromisoformat(last[:10])
+    except ValueError:
+        today = datetime.now(WIB).date()
+        return today, today
 
 def login_page():
     st.set_page_config(page_title="Login Cuci Mobil", layout="centered")
@@ -527,30 +2802,38 @@ def dashboard_page(role):
     </div>
     ''', unsafe_allow_html=True)
     
-    # Load data transaksi
-    df_trans = get_all_transactions()
-    df_cust = get_all_customers()
-    
     # Filter tanggal - default hari ini
     col1, col2 = st.columns([2, 2])
     with col1:
         today = datetime.now(WIB).date()
         date_filter = st.date_input("� Filter Tanggal", value=(today, today))
     
-    # Apply filter
+    # Apply filter (tanpa rentang lengkap = semua tanggal)
     if isinstance(date_filter, (list, tuple)) and len(date_filter) == 2:
-        start_date = date_filter[0].strftime('%d-%m-%Y')
-        end_date = date_filter[1].strftime('%d-%m-%Y')
-        df_filtered = get_transactions_by_date_range(start_date, end_date)
+        start_date = date_filter[0].isoformat()
+        end_date = date_filter[1].isoformat()
     else:
-        df_filtered = df_trans
+        start_date, end_date = '0000-01-01', '9999-12-31'
     
-    # Hitung statistik
-    total_transaksi = len(df_filtered)
-    total_pendapatan = df_filtered['harga'].sum() if not df_filtered.empty else 0
-    transaksi_selesai = len(df_filtered[df_filtered['status'] == 'Selesai'])
-    transaksi_proses = len(df_filtered[df_filtered['status'] == 'Dalam Proses'])
-    total_customer = len(df_cust)
+    # Hitung statistik: hari ini (kartu, grafik & transaksi terbaru) dari counter KPI di memori,
+    # periode lain dari rollup harian
+    df_recent = None
+    if start_date == end_date == today.isoformat():
+        kpi = get_kpi_counters().snapshot(start_date)
+        total_transaksi = kpi['jumlah']
+        total_pendapatan = kpi['pendapatan']
+        transaksi_selesai = kpi['Selesai']
+        transaksi_proses = kpi['Dalam Proses']
+        total_customer = kpi['total_customer']
+        df_revenue = pd.DataFrame(kpi['revenue'], columns=['paket_cuci', 'status', 'jumlah', 'total'])
+        df_recent = pd.DataFrame(kpi['recent'], columns=KPI_RECENT_COLUMNS)
+    else:
+        df_revenue = get_daily_revenue(start_date, end_date)
+        total_transaksi = int(df_revenue['jumlah'].sum())
+        total_pendapatan = df_revenue['total'].sum() if not df_revenue.empty else 0
+        transaksi_selesai = int(df_revenue.loc[df_revenue['status'] == 'Selesai', 'jumlah'].sum())
+        transaksi_proses = int(df_revenue.loc[df_revenue['status'] == 'Dalam Proses', 'jumlah'].sum())
+        total_customer = get_kpi_counters().snapshot(today.isoformat())['total_customer']
     
     # Cards
     st.markdown(f'''
@@ -589,12 +2872,12 @@ def dashboard_page(role):
     ''', unsafe_allow_html=True)
     
     # Grafik
-    if not df_filtered.empty:
+    if total_transaksi > 0:
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("📊 Pendapatan per Paket")
-            paket_income = df_filtered.groupby('paket_cuci')['harga'].sum().reset_index()
+            paket_income = df_revenue.groupby('paket_cuci')['total'].sum().reset_index()
             paket_income.columns = ['Paket', 'Total']
             
             chart = alt.Chart(paket_income).mark_bar(cornerRadiusEnd=8).encode(
@@ -607,7 +2890,7 @@ def dashboard_page(role):
         
         with col2:
             st.subheader("📈 Status Transaksi")
-            status_count = df_filtered['status'].value_counts().reset_index()
+            status_count = df_revenue.groupby('status')['jumlah'].sum().reset_index()
             status_count.columns = ['Status', 'Jumlah']
             
             pie = alt.Chart(status_count).mark_arc(innerRadius=60, outerRadius=120).encode(
@@ -622,7 +2905,10 @@ def dashboard_page(role):
         
         # Tabel transaksi terbaru
         st.subheader("� Transaksi Terbaru")
-        df_display = df_filtered[['tanggal', 'nopol', 'nama_customer', 'paket_cuci', 'harga', 'status']].head(10)
+        if df_recent is None:
+            df_recent = get_transactions_by_date_range(start_date, end_date, limit=KPI_RECENT_LIMIT)
+        df_display = df_recent[['tanggal', 'nopol', 'nama_customer', 'paket_cuci', 'harga', 'status']].copy()
+        df_display['tanggal'] = format_date_column(df_display['tanggal'])
         st.dataframe(df_display, use_container_width=True)
     else:
         st.info("📭 Belum ada transaksi untuk periode ini")
@@ -669,14 +2955,18 @@ def transaksi_page(role):
     st.markdown('<div class="trans-header"><h2>🚗 Input Transaksi Cuci Mobil</h2></div>', unsafe_allow_html=True)
     
     # Hitung jumlah transaksi dalam proses untuk badge
-    df_check = get_all_transactions()
-    jumlah_proses = len(df_check[df_check['status'] == 'Dalam Proses'])
-    jumlah_selesai = len(df_check[df_check['status'] == 'Selesai'])
+    status_counts = count_transactions_by_status()
+    jumlah_proses = status_counts['Dalam Proses']
+    jumlah_selesai = status_counts['Selesai']
+    
+    # Antrian 'Dalam Proses' dipakai untuk estimasi (tab 1) dan penyelesaian (tab 2)
+    df_proses = get_open_transactions()
     
-    tab1, tab2, tab3 = st.tabs([
+    tab1, tab2, tab3, tab4 = st.tabs([
         "📝 Transaksi Baru", 
         f"✅ Selesaikan Transaksi ({jumlah_proses})",
-        f"📚 History Customer ({jumlah_selesai})"
+        f"📚 History Customer ({jumlah_selesai})",
+        "🔎 Barang Tertinggal"
     ])
     
     with tab1:
@@ -698,6 +2988,17 @@ def transaksi_page(role):
             if nopol_input:
                 customer_data = get_customer_by_nopol(nopol_input)
             
+            # Saran nopol terdaftar selama nopol belum cocok persis
+            if nopol_input and not customer_data:
+                suggestions = suggest_nopol(nopol_input)
+                if suggestions:
+                    st.caption("💡 Nopol terdaftar yang mirip:")
+                    sug_cols = st.columns(len(suggestions))
+                    for idx, suggestion in enumerate(suggestions):
+                        with sug_cols[idx]:
+                            st.button(suggestion, key=f"nopol_suggest_{idx}",
+                                      on_click=lambda value=suggestion: st.session_state.update(trans_nopol=value))
+            
             if customer_data:
                 st.success(f"✅ Customer ditemukan: **{customer_data['nama_customer']}**")
                 nama_cust = customer_data['nama_customer']
@@ -741,6 +3042,10 @@ def transaksi_page(role):
         harga = paket_cucian[paket]
         st.success(f"💰 Harga: **Rp {harga:,.0f}**")
         
+        _, (bay_baru, eta_baru) = estimate_queue_eta(df_proses, paket_baru=paket)
+        st.info(f"⏳ Estimasi selesai jika masuk sekarang: **{eta_baru.strftime('%H:%M')}** (Bay {bay_baru}, "
+                f"{len(df_proses)} mobil dalam antrian)")
+        
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Checklist saat datang
@@ -778,16 +3083,18 @@ def transaksi_page(role):
             else:
                 # Simpan customer baru jika belum ada
                 if not customer_data:
-                    success, msg = save_customer(nopol_input, nama_cust, telp_cust or "", alamat_cust or "")
+                    success, msg = save_customer(nopol_input, nama_cust, telp_cust or "", alamat_cust or "",
+                                                 offline=st.session_state.get("kasir_offline", False))
                     if not success and "sudah terdaftar" not in msg.lower():
                         st.error(f"❌ Gagal menyimpan customer: {msg}")
                         st.stop()
                 
-                # Simpan transaksi
+                # Simpan transaksi (pakai nopol terdaftar jika customer lama)
+                nopol_trans = customer_data['nopol'] if customer_data else nopol_input.strip()
                 trans_data = {
-                    'nopol': nopol_input,
+                    'nopol': nopol_trans,
                     'nama_customer': nama_cust,
-                    'tanggal': tanggal_trans.strftime('%d-%m-%Y'),
+                    'tanggal': tanggal_trans.isoformat(),
                     'waktu_masuk': waktu_masuk.strftime('%H:%M:%S'),
                     'waktu_selesai': '',
                     'paket_cuci': paket,
@@ -800,9 +3107,10 @@ def transaksi_page(role):
                     'created_by': st.session_state.get('login_user', '')
                 }
                 
-                success, msg = save_transaction(trans_data)
+                success, msg = save_transaction(trans_data, offline=st.session_state.get("kasir_offline", False))
                 if success:
-                    add_audit("transaksi_baru", f"Nopol: {nopol_input}, Paket: {paket}, Harga: Rp {harga:,.0f}")
+                    add_audit("transaksi_baru", f"Nopol: {nopol_trans}, Paket: {paket}, Harga: Rp {harga:,.0f}",
+                              offline=st.session_state.get("kasir_offline", False))
                     st.success(f"✅ {msg}")
                     st.balloons()
                     st.rerun()
@@ -816,24 +3124,11 @@ def transaksi_page(role):
         
         checklist_selesai_items = get_checklist_selesai()
         
-        # Load transaksi yang masih dalam proses - HANYA yang berstatus "Dalam Proses"
-        df_trans = get_all_transactions()
-        
-        # PENTING: Filter KETAT hanya status "Dalam Proses" - EXACT MATCH
-        df_proses = df_trans[df_trans['status'].str.strip() == 'Dalam Proses'].copy()
-        
-        # Reset index untuk menghindari masalah indexing
-        df_proses = df_proses.reset_index(drop=True)
-        
         # Debug info untuk Admin
         if st.session_state.get('role') == 'Admin':
             with st.expander("🔧 Debug Info (Admin Only)"):
-                st.write(f"Total transaksi di database: {len(df_trans)}")
                 st.write(f"Transaksi 'Dalam Proses': {len(df_proses)}")
-                st.write(f"Transaksi 'Selesai': {len(df_trans[df_trans['status'] == 'Selesai'])}")
-                if not df_trans.empty:
-                    st.write("Status terakhir 5 transaksi:")
-                    st.dataframe(df_trans[['id', 'nopol', 'tanggal', 'status']].head(5))
+                st.write(f"Transaksi 'Selesai': {jumlah_selesai}")
                 
                 # Tampilkan detail df_proses
                 if not df_proses.empty:
@@ -846,8 +3141,17 @@ def transaksi_page(role):
         else:
             st.success(f"📋 **{len(df_proses)} transaksi** sedang dalam proses")
             
+            # Estimasi jam selesai per bay berdasarkan median waktu layanan tiap paket
+            df_eta, _ = estimate_queue_eta(df_proses)
+            with st.expander(f"⏳ Estimasi Selesai ({get_jumlah_bay()} bay)", expanded=True):
+                eta_display = df_eta[['nopol', 'paket_cuci', 'waktu_masuk', 'bay', 'eta']].copy()
+                eta_display['eta'] = eta_display['eta'].dt.strftime('%d-%m %H:%M')
+                eta_display.columns = ['🔖 Nopol', '📦 Paket', '⏰ Masuk', '🚿 Bay', '⏳ Estimasi Selesai']
+                st.dataframe(eta_display, use_container_width=True, hide_index=True)
+            
             # Pilih transaksi - HANYA dari df_proses yang sudah difilter
             trans_display = df_proses[['id', 'tanggal', 'waktu_masuk', 'nopol', 'nama_customer', 'paket_cuci', 'status']].copy()
+            trans_display['tanggal'] = format_date_column(trans_display['tanggal'])
             
             # Validasi sekali lagi bahwa semua status adalah "Dalam Proses"
             trans_display = trans_display[trans_display['status'].str.strip() == 'Dalam Proses'].copy()
@@ -877,7 +3181,6 @@ def transaksi_page(role):
             if selected_trans['status'].strip() != 'Dalam Proses':
                 st.error(f"❌ Error: Transaksi ini berstatus '{selected_trans['status']}', bukan 'Dalam Proses'")
                 st.warning("🔄 Halaman akan di-refresh otomatis...")
-                import time
                 time.sleep(2)
                 st.rerun()
                 st.stop()
@@ -890,7 +3193,7 @@ def transaksi_page(role):
                     st.markdown(f"**🔖 Nopol:** `{selected_trans['nopol']}`")
                     st.markdown(f"**👤 Customer:** {selected_trans['nama_customer']}")
                 with col2:
-                    st.markdown(f"**📅 Tanggal:** {selected_trans['tanggal']}")
+                    st.markdown(f"**📅 Tanggal:** {format_date(parse_date(selected_trans['tanggal']))}")
                     st.markdown(f"**⏰ Waktu Masuk:** {selected_trans['waktu_masuk']}")
                 with col3:
                     st.markdown(f"**📦 Paket:** {selected_trans['paket_cuci']}")
@@ -963,49 +3266,27 @@ def transaksi_page(role):
                 elif not qc_final or qc_final.strip() == "":
                     st.error("❌ Mohon isi konfirmasi barang customer!")
                 else:
-                    # Debug: tampilkan ID yang akan diupdate
-                    st.warning(f"🔍 Akan mengupdate transaksi ID: **{selected_id}** (Tipe: {type(selected_id).__name__})")
-                    
-                    # Cek ulang status sebelum update (double check)
-                    df_recheck = get_all_transactions()
-                    matching_trans = df_recheck[df_recheck['id'] == selected_id]
-                    
-                    if len(matching_trans) == 0:
-                        st.error(f"❌ Transaksi ID {selected_id} tidak ditemukan saat recheck!")
-                        st.write("IDs yang ada:", df_recheck['id'].tolist()[:10])
-                        st.stop()
-                    
-                    current_status = matching_trans['status'].iloc[0].strip()
-                    
-                    if current_status != 'Dalam Proses':
-                        st.error(f"❌ Transaksi ini sudah berstatus '{current_status}'. Halaman akan di-refresh.")
-                        import time
-                        time.sleep(2)
-                        st.rerun()
-                        st.stop()
-                    
-                    # Pastikan ID adalah integer
-                    trans_id_to_update = int(selected_id)
-                    
+                    # Status dicek atomik di dalam update_transaction_finish
                     success, msg = update_transaction_finish(
-                        trans_id_to_update,
+                        selected_id,
                         waktu_selesai.strftime('%H:%M:%S'),
                         json.dumps(selected_checks_selesai),
                         qc_final,
-                        catatan_final
+                        catatan_final,
+                        offline=st.session_state.get("kasir_offline", False)
                     )
                     
                     if success:
-                        add_audit("transaksi_selesai", f"ID: {selected_id}, Nopol: {selected_trans['nopol']}")
+                        add_audit("transaksi_selesai", f"ID: {selected_id}, Nopol: {selected_trans['nopol']}",
+                                  offline=st.session_state.get("kasir_offline", False))
                         
                         # Clear any session state cache
                         if 'finish_trans' in st.session_state:
                             del st.session_state['finish_trans']
                         
-                        st.success(f"✅ {msg} - Transaksi telah dipindahkan ke status Selesai")
+                        st.success(f"✅ {msg}")
                         st.balloons()
-                        import time
-                        time.sleep(1)  # Delay untuk memastikan database ter-commit
+                        time.sleep(1)
                         st.rerun()
                     else:
                         st.error(f"❌ {msg}")
@@ -1015,27 +3296,21 @@ def transaksi_page(role):
         st.markdown('<p class="section-title">📚 History Customer - Transaksi Selesai</p>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
-        # Load transaksi yang sudah selesai
-        df_trans = get_all_transactions()
-        df_selesai = df_trans[df_trans['status'] == 'Selesai'].copy()
-        
-        if df_selesai.empty:
+        if jumlah_selesai == 0:
             st.info("📭 Belum ada transaksi yang selesai")
         else:
-            st.success(f"📋 **{len(df_selesai)} transaksi** telah selesai dikerjakan")
+            st.success(f"📋 **{jumlah_selesai} transaksi** telah selesai dikerjakan")
             
-            # Filter pencarian
-            col1, col2, col3 = st.columns([2, 2, 1])
+            # Filter pencarian: customer dicari lewat index (subquery), plus nopol/nama di transaksi
+            col1, col2 = st.columns([4, 1])
             with col1:
-                search_nopol = st.text_input("🔍 Cari Nopol", key="search_history_nopol")
-            with col2:
-                search_customer = st.text_input("🔍 Cari Nama Customer", key="search_history_customer")
+                search_history = st.text_input("🔍 Cari Customer", key="search_history_customer",
+                                               placeholder="Nopol (sebagian), nama, telepon atau alamat...")
             
-            # Apply filter
-            if search_nopol:
-                df_selesai = df_selesai[df_selesai['nopol'].str.contains(search_nopol, case=False, na=False)]
-            if search_customer:
-                df_selesai = df_selesai[df_selesai['nama_customer'].str.contains(search_customer, case=False, na=False)]
+            history_limit = 500
+            df_selesai = get_finished_transactions(search_history, limit=history_limit)
+            if len(df_selesai) == history_limit:
+                st.caption(f"Menampilkan {history_limit} transaksi terbaru yang sesuai")
             
             # Tampilkan tabel history
             if not df_selesai.empty:
@@ -1044,6 +3319,7 @@ def transaksi_page(role):
                 # Pilih transaksi untuk lihat detail
                 with st.expander("👁️ Lihat Detail Transaksi"):
                     trans_display = df_selesai[['id', 'tanggal', 'waktu_masuk', 'waktu_selesai', 'nopol', 'nama_customer', 'paket_cuci', 'harga']].copy()
+                    trans_display['tanggal'] = format_date_column(trans_display['tanggal'])
                     trans_display['display'] = trans_display.apply(
                         lambda x: f"✅ {x['tanggal']} | {x['waktu_masuk']}-{x['waktu_selesai']} | {x['nopol']} - {x['nama_customer']} | {x['paket_cuci']} (Rp {x['harga']:,.0f})", axis=1
                     )
@@ -1069,7 +3345,7 @@ def transaksi_page(role):
                     
                     with col2:
                         st.markdown("**⏰ Waktu**")
-                        st.write(f"📅 Tanggal: {selected_hist['tanggal']}")
+                        st.write(f"📅 Tanggal: {format_date(parse_date(selected_hist['tanggal']))}")
                         st.write(f"🕐 Masuk: {selected_hist['waktu_masuk']}")
                         st.write(f"🕐 Selesai: {selected_hist['waktu_selesai']}")
                         st.write(f"👤 Oleh: {selected_hist['created_by']}")
@@ -1099,12 +3375,67 @@ def transaksi_page(role):
                 # Tabel ringkas
                 st.markdown("### 📊 Daftar Transaksi Selesai")
                 df_display = df_selesai[['tanggal', 'waktu_masuk', 'waktu_selesai', 'nopol', 'nama_customer', 'paket_cuci', 'harga']].copy()
+                df_display['tanggal'] = format_date_column(df_display['tanggal'])
                 df_display.columns = ['📅 Tanggal', '⏰ Masuk', '⏰ Selesai', '🔖 Nopol', '👤 Customer', '📦 Paket', '💰 Harga']
                 df_display['💰 Harga'] = df_display['💰 Harga'].apply(lambda x: f"Rp {x:,.0f}")
                 
                 st.dataframe(df_display, use_container_width=True, hide_index=True)
             else:
                 st.warning("⚠️ Tidak ada transaksi yang sesuai dengan pencarian")
+    
+    with tab4:
+        st.markdown('<div class="form-section">', unsafe_allow_html=True)
+        st.markdown('<p class="section-title">🔎 Cari Barang Tertinggal</p>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        search_barang = st.text_input("🔍 Cari di QC barang, catatan atau nopol", key="search_lost_item",
+                                      placeholder="Contoh: dompet coklat, payung, B 1234...")
+        if search_barang.strip():
+            df_barang = search_lost_items(search_barang)
+            if df_barang.empty:
+                st.warning("⚠️ Tidak ada transaksi dengan barang/catatan yang cocok")
+            else:
+                if len(df_barang) == LOST_FOUND_LIMIT:
+                    st.caption(f"Menampilkan {LOST_FOUND_LIMIT} transaksi terbaru yang cocok")
+                else:
+                    st.success(f"✅ Ditemukan {len(df_barang)} transaksi, terbaru di atas")
+                df_display = df_barang[['tanggal', 'waktu_masuk', 'waktu_selesai', 'nopol', 'nama_customer',
+                                        'qc_barang', 'catatan', 'status']].copy()
+                df_display['tanggal'] = format_date_column(df_display['tanggal'])
+                df_display.columns = ['📅 Tanggal', '⏰ Masuk', '⏰ Selesai', '🔖 Nopol', '👤 Customer',
+                                      '📋 QC Barang', '💬 Catatan', '📊 Status']
+                st.dataframe(df_display, use_container_width=True, hide_index=True)
+        else:
+            st.info("💡 Ketik nama barang (mis. dompet, payung) atau nopol untuk mencari di riwayat transaksi")
+
+@st.fragment(run_every=QUEUE_BOARD_REFRESH_SECONDS)
+def queue_board_fragment():
+    """Isi papan antrian; hanya fragment ini yang di-rerun setiap interval"""
+    df_proses, df_selesai = get_queue_board().snapshot()
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader(f"🚿 Sedang Dicuci ({len(df_proses)})")
+        if df_proses.empty:
+            st.info("Tidak ada mobil dalam antrian")
+        else:
+            board = df_proses[['nopol', 'nama_customer', 'paket_cuci', 'waktu_masuk']].copy()
+            board.columns = ['🔖 Nopol', '👤 Customer', '📦 Paket', '⏰ Masuk']
+            st.dataframe(board, use_container_width=True, hide_index=True)
+    with col2:
+        st.subheader("✅ Baru Selesai")
+        if df_selesai.empty:
+            st.info("Belum ada mobil selesai hari ini")
+        else:
+            board = df_selesai[['nopol', 'nama_customer', 'paket_cuci', 'waktu_selesai']].copy()
+            board.columns = ['🔖 Nopol', '👤 Customer', '📦 Paket', '🏁 Selesai']
+            st.dataframe(board, use_container_width=True, hide_index=True)
+    
+    st.caption(f"🔄 Diperbarui {datetime.now(WIB).strftime('%H:%M:%S')} WIB, otomatis setiap {QUEUE_BOARD_REFRESH_SECONDS} detik")
+
+def queue_board_page():
+    st.header("📺 Papan Antrian")
+    queue_board_fragment()
 
 def customer_page(role):
     st.markdown("""
@@ -1145,12 +3476,13 @@ def customer_page(role):
     
     st.markdown('<div class="cust-header"><h2>👥 Manajemen Customer</h2></div>', unsafe_allow_html=True)
     
-    tab1, tab2 = st.tabs(["📋 Daftar Customer", "➕ Tambah Customer Baru"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📋 Daftar Customer", "➕ Tambah Customer Baru", "📤 Import Customer",
+                                      "🔔 Follow-up Kunjungan"])
     
     with tab1:
-        df_cust = get_all_customers()
+        total_customer = count_customers()
         
-        if df_cust.empty:
+        if total_customer == 0:
             st.info("📭 Belum ada customer terdaftar. Silakan tambah customer baru di tab sebelah →")
         else:
             # Search dengan UI lebih baik
@@ -1158,27 +3490,46 @@ def customer_page(role):
             col1, col2 = st.columns([3, 1])
             with col1:
                 search = st.text_input("🔍 Cari customer", key="cust_search", 
-                                      placeholder="Ketik nopol atau nama customer...",
+                                      placeholder="Ketik nopol (sebagian), nama, telepon atau alamat...",
                                       label_visibility="collapsed")
             with col2:
-                st.metric("📊 Total Customer", len(df_cust))
+                st.metric("📊 Total Customer", total_customer)
             st.markdown('</div>', unsafe_allow_html=True)
             
-            if search:
-                mask = df_cust['nopol'].str.contains(search, case=False, na=False) | \
-                       df_cust['nama_customer'].str.contains(search, case=False, na=False)
-                df_display = df_cust[mask]
-                if not df_display.empty:
-                    st.success(f"✅ Ditemukan {len(df_display)} customer")
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                sort_by = st.selectbox("↕️ Urutkan", options=list(CUSTOMER_SORT_OPTIONS.keys()), key="cust_sort")
+            with col2:
+                min_kunjungan = st.number_input("🔁 Min. Kunjungan", min_value=0, value=0, step=1, key="cust_min_visit")
+            
+            # Hitung total dulu untuk batas halaman, lalu ambil halaman yang dipilih
+            total_cocok = count_customers_with_stats(int(min_kunjungan), search)
+            total_pages = max(1, (total_cocok - 1) // CUSTOMER_PAGE_SIZE + 1)
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                page = st.number_input("📄 Halaman", min_value=1, max_value=total_pages, value=1, step=1,
+                                       key="cust_page")
+            with col2:
+                if search:
+                    if total_cocok:
+                        st.success(f"✅ Ditemukan {total_cocok} customer")
+                    else:
+                        st.warning("⚠️ Tidak ada customer yang cocok dengan pencarian")
                 else:
-                    st.warning("⚠️ Tidak ada customer yang cocok dengan pencarian")
-            else:
-                df_display = df_cust
+                    st.caption(f"Halaman {page} dari {total_pages}")
+            
+            df_display = get_customers_with_stats(sort_by, int(min_kunjungan), search, page=int(page))
             
             if not df_display.empty:
                 # Display dengan styling lebih baik
-                df_show = df_display[['nopol', 'nama_customer', 'no_telp', 'alamat', 'created_at']].copy()
-                df_show.columns = ['🔖 Nopol', '👤 Nama', '📞 Telepon', '📍 Alamat', '📅 Terdaftar']
+                df_show = df_display[['nopol', 'nama_customer', 'no_telp', 'alamat', 'kunjungan', 'total_belanja',
+                                      'kunjungan_terakhir', 'paket_favorit', 'rata_interval_hari', 'created_at']].copy()
+                df_show['kunjungan_terakhir'] = format_date_column(df_show['kunjungan_terakhir']).where(
+                    df_show['kunjungan_terakhir'].notna(), '-')
+                df_show['total_belanja'] = df_show['total_belanja'].apply(lambda x: f"Rp {x:,.0f}")
+                df_show['rata_interval_hari'] = pd.to_numeric(df_show['rata_interval_hari']).round(1)
+                df_show.columns = ['🔖 Nopol', '👤 Nama', '📞 Telepon', '📍 Alamat', '🔁 Kunjungan', '💰 Total Belanja',
+                                   '🕒 Terakhir', '⭐ Paket Favorit', '📆 Interval (hari)', '📅 Terdaftar']
                 
                 st.dataframe(
                     df_show,
@@ -1193,15 +3544,18 @@ def customer_page(role):
                     }
                 )
                 
-                # Download CSV
+                # Download CSV (semua customer sesuai filter, dibuat bertahap saat tombol diklik)
                 col1, col2, col3 = st.columns([2, 1, 2])
+                with col1:
+                    gzip_cust = st.checkbox("🗜️ Kompres (gzip)", key="cust_export_gzip")
                 with col2:
-                    csv = df_show.to_csv(index=False).encode('utf-8')
                     st.download_button(
                         "📥 Download CSV", 
-                        data=csv, 
-                        file_name=f"customer_list_{datetime.now(WIB).strftime('%d%m%Y')}.csv", 
-                        mime="text/csv",
+                        data=lambda: export_file(iter_customers_csv(sort_by, int(min_kunjungan), search,
+                                                                    compress=gzip_cust)),
+                        file_name=f"customer_list_{datetime.now(WIB).strftime('%d%m%Y')}.csv"
+                                  + (".gz" if gzip_cust else ""),
+                        mime="application/gzip" if gzip_cust else "text/csv",
                         use_container_width=True
                     )
     
@@ -1238,6 +3592,95 @@ def customer_page(role):
                         st.error(f"❌ {msg}")
         
         st.markdown('</div>', unsafe_allow_html=True)
+    
+    with tab3:
+        st.markdown('<div class="customer-card">', unsafe_allow_html=True)
+        st.subheader("📤 Import Customer dari File")
+        st.info("💡 File CSV atau Excel (.xlsx) dengan kolom **Nopol** dan **Nama** (opsional: Telepon, Alamat). "
+                "Nopol dinormalisasi; duplikat dalam file hanya diambil baris pertama.")
+        
+        uploaded = st.file_uploader("Pilih file", type=["csv", "xlsx"], key="cust_import_file")
+        update_existing = st.checkbox("🔄 Perbarui data customer yang sudah terdaftar", value=True,
+                                      key="cust_import_update")
+        
+        if uploaded and st.button("📥 Import Sekarang", type="primary", use_container_width=True):
+            progress_bar = st.progress(0.0, text="Mengimport...")
+            file_size = uploaded.size or 1
+            
+            def on_progress(jumlah_baris):
+                fraction = min(uploaded.tell() / file_size, 1.0)
+                progress_bar.progress(fraction, text=f"Mengimport... {jumlah_baris:,} baris diproses")
+            
+            try:
+                result = import_customers(uploaded, uploaded.name, update_existing, progress=on_progress)
+            except ValueError as e:
+                progress_bar.empty()
+                st.error(f"❌ {e}")
+            else:
+                progress_bar.progress(1.0, text=f"Selesai: {result['total']:,} baris diproses")
+                add_audit("customer_import", f"File: {uploaded.name}, Baru: {result['baru']}, "
+                          f"Diperbarui: {result['diperbarui']}, Ditolak: {len(result['rejects'])}")
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("🆕 Baru", result['baru'])
+                col2.metric("🔄 Diperbarui", result['diperbarui'])
+                col3.metric("⏭️ Dilewati", result['dilewati'])
+                col4.metric("❌ Ditolak", len(result['rejects']))
+                
+                if result['rejects']:
+                    df_rejects = pd.DataFrame(result['rejects'])
+                    df_rejects.columns = ['Baris', 'Nopol', 'Nama', 'Alasan']
+                    st.warning(f"⚠️ {len(df_rejects)} baris ditolak")
+                    st.dataframe(df_rejects, use_container_width=True, hide_index=True)
+                    st.download_button("📥 Download Baris Ditolak", data=df_rejects.to_csv(index=False).encode('utf-8'),
+                                       file_name="customer_import_ditolak.csv", mime="text/csv")
+                else:
+                    st.success("✅ Semua baris berhasil diimport")
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with tab4:
+        st.markdown('<div class="customer-card">', unsafe_allow_html=True)
+        st.subheader("🔔 Customer Lewat Jadwal Kunjungan")
+        st.caption("Jadwal = kunjungan terakhir + rata-rata jarak kunjungan customer "
+                   "(atau rata-rata jarak paket terakhirnya untuk customer yang baru sekali datang).")
+        
+        total_overdue = count_overdue_customers()
+        if total_overdue == 0:
+            st.success("✅ Tidak ada customer yang perlu di-follow-up")
+        else:
+            total_pages = max(1, (total_overdue - 1) // CUSTOMER_PAGE_SIZE + 1)
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                page = st.number_input("📄 Halaman", min_value=1, max_value=total_pages, value=1, step=1,
+                                       key="cust_followup_page")
+            with col2:
+                st.metric("🔔 Perlu Di-follow-up", total_overdue)
+            
+            df_overdue = get_overdue_customers(page=int(page))
+            df_show = df_overdue[['nopol', 'nama_customer', 'no_telp', 'kunjungan', 'paket_terakhir',
+                                  'kunjungan_terakhir', 'jatuh_tempo', 'terlambat_hari']].copy()
+            df_show['nama_customer'] = df_show['nama_customer'].fillna('-')
+            df_show['no_telp'] = df_show['no_telp'].fillna('-')
+            df_show['kunjungan_terakhir'] = format_date_column(df_show['kunjungan_terakhir'])
+            df_show['jatuh_tempo'] = format_date_column(df_show['jatuh_tempo'])
+            df_show.columns = ['🔖 Nopol', '👤 Nama', '📞 Telepon', '🔁 Kunjungan', '📦 Paket Terakhir',
+                               '🕒 Terakhir', '📆 Jadwal', '⏰ Terlambat (hari)']
+            st.dataframe(df_show, use_container_width=True, hide_index=True)
+            
+            nopol_by_key = dict(zip(df_overdue['nopol_key'], df_overdue['nopol']))
+            selected_keys = st.multiselect("✅ Tandai sudah dihubungi", options=list(nopol_by_key),
+                                           format_func=lambda key: nopol_by_key[key], key="cust_followup_done")
+            if st.button("💾 Simpan Follow-up", type="primary", disabled=not selected_keys):
+                success, msg = mark_customer_followed_up(selected_keys)
+                if success:
+                    add_audit("customer_follow_up", f"Nopol: {', '.join(nopol_by_key[key] for key in selected_keys)}")
+                    st.success(f"✅ {msg}")
+                    time.sleep(1)
+                    st.rerun()
+                else:
+                    st.error(f"❌ {msg}")
+        
+        st.markdown('</div>', unsafe_allow_html=True)
 
 def laporan_page(role):
     st.markdown("""
@@ -1300,24 +3743,41 @@ def laporan_page(role):
     </div>
     ''', unsafe_allow_html=True)
     
-    df_trans = get_all_transactions()
+    years = get_revenue_years()
+    # Multi-outlet: tahun dari semua outlet, supaya konsolidasi tetap bisa dibuka
+    # walau outlet aktif belum punya transaksi
+    if len(OUTLETS) > 1:
+        years = sorted(set(years).union(*fan_out(get_revenue_years).values()), reverse=True)
     
-    if df_trans.empty:
+    if not years:
         st.info("📭 Belum ada data transaksi")
         return
     
+    # Export transaksi per rentang tanggal (CSV dibuat bertahap saat tombol diklik)
+    with st.expander("📥 Export Transaksi (CSV)"):
+        col1, col2, col3 = st.columns([2, 1, 1])
+        with col1:
+            today = datetime.now(WIB).date()
+            export_range = st.date_input("📅 Rentang Tanggal", value=(today.replace(day=1), today),
+                                         key="lap_export_range")
+        with col2:
+            gzip_trans = st.checkbox("🗜️ Kompres (gzip)", key="lap_export_gzip")
+        with col3:
+            if isinstance(export_range, (list, tuple)) and len(export_range) == 2:
+                start_export, end_export = (d.isoformat() for d in export_range)
+                st.download_button(
+                    "📥 Download CSV",
+                    data=lambda: export_file(iter_transactions_csv(start_export, end_export, compress=gzip_trans)),
+                    file_name=f"transaksi_{start_export}_{end_export}.csv" + (".gz" if gzip_trans else ""),
+                    mime="application/gzip" if gzip_trans else "text/csv",
+                    use_container_width=True
+                )
+    
     # Filter bulan dan tahun
     st.markdown('<div class="filter-section">', unsafe_allow_html=True)
     col1, col2, col3 = st.columns([1, 1, 2])
     
-    # Parse tanggal
-    df_trans['tanggal_dt'] = pd.to_datetime(df_trans['tanggal'], format='%d-%m-%Y', errors='coerce')
-    df_trans['bulan'] = df_trans['tanggal_dt'].dt.month
-    df_trans['tahun'] = df_trans['tanggal_dt'].dt.year
-    df_trans['bulan_tahun'] = df_trans['tanggal_dt'].dt.strftime('%m-%Y')
-    
     with col1:
-        years = sorted(df_trans['tahun'].dropna().unique(), reverse=True)
         selected_year = st.selectbox("📅 Tahun", options=years, key="lap_year")
     
     with col2:
@@ -1328,19 +3788,52 @@ def laporan_page(role):
                                      format_func=lambda x: month_names[x], key="lap_month")
     st.markdown('</div>', unsafe_allow_html=True)
     
-    # Filter data
-    df_filtered = df_trans[df_trans['tahun'] == selected_year].copy()
-    
+    # Filter data: baca rollup harian periode terpilih saja
     if selected_month != 0:  # Not "All"
-        df_filtered = df_filtered[df_filtered['bulan'] == selected_month]
+        start_date = f"{selected_year}-{selected_month:02d}-01"
+        end_date = f"{selected_year}-{selected_month:02d}-31"
+    else:
+        start_date = f"{selected_year}-01-01"
+        end_date = f"{selected_year}-12-31"
+    df_filtered = get_daily_revenue(start_date, end_date)
+    
+    # Konsolidasi head office: satu fan-out paralel ke database semua outlet
+    if len(OUTLETS) > 1:
+        with st.expander("🏢 Konsolidasi Semua Outlet", expanded=False):
+            per_outlet, gabungan = get_consolidated_revenue(start_date, end_date)
+            if gabungan.empty:
+                st.info("📭 Belum ada transaksi di outlet mana pun untuk periode ini")
+            else:
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.metric("💰 Total Pendapatan Semua Outlet", f"Rp {gabungan['total'].sum():,.0f}")
+                with col2:
+                    st.metric("🚗 Total Transaksi Semua Outlet", int(gabungan['jumlah'].sum()))
+                
+                outlet_summary = per_outlet.groupby('outlet', as_index=False)[['jumlah', 'total']].sum()
+                outlet_summary = outlet_summary.sort_values('total', ascending=False)
+                chart = alt.Chart(outlet_summary).mark_bar(cornerRadiusEnd=8).encode(
+                    x=alt.X('total:Q', title='Pendapatan (Rp)'),
+                    y=alt.Y('outlet:N', sort='-x', title=''),
+                    tooltip=[
+                        alt.Tooltip('outlet:N', title='Outlet'),
+                        alt.Tooltip('jumlah:Q', title='Transaksi'),
+                        alt.Tooltip('total:Q', format=',.0f', title='Pendapatan (Rp)')
+                    ]
+                ).properties(height=200)
+                st.altair_chart(chart, use_container_width=True)
+                
+                outlet_summary['total'] = outlet_summary['total'].apply(lambda x: f"Rp {x:,.0f}")
+                outlet_summary.columns = ['Outlet', 'Jumlah', 'Total Pendapatan']
+                st.dataframe(outlet_summary, use_container_width=True, hide_index=True)
     
     if df_filtered.empty:
         st.warning("⚠️ Tidak ada data untuk periode ini")
         return
     
     # Statistik
-    total_pendapatan = df_filtered['harga'].sum()
-    total_transaksi = len(df_filtered)
+    total_pendapatan = df_filtered['total'].sum()
+    total_transaksi = int(df_filtered['jumlah'].sum())
     avg_transaksi = total_pendapatan / total_transaksi if total_transaksi > 0 else 0
     
     col1, col2, col3 = st.columns(3)
@@ -1358,10 +3851,10 @@ def laporan_page(role):
     st.markdown('<p class="report-title">📦 Pendapatan per Paket Cuci</p>', unsafe_allow_html=True)
     
     paket_summary = df_filtered.groupby('paket_cuci').agg(
-        Jumlah=('id', 'count'),
-        Total_Pendapatan=('harga', 'sum'),
-        Rata_rata=('harga', 'mean')
+        Jumlah=('jumlah', 'sum'),
+        Total_Pendapatan=('total', 'sum')
     ).reset_index()
+    paket_summary['Rata_rata'] = paket_summary['Total_Pendapatan'] / paket_summary['Jumlah']
     paket_summary.columns = ['Paket Cuci', 'Jumlah', 'Total Pendapatan', 'Rata-rata']
     paket_summary = paket_summary.sort_values('Total Pendapatan', ascending=False)
     
@@ -1378,7 +3871,7 @@ def laporan_page(role):
     with col1:
         st.markdown('<div class="report-box">', unsafe_allow_html=True)
         st.markdown('<p class="report-title">📊 Jumlah Transaksi per Paket</p>', unsafe_allow_html=True)
-        paket_count = df_filtered.groupby('paket_cuci').size().reset_index(name='count')
+        paket_count = df_filtered.groupby('paket_cuci')['jumlah'].sum().reset_index(name='count')
         paket_count = paket_count.sort_values('count', ascending=False)
         chart = alt.Chart(paket_count).mark_bar(cornerRadiusEnd=8).encode(
             x=alt.X('count:Q', title='Jumlah'),
@@ -1395,7 +3888,7 @@ def laporan_page(role):
     with col2:
         st.markdown('<div class="report-box">', unsafe_allow_html=True)
         st.markdown('<p class="report-title">💰 Pendapatan per Paket</p>', unsafe_allow_html=True)
-        paket_income = df_filtered.groupby('paket_cuci')['harga'].sum().reset_index()
+        paket_income = df_filtered.groupby('paket_cuci')['total'].sum().reset_index()
         paket_income.columns = ['paket', 'total']
         pie = alt.Chart(paket_income).mark_arc(innerRadius=60).encode(
             theta='total:Q',
@@ -1413,18 +3906,18 @@ def laporan_page(role):
         st.markdown('<div class="report-box">', unsafe_allow_html=True)
         st.markdown('<p class="report-title">📈 Tren Pendapatan Harian</p>', unsafe_allow_html=True)
         daily_income = df_filtered.groupby('tanggal').agg(
-            total=('harga', 'sum'),
-            count=('id', 'count')
+            total=('total', 'sum'),
+            count=('jumlah', 'sum')
         ).reset_index().sort_values('tanggal')
         
         # Convert tanggal untuk chart
-        daily_income['tanggal_dt'] = pd.to_datetime(daily_income['tanggal'], format='%d-%m-%Y')
+        daily_income['tanggal_dt'] = pd.to_datetime(daily_income['tanggal'], format='%Y-%m-%d')
         
         line = alt.Chart(daily_income).mark_line(point=True, strokeWidth=3, color='#fa709a').encode(
             x=alt.X('tanggal_dt:T', title='Tanggal', axis=alt.Axis(format='%d-%m')),
             y=alt.Y('total:Q', title='Pendapatan (Rp)'),
             tooltip=[
-                alt.Tooltip('tanggal:N', title='Tanggal'),
+                alt.Tooltip('tanggal_dt:T', title='Tanggal', format='%d-%m-%Y'),
                 alt.Tooltip('total:Q', format=',.0f', title='Rp'),
                 alt.Tooltip('count:Q', title='Transaksi')
             ]
@@ -1432,6 +3925,115 @@ def laporan_page(role):
         
         st.altair_chart(line, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Heatmap kedatangan hari x jam dari matriks bulanan periode terpilih
+    st.markdown('<div class="report-box">', unsafe_allow_html=True)
+    st.markdown('<p class="report-title">🕒 Kedatangan per Hari & Jam</p>', unsafe_allow_html=True)
+    metric = st.radio("Tampilkan", options=['Jumlah Mobil', 'Pendapatan'], horizontal=True, key="lap_heatmap_metric")
+    jumlah_matrix, total_matrix = get_arrival_matrix(start_date[:7], end_date[:7])
+    matrix = jumlah_matrix if metric == 'Jumlah Mobil' else total_matrix
+    jam_aktif = np.flatnonzero(jumlah_matrix.sum(axis=0))
+    if jam_aktif.size == 0:
+        st.info("📭 Belum ada data kedatangan untuk periode ini")
+    else:
+        jam = np.arange(jam_aktif[0], jam_aktif[-1] + 1)
+        df_heatmap = pd.DataFrame({
+            'hari': np.repeat(HARI, len(jam)),
+            'jam': np.tile([f"{j:02d}:00" for j in jam], 7),
+            'nilai': matrix[:, jam].ravel()
+        })
+        heatmap = alt.Chart(df_heatmap).mark_rect(cornerRadius=3).encode(
+            x=alt.X('jam:O', title='Jam Masuk'),
+            y=alt.Y('hari:O', sort=HARI, title=''),
+            color=alt.Color('nilai:Q', scale=alt.Scale(scheme='orangered'), title=metric),
+            tooltip=[
+                alt.Tooltip('hari:O', title='Hari'),
+                alt.Tooltip('jam:O', title='Jam'),
+                alt.Tooltip('nilai:Q', format=',.0f', title=metric)
+            ]
+        ).properties(height=260)
+        st.altair_chart(heatmap, use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Prediksi permintaan untuk perencanaan staf (tidak tergantung filter periode)
+    st.markdown('<div class="report-box">', unsafe_allow_html=True)
+    st.markdown(f'<p class="report-title">🔮 Prediksi {FORECAST_HORIZON_DAYS} Hari ke Depan</p>', unsafe_allow_html=True)
+    df_pred_harian, df_pred_jam = get_demand_forecast().get()
+    if df_pred_harian.empty:
+        st.info(f"📭 Butuh riwayat minimal {FORECAST_MIN_HISTORY_DAYS} hari untuk prediksi")
+    else:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("🚗 Prediksi Jumlah Mobil", f"{df_pred_harian['jumlah'].sum():,.0f}")
+        with col2:
+            st.metric("💰 Prediksi Pendapatan", f"Rp {df_pred_harian['pendapatan'].sum():,.0f}")
+        
+        # Copy: df_pred_harian milik cache DemandForecast yang dipakai semua sesi
+        df_chart = df_pred_harian.copy()
+        df_chart['tanggal_dt'] = pd.to_datetime(df_chart['tanggal'], format='%Y-%m-%d')
+        bars = alt.Chart(df_chart).mark_bar().encode(
+            x=alt.X('tanggal_dt:T', title='Tanggal', axis=alt.Axis(format='%d-%m')),
+            y=alt.Y('jumlah:Q', title='Prediksi Jumlah Mobil'),
+            color=alt.Color('paket_cuci:N', legend=alt.Legend(orient='bottom', title=None)),
+            tooltip=[
+                alt.Tooltip('tanggal_dt:T', title='Tanggal', format='%d-%m-%Y'),
+                alt.Tooltip('paket_cuci:N', title='Paket'),
+                alt.Tooltip('jumlah:Q', format=',.1f', title='Mobil'),
+                alt.Tooltip('pendapatan:Q', format=',.0f', title='Pendapatan (Rp)')
+            ]
+        ).properties(height=280)
+        st.altair_chart(bars, use_container_width=True)
+        
+        tanggal_pred = st.selectbox("📅 Prediksi per Jam untuk Tanggal", options=df_pred_harian['tanggal'].unique().tolist(),
+                                    format_func=lambda x: f"{HARI[date.fromisoformat(x).weekday()]}, {format_date(date.fromisoformat(x))}",
+                                    key="lap_forecast_date")
+        df_hari = df_pred_jam[df_pred_jam['tanggal'] == tanggal_pred].copy()
+        df_hari['jam'] = df_hari['jam'].map(lambda j: f"{j:02d}:00")
+        hourly = alt.Chart(df_hari).mark_bar().encode(
+            x=alt.X('jam:O', title='Jam Masuk'),
+            y=alt.Y('sum(jumlah):Q', title='Prediksi Jumlah Mobil'),
+            color=alt.Color('paket_cuci:N', legend=alt.Legend(orient='bottom', title=None)),
+            tooltip=[
+                alt.Tooltip('jam:O', title='Jam'),
+                alt.Tooltip('paket_cuci:N', title='Paket'),
+                alt.Tooltip('jumlah:Q', format=',.1f', title='Mobil')
+            ]
+        ).properties(height=250)
+        st.altair_chart(hourly, use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Waktu layanan (seluruh riwayat, dari sketch kuantil)
+    st.markdown('<div class="report-box">', unsafe_allow_html=True)
+    st.markdown('<p class="report-title">⏱️ Waktu Layanan (menit)</p>', unsafe_allow_html=True)
+    tab_paket, tab_staff, tab_jam = st.tabs(["📦 Per Paket", "👤 Per Staff", "🕐 Per Jam Masuk"])
+    for tab, dimensi, label in [(tab_paket, 'paket', 'Paket Cuci'), (tab_staff, 'staff', 'Staff'),
+                                (tab_jam, 'jam', 'Jam Masuk')]:
+        with tab:
+            df_service = get_service_time_percentiles(dimensi)
+            if df_service.empty:
+                st.info("📭 Belum ada transaksi selesai")
+                continue
+            df_service[['p50', 'p90', 'p99']] = df_service[['p50', 'p90', 'p99']].round(0)
+            df_service.columns = [label, 'Jumlah', 'P50', 'P90', 'P99']
+            st.dataframe(df_service, use_container_width=True, hide_index=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    # QC checklist: item yang tidak dicentang pada periode terpilih
+    st.markdown('<div class="report-box">', unsafe_allow_html=True)
+    st.markdown('<p class="report-title">🔍 QC Checklist - Tingkat Gagal</p>', unsafe_allow_html=True)
+    phase = st.radio("Checklist", options=list(CHECKLIST_PHASES), horizontal=True, key="lap_qc_phase",
+                     format_func=lambda x: {'datang': 'Saat Datang', 'selesai': 'Saat Selesai'}[x])
+    tab_item, tab_paket, tab_staff, tab_minggu = st.tabs(["✅ Per Item", "📦 Per Paket", "👤 Per Staff", "📅 Per Minggu"])
+    for tab, dimensi, label in [(tab_item, None, None), (tab_paket, 'paket', 'Paket Cuci'),
+                                (tab_staff, 'staff', 'Staff'), (tab_minggu, 'minggu', 'Minggu')]:
+        with tab:
+            df_qc = get_qc_failure_rates(phase, start_date, end_date, dimensi)
+            if df_qc.empty:
+                st.info("📭 Belum ada data checklist untuk periode ini")
+                continue
+            df_qc.columns = ['Item'] + ([label] if dimensi else []) + ['Total', 'Tidak Dicentang', 'Gagal (%)']
+            st.dataframe(df_qc, use_container_width=True, hide_index=True)
+    st.markdown('</div>', unsafe_allow_html=True)
 
 def setting_toko_page(role):
     st.markdown("""
@@ -1650,6 +4252,8 @@ def setting_toko_page(role):
                 telp_toko = st.text_input("📞 Telepon", value=toko_info.get("telp", ""))
             with col2:
                 email_toko = st.text_input("📧 Email", value=toko_info.get("email", ""))
+            jumlah_bay = st.number_input("🚿 Jumlah Bay Cuci", min_value=1, max_value=50, step=1,
+                                         value=get_jumlah_bay(), help="Dipakai untuk estimasi jam selesai antrian")
             
             submitted = st.form_submit_button("💾 Simpan Info Toko", type="primary", use_container_width=True)
             
@@ -1660,7 +4264,7 @@ def setting_toko_page(role):
                     "telp": telp_toko,
                     "email": email_toko
                 }
-                success, msg = update_setting("toko_info", new_toko_info)
+                success, msg = update_settings({"toko_info": new_toko_info, "jumlah_bay": int(jumlah_bay)})
                 if success:
                     add_audit("setting_toko", "Update info toko")
                     st.success("✅ Info toko berhasil diupdate")
@@ -1680,63 +4284,75 @@ def audit_trail_page():
     else:
         st.info("Anda hanya dapat melihat aktivitas Anda sendiri.")
     
-    # Load audit trail dari database
-    df_audit = load_audit_trail()
-
     # Filters
     c1, c2, c3 = st.columns([1,1,1.2])
-    all_users = sorted(df_audit['user'].dropna().unique().tolist()) if not df_audit.empty else []
     with c1:
         if role == "Supervisor":
+            all_users = get_audit_users()
             user_filter = st.multiselect("Filter User", options=all_users, default=all_users)
+            # Semua user terpilih -> tanpa filter user (tidak perlu IN dengan daftar panjang)
+            users = None if set(user_filter) == set(all_users) else user_filter
         else:
-            user_filter = [uname]
+            users = [uname]
             st.multiselect("Filter User", options=[uname], default=[uname], disabled=True)
     with c2:
         search = st.text_input("Cari kata kunci", placeholder="action/detail...")
     with c3:
-        if not df_audit.empty:
-            # Parse timestamps dengan format fleksibel (support format lama dan baru)
-            df_audit['timestamp_dt'] = pd.to_datetime(df_audit['timestamp'], format='mixed', dayfirst=True, errors='coerce')
-            date_min = df_audit['timestamp_dt'].min().date()
-            date_max = df_audit['timestamp_dt'].max().date()
-        else:
-            date_min = date_max = datetime.now().date()
+        date_min, date_max = get_audit_date_bounds()
+        if date_min is None:
+            date_min = date_max = datetime.now(WIB).date()
         date_range = st.date_input("Rentang tanggal", value=(date_min, date_max))
-
-    # Apply filters
-    if not df_audit.empty:
-        # timestamp_dt sudah di-parse di atas
-        
-        # Filter by user
-        if user_filter:
-            df_audit = df_audit[df_audit['user'].isin(user_filter)]
-        
-        # Filter by search keyword
-        if search:
-            mask = df_audit['action'].str.contains(search, case=False, na=False) | df_audit['detail'].str.contains(search, case=False, na=False)
-            df_audit = df_audit[mask]
-        
-        # Filter by date range
-        if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
-            start_d, end_d = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
-            df_audit = df_audit[(df_audit['timestamp_dt'] >= start_d) & (df_audit['timestamp_dt'] <= end_d + pd.Timedelta(days=1))]
-        
-        # Display results
-        df_display = df_audit.drop(columns=['timestamp_dt', 'id']).sort_values('timestamp', ascending=False)
-        st.dataframe(df_display, use_container_width=True)
-        
-        # Statistics
-        st.markdown("---")
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total Records", len(df_display))
-        with col2:
-            st.metric("Unique Users", df_display['user'].nunique())
-        with col3:
-            st.metric("Unique Actions", df_display['action'].nunique())
+    
+    if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
+        start_d, end_d = date_range
     else:
+        start_d = end_d = None
+    # Rentang penuh = tanpa filter tanggal (ringkasan bisa dibaca dari rollup)
+    if start_d is not None and start_d <= date_min and end_d >= date_max:
+        start_d = end_d = None
+    
+    summary = summarize_audit_trail(users, search, start_d, end_d)
+    
+    if summary['total'] == 0:
         st.info("Belum ada data audit trail.")
+        return
+    
+    # Paging keyset: simpan kursor (timestamp, id) awal setiap halaman, reset saat filter berubah
+    filter_key = (tuple(users) if users is not None else None, search, start_d, end_d)
+    if st.session_state.get("audit_filter") != filter_key:
+        st.session_state["audit_filter"] = filter_key
+        st.session_state["audit_cursors"] = [None]
+    cursors = st.session_state["audit_cursors"]
+    
+    df_display, next_before = query_audit_trail(users, search, start_d, end_d, before=cursors[-1])
+    
+    page = len(cursors)
+    total_label = f"{summary['total']:,}+" if summary['capped'] else f"{summary['total']:,}"
+    col_prev, col_info, col_next = st.columns([1, 3, 1])
+    with col_prev:
+        if st.button("⬅️ Sebelumnya", disabled=page == 1, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with col_info:
+        first_row = (page - 1) * AUDIT_PAGE_SIZE + 1
+        last_row = first_row + len(df_display) - 1
+        st.caption(f"Menampilkan {first_row}-{last_row} dari {total_label} record (halaman {page})")
+    with col_next:
+        if st.button("Berikutnya ➡️", disabled=next_before is None, use_container_width=True):
+            cursors.append(next_before)
+            st.rerun()
+    
+    st.dataframe(df_display.drop(columns='id'), use_container_width=True)
+    
+    # Statistics
+    st.markdown("---")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Total Records", total_label)
+    with col2:
+        st.metric("Unique Users", summary['users'])
+    with col3:
+        st.metric("Unique Actions", summary['actions'])
 
 def user_setting_page():
     st.header("⚙️ User Setting")
@@ -1785,8 +4401,9 @@ def user_setting_page():
 def main():
     st.set_page_config(page_title="Cuci Mobil Apps", layout="wide", page_icon="🚗")
     
-    # Initialize database di awal sebelum login
-    init_db()
+    # Initialize database semua outlet di awal sebelum login
+    init_outlets()
+    start_journal_sync()
     
     if "is_logged_in" not in st.session_state or not st.session_state["is_logged_in"]:
         login_page()
@@ -1882,12 +4499,24 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
+    # Pilih outlet: semua query halaman diarahkan ke database outlet ini
+    if len(OUTLETS) > 1:
+        st.sidebar.selectbox("🏪 Outlet", options=list(OUTLETS), key="outlet")
+    
+    # Mode offline: simpan/selesaikan transaksi ke journal lokal, disinkronkan di background
+    st.sidebar.toggle("⚡ Mode Offline Kasir", key="kasir_offline",
+                      help="Transaksi dicatat ke journal lokal dan langsung kembali; sinkron ke database di background")
+    pending = journal_pending_count()
+    if pending:
+        st.sidebar.caption(f"⏳ {pending} entri journal menunggu sinkron")
+    
     st.sidebar.markdown('<p class="menu-title">🚗 MENU CUCI MOBIL</p>', unsafe_allow_html=True)
     
     # Menu items
     menu_items = [
         ("Dashboard", "📊"),
         ("Transaksi", "🚗"),
+        ("Papan Antrian", "📺"),
         ("Customer", "👥"),
         ("Laporan", "📊"),
         ("Setting Toko", "⚙️"),
@@ -1920,6 +4549,8 @@ def main():
         dashboard_page(role)
     elif menu == "Transaksi":
         transaksi_page(role)
+    elif menu == "Papan Antrian":
+        queue_board_page()
     elif menu == "Customer":
         customer_page(role)
     elif menu == "Laporan":
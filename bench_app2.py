@@ -0,0 +1,263 @@
+"""Seeded synthetic car-wash history for app2.py and a page-level latency benchmark.
+
+Usage:
+    python bench_app2.py generate [--db bench_car_wash.db] [--customers N] [--transactions N]
+                                  [--audit N] [--years N] [--seed N]
+    python bench_app2.py run [--db bench_car_wash.db] [--runs N] [--role Supervisor] [--pages ...]
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import app2
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app2.py")
+BENCH_PAGES = ["Dashboard", "Transaksi", "Laporan", "Customer", "Audit Trail"]
+INSERT_CHUNK = 50_000
+
+# Share of transactions per paket and median / spread (lognormal sigma) of service minutes
+PAKET_MIX = {
+    "Cuci Reguler": (0.42, 25, 0.30),
+    "Cuci Premium": (0.20, 40, 0.30),
+    "Cuci + Wax": (0.12, 55, 0.25),
+    "Full Detailing": (0.04, 180, 0.20),
+    "Interior Only": (0.08, 35, 0.30),
+    "Exterior Only": (0.14, 20, 0.30),
+}
+# Relative arrival rate per opening hour (07:00-20:59), peaks before work and after lunch
+HOURLY_ARRIVALS = np.array([3, 7, 9, 8, 6, 5, 6, 8, 9, 8, 6, 4, 3, 2], dtype=float)
+OPENING_HOUR = 7
+# Monday..Sunday
+WEEKDAY_ARRIVALS = np.array([0.8, 0.75, 0.8, 0.85, 1.0, 1.6, 1.7])
+YEARLY_GROWTH = 0.15
+
+PLATE_REGIONS = ["B", "D", "F", "AB", "H", "L", "N", "AD", "BK", "DK"]
+PLATE_REGION_WEIGHTS = [0.45, 0.12, 0.08, 0.06, 0.06, 0.06, 0.05, 0.05, 0.04, 0.03]
+FIRST_NAMES = ["Budi", "Siti", "Agus", "Dewi", "Andi", "Rina", "Joko", "Sri", "Hendra", "Putri",
+               "Bayu", "Ayu", "Rudi", "Lina", "Eko", "Maya", "Fajar", "Nur", "Dimas", "Intan"]
+LAST_NAMES = ["Santoso", "Wijaya", "Saputra", "Lestari", "Pratama", "Hidayat", "Kusuma",
+              "Setiawan", "Nugroho", "Halim", "Gunawan", "Sari", "Utomo", "Siregar"]
+STREETS = ["Sudirman", "Thamrin", "Gatot Subroto", "Diponegoro", "Merdeka", "Ahmad Yani",
+           "Pemuda", "Veteran", "Pahlawan", "Kartini"]
+QC_ITEMS = ["Dompet di dashboard", "HP di tempat HP", "Payung di pintu", "Karpet di bagasi",
+            "Kacamata di laci", "Kunci rumah", "Tas di jok belakang", "Charger di konsol"]
+CATATAN = ["Ada baret di bumper", "Customer minta cepat", "Velg kotor berat", "Jamur kaca",
+           "Bekas stiker di kaca belakang"]
+AUDIT_ACTIONS = ["login", "logout", "transaksi_baru", "transaksi_selesai", "customer_baru", "setting_toko"]
+AUDIT_ACTION_WEIGHTS = [0.12, 0.10, 0.36, 0.34, 0.06, 0.02]
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:8.3f} s")
+    return result, elapsed
+
+
+def insert_chunks(conn, sql, df):
+    for start in range(0, len(df), INSERT_CHUNK):
+        chunk = df.iloc[start:start + INSERT_CHUNK].astype(object)
+        conn.executemany(sql, chunk.where(chunk.notna(), None).itertuples(index=False, name=None))
+        conn.commit()
+
+
+def checklist_json(rng, items, rows, p_checked):
+    """JSON checklist per row, looked up from a precomputed string per checked-items bitmask."""
+    masks = (rng.random((rows, len(items))) < p_checked) @ (1 << np.arange(len(items)))
+    lookup = np.array([json.dumps([item for bit, item in enumerate(items) if mask >> bit & 1])
+                       for mask in range(1 << len(items))], dtype=object)
+    return lookup[masks]
+
+
+def hms(minutes):
+    """'HH:MM:SS' strings from minutes after midnight (wrapping past 24h)."""
+    seconds = (np.asarray(minutes) * 60).astype(np.int64) % 86400
+    parts = [pd.Series(part).astype(str).str.zfill(2) for part in (seconds // 3600, seconds // 60 % 60, seconds % 60)]
+    return (parts[0] + ":" + parts[1] + ":" + parts[2]).to_numpy()
+
+
+def generate_customers(rng, count, start, now):
+    oversample = int(count * 1.2) + 10
+    region = rng.choice(PLATE_REGIONS, oversample, p=PLATE_REGION_WEIGHTS)
+    number = rng.integers(1, 10000, oversample).astype(str)
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    suffix_len = rng.integers(1, 4, oversample)
+    suffix_chars = letters[rng.integers(0, 26, (oversample, 3))]
+    suffix = ["".join(chars[:n]) for chars, n in zip(suffix_chars, suffix_len)]
+    df = pd.DataFrame({"nopol": pd.Series(region) + " " + number + " " + pd.Series(suffix)})
+    df["nopol_key"] = df["nopol"].str.replace(" ", "", regex=False)
+    df = df.drop_duplicates("nopol_key").head(count).reset_index(drop=True)
+    if len(df) < count:
+        raise ValueError(f"Only {len(df):,} unique plates generated, lower --customers")
+
+    n = len(df)
+    df["nama_customer"] = (pd.Series(rng.choice(FIRST_NAMES, n)) + " " + pd.Series(rng.choice(LAST_NAMES, n)))
+    df["no_telp"] = "08" + pd.Series(rng.integers(1_000_000_000, 9_999_999_999, n)).astype(str)
+    df["alamat"] = ("Jl. " + pd.Series(rng.choice(STREETS, n)) + " No. "
+                    + pd.Series(rng.integers(1, 300, n)).astype(str))
+    joined = start + pd.to_timedelta(rng.integers(0, int((now - start).total_seconds()), n), unit="s")
+    df["created_at"] = joined.strftime("%d-%m-%Y %H:%M:%S")
+    return df
+
+
+def generate_transactions(rng, customers, count, start, now):
+    days = pd.date_range(start.date(), now.date(), freq="D")
+    age_years = np.arange(len(days)) / 365.0
+    day_weights = (1 + YEARLY_GROWTH) ** age_years * WEEKDAY_ARRIVALS[days.weekday]
+    day_index = np.sort(rng.choice(len(days), count, p=day_weights / day_weights.sum()))
+    tanggal = days[day_index]
+
+    hour = OPENING_HOUR + rng.choice(len(HOURLY_ARRIVALS), count, p=HOURLY_ARRIVALS / HOURLY_ARRIVALS.sum())
+    masuk = hour * 60 + rng.random(count) * 60
+
+    paket_names = list(PAKET_MIX)
+    share, median, sigma = (np.array(values) for values in zip(*PAKET_MIX.values()))
+    paket_index = rng.choice(len(paket_names), count, p=share / share.sum())
+    durasi = median[paket_index] * np.exp(rng.normal(0, sigma[paket_index]))
+
+    # Today's cars arrived during the last 90 minutes; those not yet done stay 'Dalam Proses'
+    today = tanggal == pd.Timestamp(now.date())
+    now_minutes = now.hour * 60 + now.minute
+    masuk[today] = np.maximum(now_minutes - rng.random(today.sum()) * 90, 0)
+    order = np.lexsort((masuk, day_index))
+    tanggal, masuk, durasi, paket_index, today = (tanggal[order], masuk[order], durasi[order],
+                                                  paket_index[order], today[order])
+    proses = today & (masuk + durasi > now_minutes)
+
+    # Zipf-like loyalty: a few regulars account for many visits
+    loyalty = 1.0 / np.arange(1, len(customers) + 1) ** 0.8
+    customer_index = rng.choice(len(customers), count, p=loyalty / loyalty.sum())
+
+    prices = app2.PAKET_CUCIAN
+    paket = np.array(paket_names, dtype=object)[paket_index]
+    df = pd.DataFrame({
+        "nopol": customers["nopol"].to_numpy()[customer_index],
+        "nama_customer": customers["nama_customer"].to_numpy()[customer_index],
+        "tanggal": tanggal.strftime("%Y-%m-%d"),
+        "waktu_masuk": hms(masuk),
+        "waktu_selesai": hms(masuk + durasi),
+        "paket_cuci": paket,
+        "harga": pd.Series(paket).map(prices).astype(int),
+        "checklist_datang": checklist_json(rng, app2.DEFAULT_CHECKLIST_DATANG, count, 0.9),
+        "checklist_selesai": checklist_json(rng, app2.DEFAULT_CHECKLIST_SELESAI, count, 0.95),
+        "qc_barang": np.where(rng.random(count) < 0.25, rng.choice(QC_ITEMS, count), ""),
+        "catatan": np.where(rng.random(count) < 0.05, rng.choice(CATATAN, count), ""),
+        "status": np.where(proses, "Dalam Proses", "Selesai"),
+        "created_by": rng.choice(["kasir", "admin", "supervisor"], count, p=[0.8, 0.15, 0.05]),
+    })
+    df.loc[proses, ["waktu_selesai", "checklist_selesai"]] = None
+    return df
+
+
+def generate_audit(rng, count, start, now):
+    span = int((now - start).total_seconds())
+    timestamps = start + pd.to_timedelta(np.sort(rng.integers(0, span, count)), unit="s")
+    action = rng.choice(AUDIT_ACTIONS, count, p=AUDIT_ACTION_WEIGHTS)
+    return pd.DataFrame({
+        "timestamp": timestamps.strftime("%Y-%m-%d %H:%M:%S"),
+        "user": rng.choice(list(app2.USERS), count, p=[0.15, 0.8, 0.05]),
+        "action": action,
+        "detail": pd.Series(action).str.replace("_", " ") + " #" + pd.Series(np.arange(count)).astype(str),
+    })
+
+
+def generate(db, customers=20_000, transactions=500_000, audit=200_000, years=3, seed=42):
+    """Create db from scratch with seeded synthetic history, then rebuild every derived table."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db + suffix):
+            os.remove(db + suffix)
+    rng = np.random.default_rng(seed)
+    now = datetime.now(app2.WIB).replace(tzinfo=None)
+    start = now - timedelta(days=int(365 * years))
+
+    print(f"Database: {db}  customers={customers:,} transactions={transactions:,} audit={audit:,} years={years}")
+    with app2.using_db(db):
+        app2.init_db()
+        app2.migrate_db()
+
+        df_customers, _ = timed("generate customers", lambda: generate_customers(rng, customers, start, now))
+        df_trans, _ = timed("generate transactions", lambda: generate_transactions(rng, df_customers, transactions, start, now))
+        df_audit, _ = timed("generate audit rows", lambda: generate_audit(rng, audit, start, now))
+
+        conn = sqlite3.connect(db)
+        conn.execute("PRAGMA synchronous = OFF")
+        timed("insert customers", lambda: insert_chunks(conn, """
+            INSERT INTO customers (nopol, nopol_key, nama_customer, no_telp, alamat, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, df_customers[["nopol", "nopol_key", "nama_customer", "no_telp", "alamat", "created_at"]]))
+        columns = list(df_trans.columns)
+        timed("insert transactions", lambda: insert_chunks(conn, f"""
+            INSERT INTO wash_transactions ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})
+        """, df_trans))
+        timed("insert audit rows", lambda: insert_chunks(conn, """
+            INSERT INTO audit_trail (timestamp, user, action, detail) VALUES (?, ?, ?, ?)
+        """, df_audit))
+        conn.close()
+
+        timed("rebuild derived tables", app2.rebuild_derived_tables)
+
+
+def run_benchmark(db, runs=20, role="Supervisor", pages=BENCH_PAGES):
+    """Rerun each page headlessly through AppTest and report p50/p95 rerun time."""
+    from streamlit.testing.v1 import AppTest
+
+    # app2 reads its outlet databases from the environment on every script run
+    os.environ["CAR_WASH_OUTLETS"] = json.dumps({"Bench": os.path.abspath(db)})
+    print(f"Database: {db}  role={role}  runs={runs}")
+    print(f"{'page':<16} {'first':>9} {'p50':>9} {'p95':>9}  (ms)")
+    for page in pages:
+        at = AppTest.from_file(APP_PATH, default_timeout=300)
+        at.session_state["is_logged_in"] = True
+        at.session_state["login_user"] = "supervisor"
+        at.session_state["login_role"] = role
+        at.session_state["menu"] = page
+
+        timings = []
+        for _ in range(runs + 1):
+            start = time.perf_counter()
+            at.run()
+            timings.append((time.perf_counter() - start) * 1000)
+            if at.exception:
+                raise RuntimeError(f"{page}: {at.exception[0].value}")
+        # The first run pays for imports and cold caches, report it separately
+        p50, p95 = np.percentile(timings[1:], [50, 95])
+        print(f"{page:<16} {timings[0]:9.0f} {p50:9.0f} {p95:9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="create a synthetic database")
+    gen.add_argument("--db", default="bench_car_wash.db")
+    gen.add_argument("--customers", type=int, default=20_000)
+    gen.add_argument("--transactions", type=int, default=500_000)
+    gen.add_argument("--audit", type=int, default=200_000)
+    gen.add_argument("--years", type=float, default=3)
+    gen.add_argument("--seed", type=int, default=42)
+
+    run = commands.add_parser("run", help="benchmark page reruns against a database")
+    run.add_argument("--db", default="bench_car_wash.db")
+    run.add_argument("--runs", type=int, default=20)
+    run.add_argument("--role", default="Supervisor")
+    run.add_argument("--pages", nargs="+", default=BENCH_PAGES)
+
+    args = parser.parse_args()
+    # Keep Streamlit's bare-mode and deprecation warnings out of the report
+    logging.disable(logging.WARNING)
+    if args.command == "generate":
+        generate(args.db, args.customers, args.transactions, args.audit, args.years, args.seed)
+    else:
+        run_benchmark(args.db, args.runs, args.role, args.pages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Benchmark vectorized IDR/date formatters against the per-cell helpers in app.py.
+
+Usage: python bench_formatters.py [rows]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app import (
+    format_currency,
+    format_currency_series,
+    format_date,
+    format_date_series,
+    parse_date,
+)
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:8.3f} s")
+    return result, elapsed
+
+
+def main(rows=1_000_000):
+    rng = np.random.default_rng(42)
+    amounts = pd.Series(rng.integers(-5_000_000, 5_000_000_000, rows).astype(float))
+    amounts[rng.random(rows) < 0.01] = np.nan
+    days = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 2000, rows), unit="D")
+    dates = pd.Series(days.strftime("%Y-%m-%d"))
+
+    print(f"Rows: {rows:,}")
+
+    cell_cur, t_cell_cur = timed("format_currency (apply per cell)", lambda: amounts.apply(format_currency))
+    vec_cur, t_vec_cur = timed("format_currency_series", lambda: format_currency_series(amounts))
+    assert cell_cur.equals(vec_cur), "currency output mismatch"
+    print(f"{'  speedup':<40} {t_cell_cur / t_vec_cur:8.1f} x")
+
+    cell_date, t_cell_date = timed("format_date(parse_date) per cell", lambda: dates.apply(lambda x: format_date(parse_date(x))))
+    vec_date, t_vec_date = timed("format_date_series", lambda: format_date_series(dates))
+    assert cell_date.equals(vec_date), "date output mismatch"
+    print(f"{'  speedup':<40} {t_cell_date / t_vec_date:8.1f} x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
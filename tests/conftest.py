@@ -0,0 +1,23 @@
+import os
+import sys
+import logging
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app2  # noqa: E402
+
+# st.cache_resource di luar `streamlit run` hanya memberi warning "No runtime found"
+logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+
+@pytest.fixture
+def car_wash_db(tmp_path, monkeypatch):
+    """Database outlet sementara yang sudah di-init dan di-migrate"""
+    db_name = str(tmp_path / "car_wash.db")
+    monkeypatch.setattr(app2, 'OUTLETS', {'Pusat': db_name})
+    monkeypatch.setattr(app2, 'JOURNAL_DB_NAME', str(tmp_path / "kasir_journal.db"))
+    app2.init_db()
+    app2.migrate_db()
+    return db_name
@@ -0,0 +1,21 @@
+import sqlite3
+from datetime import date
+
+import app2
+
+
+def test_batas_tanggal_audit_abaikan_timestamp_lama(car_wash_db):
+    assert app2.get_audit_date_bounds() == (None, None)
+
+    conn = sqlite3.connect(car_wash_db)
+    conn.executemany("INSERT INTO audit_trail (timestamp, user, action, detail) VALUES (?, 'admin', 'login', '')", [
+        ('2025-01-05 08:00:00',),
+        ('2025-03-01 17:30:00',),
+        # Format lama yang tidak cocok dengan pola migrasi
+        ('31/12/2020 10:00',),
+        ('legacy',),
+    ])
+    conn.commit()
+    conn.close()
+
+    assert app2.get_audit_date_bounds() == (date(2025, 1, 5), date(2025, 3, 1))
@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+
+import app2
+
+THREADS = 8
+TRANSAKSI = 10
+
+
+def _buat_transaksi(db_name, jumlah):
+    for i in range(jumlah):
+        ok, msg = app2.save_transaction({
+            'nopol': f'B {1000 + i} XY',
+            'nama_customer': f'Customer {i}',
+            'tanggal': '2025-01-01',
+            'waktu_masuk': '10:00:00',
+            'paket_cuci': 'Cuci Reguler',
+            'harga': 50000,
+        })
+        assert ok, msg
+    conn = sqlite3.connect(db_name)
+    ids = [row[0] for row in conn.execute("SELECT id FROM wash_transactions ORDER BY id")]
+    conn.close()
+    return ids
+
+
+def test_hanya_satu_kasir_yang_menyelesaikan(car_wash_db):
+    ids = _buat_transaksi(car_wash_db, TRANSAKSI)
+    hasil = {trans_id: [] for trans_id in ids}
+    barrier = threading.Barrier(THREADS)
+
+    def kasir(n):
+        barrier.wait()
+        for trans_id in ids:
+            ok, msg = app2.update_transaction_finish(trans_id, '11:00:00', '[]', f'kasir-{n}', '')
+            hasil[trans_id].append((ok, msg, f'kasir-{n}'))
+
+    threads = [threading.Thread(target=kasir, args=(n,)) for n in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    conn = sqlite3.connect(car_wash_db)
+    for trans_id, percobaan in hasil.items():
+        assert len(percobaan) == THREADS
+        menang = [kasir for ok, _, kasir in percobaan if ok]
+        assert len(menang) == 1, percobaan
+        # Yang kalah ditolak karena status sudah 'Selesai', bukan error lock
+        for ok, msg, _ in percobaan:
+            if not ok:
+                assert "berstatus 'Selesai'" in msg
+        status, qc_barang = conn.execute(
+            "SELECT status, qc_barang FROM wash_transactions WHERE id = ?", (trans_id,)
+        ).fetchone()
+        assert status == 'Selesai'
+        assert qc_barang == menang[0]
+
+    # Rollup dipindah tepat sekali per transaksi
+    rollup = dict(conn.execute(
+        "SELECT status, jumlah FROM daily_revenue WHERE tanggal = '2025-01-01'"
+    ).fetchall())
+    conn.close()
+    assert rollup.get('Selesai') == TRANSAKSI
+    assert rollup.get('Dalam Proses', 0) == 0
+
+
+def test_retry_saat_database_sibuk(car_wash_db, monkeypatch):
+    trans_id = _buat_transaksi(car_wash_db, 1)[0]
+    finish_asli = app2._finish_transaction
+    panggilan = []
+
+    def finish_sibuk(c, *args):
+        panggilan.append(args[0])
+        if len(panggilan) < 3:
+            raise sqlite3.OperationalError("database is locked")
+        return finish_asli(c, *args)
+
+    monkeypatch.setattr(app2, '_finish_transaction', finish_sibuk)
+    monkeypatch.setattr(app2, 'DB_BUSY_DELAY', 0)
+
+    ok, msg = app2.update_transaction_finish(trans_id, '11:00:00', '[]', '', '')
+    assert ok, msg
+    assert len(panggilan) == 3
+
+
+def test_retry_berhenti_setelah_batas(car_wash_db, monkeypatch):
+    trans_id = _buat_transaksi(car_wash_db, 1)[0]
+
+    def selalu_sibuk(c, *args):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(app2, '_finish_transaction', selalu_sibuk)
+    monkeypatch.setattr(app2, 'DB_BUSY_DELAY', 0)
+
+    ok, msg = app2.update_transaction_finish(trans_id, '11:00:00', '[]', '', '')
+    assert not ok
+    assert 'locked' in msg
+
+    conn = sqlite3.connect(car_wash_db)
+    status = conn.execute("SELECT status FROM wash_transactions WHERE id = ?", (trans_id,)).fetchone()[0]
+    conn.close()
+    assert status == 'Dalam Proses'
+
+
+def test_transaksi_tidak_ditemukan(car_wash_db):
+    ok, msg = app2.update_transaction_finish(99999, '11:00:00', '[]', '', '')
+    assert not ok
+    assert 'tidak ditemukan' in msg
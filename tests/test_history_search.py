@@ -0,0 +1,43 @@
+import sqlite3
+
+import app2
+
+
+def _selesai(conn, nopol, nama):
+    conn.execute("""
+        INSERT INTO wash_transactions (nopol, nama_customer, tanggal, waktu_masuk, waktu_selesai,
+                                       paket_cuci, harga, status)
+        VALUES (?, ?, '2025-01-01', '10:00:00', '10:30:00', 'Cuci Reguler', 50000, 'Selesai')
+    """, (nopol, nama))
+
+
+def test_pencarian_history_tidak_membatasi_customer(car_wash_db):
+    for i in range(60):
+        app2.save_customer(f'B {1000 + i} XY', f'Budi {i}', '', '')
+    conn = sqlite3.connect(car_wash_db)
+    for i in range(60):
+        _selesai(conn, f'B {1000 + i} XY', f'Budi {i}')
+    conn.commit()
+    conn.close()
+
+    df = app2.get_finished_transactions('Budi')
+    assert len(df) == 60
+    # Batas hanya untuk transaksi
+    assert len(app2.get_finished_transactions('Budi', limit=10)) == 10
+
+
+def test_pencarian_history_cocok_dengan_data_transaksi(car_wash_db):
+    app2.save_customer('D 1 AB', 'Andi', '', '')
+    conn = sqlite3.connect(car_wash_db)
+    # Nopol tidak terdaftar di customers
+    _selesai(conn, 'F 77 ZZ', 'Budi Tamu')
+    # Nama di transaksi berbeda dengan nama di customers
+    _selesai(conn, 'D 1 AB', 'Budi')
+    _selesai(conn, 'D 2 AB', 'Citra')
+    conn.commit()
+    conn.close()
+
+    assert sorted(app2.get_finished_transactions('Budi')['nopol']) == ['D 1 AB', 'F 77 ZZ']
+    assert list(app2.get_finished_transactions('F 77')['nopol']) == ['F 77 ZZ']
+    # Customer tetap ditemukan lewat data customers
+    assert list(app2.get_finished_transactions('Andi')['nopol']) == ['D 1 AB']
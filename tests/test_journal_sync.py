@@ -0,0 +1,86 @@
+import sqlite3
+
+import app2
+
+
+def _transaksi(nopol, **extra):
+    data = {
+        'nopol': nopol,
+        'nama_customer': 'Customer',
+        'tanggal': '2025-01-01',
+        'waktu_masuk': '10:00:00',
+        'paket_cuci': 'Cuci Reguler',
+        'harga': 50000,
+    }
+    data.update(extra)
+    return data
+
+
+def test_entri_rusak_tidak_menahan_batch(car_wash_db):
+    app2.save_transaction(_transaksi('B 1 A'), offline=True)
+    # NOT NULL constraint gagal saat diterapkan
+    app2.save_transaction(_transaksi('B 2 A', paket_cuci=None), offline=True)
+    app2.save_transaction(_transaksi('B 3 A'), offline=True)
+
+    assert app2.sync_journal() == {'synced': 2, 'failed': 1}
+
+    conn = sqlite3.connect(car_wash_db)
+    nopols = [row[0] for row in conn.execute("SELECT nopol FROM wash_transactions ORDER BY id")]
+    rollup = conn.execute("SELECT SUM(jumlah) FROM daily_revenue").fetchone()[0]
+    conn.close()
+    assert nopols == ['B 1 A', 'B 3 A']
+    # Rollup entri yang gagal ikut di-rollback
+    assert rollup == 2
+
+    journal = sqlite3.connect(app2.JOURNAL_DB_NAME)
+    rows = journal.execute("SELECT status, error FROM journal ORDER BY id").fetchall()
+    journal.close()
+    assert [status for status, _ in rows] == ['synced', 'failed', 'synced']
+    assert 'NOT NULL' in rows[1][1]
+
+    # Entri gagal tidak diulang di putaran berikutnya
+    assert app2.sync_journal() == {'synced': 0, 'failed': 0}
+
+
+def test_customer_dan_audit_offline_ikut_journal(car_wash_db):
+    ok, _ = app2.save_customer('b 9 xy', 'Budi', '0812', 'Jl. Mawar', offline=True)
+    assert ok
+    app2.add_audit('transaksi_baru', 'Nopol: B 9 XY', offline=True)
+    # Replay customer yang sudah terdaftar dianggap sudah diterapkan
+    app2.save_customer('B9XY', 'Budi', '', '', offline=True)
+
+    conn = sqlite3.connect(car_wash_db)
+    assert conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM audit_trail").fetchone()[0] == 0
+
+    assert app2.sync_journal() == {'synced': 3, 'failed': 0}
+
+    assert conn.execute("SELECT nopol, nopol_key, nama_customer FROM customers").fetchall() == \
+        [('B 9 XY', 'B9XY', 'Budi')]
+    assert conn.execute("SELECT action, detail FROM audit_trail").fetchall() == \
+        [('transaksi_baru', 'Nopol: B 9 XY')]
+    conn.close()
+    assert app2.get_customer_by_nopol('B9XY')['nama_customer'] == 'Budi'
+
+
+def test_replay_audit_setelah_crash_tidak_dobel(car_wash_db):
+    app2.add_audit('transaksi_baru', 'Nopol: B 9 XY', offline=True)
+    app2.save_transaction(_transaksi('B 9 XY'), offline=True)
+    assert app2.sync_journal() == {'synced': 2, 'failed': 0}
+
+    # Crash setelah commit database tujuan, sebelum journal ditandai 'synced'
+    journal = sqlite3.connect(app2.JOURNAL_DB_NAME)
+    journal.execute("UPDATE journal SET status = 'pending'")
+    journal.commit()
+    journal.close()
+    assert app2.sync_journal() == {'synced': 2, 'failed': 0}
+
+    conn = sqlite3.connect(car_wash_db)
+    assert conn.execute("SELECT COUNT(*) FROM audit_trail").fetchone()[0] == 1
+    assert conn.execute("SELECT COUNT(*) FROM wash_transactions").fetchone()[0] == 1
+    assert conn.execute("SELECT jumlah FROM audit_action_counts").fetchall() == [(1,)]
+    # Audit online tanpa client_key tetap bisa berulang
+    app2.add_audit('transaksi_baru', 'Nopol: B 9 XY')
+    app2.add_audit('transaksi_baru', 'Nopol: B 9 XY')
+    assert conn.execute("SELECT COUNT(*) FROM audit_trail").fetchone()[0] == 3
+    conn.close()
@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+import app2
+
+WRITERS = 4
+TRANSAKSI_PER_WRITER = 25
+
+
+def _snapshot_sorted(kpi):
+    kpi = dict(kpi)
+    kpi['revenue'] = sorted(kpi['revenue'])
+    return kpi
+
+
+def test_counter_tidak_dobel_saat_seed_ulang_bersamaan(car_wash_db):
+    today = datetime.now(app2.WIB).date().isoformat()
+    counters = app2.get_kpi_counters()
+    counters.snapshot(today)
+    selesai = threading.Event()
+
+    def kasir(n):
+        for i in range(TRANSAKSI_PER_WRITER):
+            data = {
+                'nopol': f'B {n}{i:03d} KP',
+                'nama_customer': 'Customer',
+                'tanggal': today,
+                'waktu_masuk': f'{8 + n:02d}:{i:02d}:00',
+                'paket_cuci': 'Cuci Reguler' if i % 2 else 'Cuci Premium',
+                'harga': 50000 + i,
+            }
+            ok, msg = app2.save_transaction(data)
+            assert ok, msg
+            if i % 3 == 0:
+                conn = sqlite3.connect(car_wash_db)
+                trans_id = conn.execute("SELECT MAX(id) FROM wash_transactions WHERE nopol = ?",
+                                        (data['nopol'],)).fetchone()[0]
+                conn.close()
+                ok, msg = app2.update_transaction_finish(trans_id, '12:00:00', '[]', '', '')
+                assert ok, msg
+
+    def rekonsiliasi():
+        # Paksa seed ulang dari SQL terus-menerus selama kasir menulis
+        while not selesai.is_set():
+            counters.invalidate()
+            counters.snapshot(today)
+
+    readers = [threading.Thread(target=rekonsiliasi) for _ in range(2)]
+    writers = [threading.Thread(target=kasir, args=(n,)) for n in range(WRITERS)]
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    selesai.set()
+    for t in readers:
+        t.join()
+
+    di_memori = _snapshot_sorted(counters.snapshot(today))
+    dari_sql = _snapshot_sorted(app2.KpiCounters(car_wash_db).snapshot(today))
+    assert di_memori == dari_sql
+    assert di_memori['jumlah'] == WRITERS * TRANSAKSI_PER_WRITER
+    assert len(di_memori['recent']) == app2.KPI_RECENT_LIMIT
+
+
+def test_error_record_tidak_menggagalkan_commit(car_wash_db, monkeypatch):
+    today = datetime.now(app2.WIB).date().isoformat()
+    counters = app2.get_kpi_counters()
+    assert counters.snapshot(today)['jumlah'] == 0
+
+    def rusak(*args):
+        raise KeyError('status')
+    monkeypatch.setattr(counters, 'record_transaction', rusak)
+
+    ok, msg = app2.save_transaction({
+        'nopol': 'B 1 KP',
+        'nama_customer': 'Customer',
+        'tanggal': today,
+        'waktu_masuk': '08:00:00',
+        'paket_cuci': 'Cuci Reguler',
+        'harga': 50000,
+    })
+    assert ok, msg
+    # Counter di-seed ulang dari SQL, transaksi yang tersimpan tetap terhitung
+    kpi = counters.snapshot(today)
+    assert kpi['jumlah'] == 1
+    assert kpi['revenue'] == [('Cuci Reguler', 'Dalam Proses', 1, 50000)]